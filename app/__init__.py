@@ -20,7 +20,6 @@ def create_app():
     with app.app_context():
         from app.routes import stock_routes
         from app.routes import sector_routes
-        from app.routes import dragon_routes
-        from app.routes import index_routes
+        from app.routes import health_routes
 
     return app 
\ No newline at end of file
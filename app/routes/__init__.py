@@ -1,6 +1,10 @@
+from app import app
 from . import stock_routes
 from . import sector_routes
-from . import dragon_routes
-from . import index_routes
+from . import health_routes
+from .data_routes import register_data_routes
 
-__all__ = ['stock_routes', 'sector_routes', 'dragon_routes', 'index_routes']
\ No newline at end of file
+# 数据更新路由定义在 register_data_routes 中，随路由包导入注册一次
+register_data_routes(app)
+
+__all__ = ['stock_routes', 'sector_routes', 'health_routes', 'register_data_routes']
\ No newline at end of file
@@ -1,7 +1,12 @@
 from flask import jsonify, request
 from utils.logger import setup_logger
-from utils.database import get_mysql_connection
+from utils.database import get_mysql_connection, get_pool_stats
+from utils.result_cache import get_result_cache_stats
 from app.services.data_updater import StockDataUpdater
+from app.services.job_manager import job_manager
+from app.services.sector_daily import submit_refresh_job
+from app.services.price_cube import submit_build_job
+from app.services.indicators import submit_indicator_job
 import os
 import json
 
@@ -16,9 +21,37 @@ def register_data_routes(app):
     def update_historical_data():
         try:
             logger.info("1. 接收到更新请求")
-            result = data_updater.update_historical_data()
+            params = request.get_json(silent=True) or {}
+            # mode: date 按交易日拉取全市场（默认），stock 按股票逐只拉取
+            mode = params.get('mode', 'date')
+            # full: 忽略水位全量重新拉取
+            full = bool(params.get('full', False))
+            # resume: 上次更新未完成时从检查点续传
+            resume = bool(params.get('resume', True))
+            
+            def run_update(job):
+                job.progress = data_updater.update_status
+                result = data_updater.update_historical_data(mode=mode, full=full, resume=resume,
+                                                             cancel_event=job.cancel_event)
+                # 有新数据入库时增量刷新板块日汇总、重建行情立方体、推进技术指标
+                if data_updater.update_status['rows_written']:
+                    submit_refresh_job()
+                    submit_build_job()
+                    submit_indicator_job()
+                return result
+            
+            job, created = job_manager.submit('update_historical_data', run_update,
+                                              {'mode': mode, 'full': full, 'resume': resume})
+            if not created:
+                return jsonify({
+                    'status': 'running',
+                    'job_id': job.id,
+                    'message': '已有更新任务在运行'
+                }), 409
+                
             return jsonify({
                 'status': 'started',
+                'job_id': job.id,
                 'message': '更新已启动'
             })
         except Exception as e:
@@ -28,18 +61,82 @@ def register_data_routes(app):
                 "status": "error",
                 "message": error_msg
             }), 500
-
+    
+    @app.route('/api/stop_update', methods=['POST'])
+    def stop_update():
+        try:
+            job = job_manager.cancel(name='update_historical_data')
+            if job is None:
+                return jsonify({
+                    'status': 'idle',
+                    'message': '没有正在运行的更新任务'
+                })
+            return jsonify({
+                'status': 'stopping',
+                'job_id': job.id,
+                'message': '正在停止更新'
+            })
+        except Exception as e:
+            logger.error(f"停止更新失败: {str(e)}")
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 500
+    
     @app.route('/api/update_progress')
     def get_update_progress():
         try:
-            return jsonify(data_updater.get_update_progress())
+            # 更新任务可能运行在其他 worker 进程中，进度取自共享的任务状态
+            job = job_manager.latest('update_historical_data')
+            if job is not None and job.progress:
+                progress = dict(job.progress)
+            else:
+                progress = dict(data_updater.get_update_progress())
+            progress['is_updating'] = progress['is_running']
+            if job is not None:
+                progress['job_id'] = job.id
+                progress['job_status'] = job.status
+            return jsonify(progress)
         except Exception as e:
             logger.error(f"获取进度失败: {str(e)}")
             return jsonify({
                 'status': 'error',
                 'message': str(e)
             }), 500
-
+    
+    @app.route('/api/jobs')
+    def list_jobs():
+        return jsonify({
+            'success': True,
+            'jobs': job_manager.list()
+        })
+        
+    @app.route('/api/jobs/<string:job_id>')
+    def get_job(job_id):
+        job = job_manager.get(job_id)
+        if job is None:
+            return jsonify({
+                'success': False,
+                'message': f'未找到任务: {job_id}'
+            }), 404
+        return jsonify({
+            'success': True,
+            'job': job.to_dict()
+        })
+        
+    @app.route('/api/jobs/<string:job_id>/cancel', methods=['POST'])
+    def cancel_job(job_id):
+        job = job_manager.cancel(job_id=job_id)
+        if job is None:
+            return jsonify({
+                'success': False,
+                'message': f'任务不存在或已结束: {job_id}'
+            }), 404
+        return jsonify({
+            'success': True,
+            'job': job.to_dict()
+        })
+        
     @app.route('/api/update_financial_data', methods=['POST'])
     def update_financial_data():
         try:
@@ -53,7 +150,7 @@ def register_data_routes(app):
                 'success': False,
                 'message': error_msg
             }), 500
-
+    
     @app.route('/api/update_daily_basic', methods=['POST'])
     @app.route('/api/update_daily_basic/<string:trade_date>', methods=['POST'])
     def update_daily_basic_data(trade_date=None):
@@ -63,8 +160,33 @@ def register_data_routes(app):
             else:
                 logger.info("更新最新的每日指标数据")
                 
-            result = data_updater.update_daily_basic(trade_date)
-            return jsonify(result)
+            params = request.get_json(silent=True) or {}
+            # end_date: 回补 trade_date 至 end_date 区间；force: 已入库的交易日也重新拉取
+            end_date = params.get('end_date')
+            force = bool(params.get('force', False))
+            
+            def run_update(job):
+                result = data_updater.update_daily_basic(trade_date, end_date=end_date, force=force,
+                                                         cancel_event=job.cancel_event)
+                # 行情立方体中的换手率来自每日指标
+                if result.get('rows'):
+                    submit_build_job()
+                return result
+            
+            job, created = job_manager.submit('update_daily_basic', run_update,
+                                              {'trade_date': trade_date, 'end_date': end_date, 'force': force})
+            if not created:
+                return jsonify({
+                    'success': False,
+                    'job_id': job.id,
+                    'message': '已有每日指标更新任务在运行'
+                }), 409
+                
+            return jsonify({
+                'success': True,
+                'job_id': job.id,
+                'message': '每日指标更新已启动'
+            })
         except Exception as e:
             error_msg = f"更新每日指标数据失败: {str(e)}"
             logger.error(error_msg, exc_info=True)
@@ -72,5 +194,108 @@ def register_data_routes(app):
                 'success': False,
                 'message': error_msg
             }), 500
+    
+    @app.route('/api/update_moneyflow', methods=['POST'])
+    @app.route('/api/update_moneyflow/<string:trade_date>', methods=['POST'])
+    def update_moneyflow_data(trade_date=None):
+        try:
+            params = request.get_json(silent=True) or {}
+            # end_date: 回补 trade_date 至 end_date 区间；force: 已入库的交易日也重新拉取
+            end_date = params.get('end_date')
+            force = bool(params.get('force', False))
+            
+            def run_update(job):
+                # 回补个股资金流向后在同一任务中重算这些交易日的板块资金流向汇总
+                return data_updater.update_moneyflow(trade_date, end_date=end_date, force=force,
+                                                     cancel_event=job.cancel_event)
+            
+            job, created = job_manager.submit('update_moneyflow', run_update,
+                                              {'trade_date': trade_date, 'end_date': end_date, 'force': force})
+            if not created:
+                return jsonify({
+                    'success': False,
+                    'job_id': job.id,
+                    'message': '已有资金流向更新任务在运行'
+                }), 409
+                
+            return jsonify({
+                'success': True,
+                'job_id': job.id,
+                'message': '资金流向更新已启动'
+            })
+        except Exception as e:
+            error_msg = f"更新资金流向数据失败: {str(e)}"
+            logger.error(error_msg, exc_info=True)
+            return jsonify({
+                'success': False,
+                'message': error_msg
+            }), 500
+    
+    @app.route('/api/refresh_sector_daily', methods=['POST'])
+    def refresh_sector_daily():
+        try:
+            params = request.get_json(silent=True) or {}
+            # full: 所有板块从头重算
+            job = submit_refresh_job(full=bool(params.get('full', False)))
+            return jsonify({
+                'success': True,
+                'job_id': job.id
+            })
+        except Exception as e:
+            error_msg = f"刷新板块日汇总失败: {str(e)}"
+            logger.error(error_msg, exc_info=True)
+            return jsonify({
+                'success': False,
+                'message': error_msg
+            }), 500
+    
+    @app.route('/api/build_price_cube', methods=['POST'])
+    def build_price_cube():
+        try:
+            job = submit_build_job()
+            return jsonify({
+                'success': True,
+                'job_id': job.id
+            })
+        except Exception as e:
+            error_msg = f"重建行情立方体失败: {str(e)}"
+            logger.error(error_msg, exc_info=True)
+            return jsonify({
+                'success': False,
+                'message': error_msg
+            }), 500
+    
+    @app.route('/api/update_indicators', methods=['POST'])
+    def update_indicators():
+        try:
+            params = request.get_json(silent=True) or {}
+            # full: 丢弃保存的状态，从头计算
+            job = submit_indicator_job(full=bool(params.get('full', False)))
+            return jsonify({
+                'success': True,
+                'job_id': job.id
+            })
+        except Exception as e:
+            error_msg = f"更新技术指标失败: {str(e)}"
+            logger.error(error_msg, exc_info=True)
+            return jsonify({
+                'success': False,
+                'message': error_msg
+            }), 500
+    
+    @app.route('/api/db/pool_stats')
+    def db_pool_stats():
+        return jsonify({
+            'success': True,
+            'pool': get_pool_stats()
+        })
+
+    @app.route('/api/cache/stats')
+    def result_cache_stats():
+        """结果缓存的命中、未命中、合并等待、淘汰次数，按函数 / 接口分列"""
+        return jsonify({
+            'success': True,
+            'cache': get_result_cache_stats()
+        })
 
     # 添加其他数据更新相关路由... 
\ No newline at end of file
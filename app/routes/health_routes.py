@@ -0,0 +1,57 @@
+from flask import jsonify
+from app import app
+from utils.database import get_mysql_connection
+from utils.data_version import DATA_VERSION, get_version
+from utils.logger import setup_logger
+from app.services.reference_data import get_reference_data
+from app.services.price_cube import get_price_cube
+import os
+
+logger = setup_logger('health_routes')
+
+@app.route('/healthz')
+def healthz():
+    """存活检查: 进程能处理请求即返回 200，不访问数据库"""
+    return jsonify({
+        'success': True,
+        'status': 'ok',
+        'pid': os.getpid(),
+        'data_version': get_version(DATA_VERSION)
+    })
+
+@app.route('/readyz')
+def readyz():
+    """就绪检查: 数据库可用且基础数据已加载时返回 200，否则 503
+
+    行情立方体未构建时接口会回退到数据库查询，只报告状态，不影响就绪
+    """
+    checks = {}
+    ready = True
+
+    try:
+        with get_mysql_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT 1')
+            cursor.fetchall()
+        checks['database'] = 'ok'
+    except Exception as e:
+        checks['database'] = str(e)
+        ready = False
+
+    try:
+        checks['reference_data'] = get_reference_data().version
+    except Exception as e:
+        checks['reference_data'] = str(e)
+        ready = False
+
+    cube = get_price_cube()
+    checks['price_cube'] = cube.version if cube is not None else None
+
+    if not ready:
+        logger.warning(f"就绪检查未通过: {checks}")
+    return jsonify({
+        'success': ready,
+        'ready': ready,
+        'pid': os.getpid(),
+        'checks': checks
+    }), 200 if ready else 503
@@ -1,36 +1,34 @@
-from flask import jsonify
+from flask import jsonify, request
 from app import app
 from utils.database import get_mysql_connection
+from utils.http_cache import versioned_response, cached_response
 from utils.logger import setup_logger
+from utils.date_utils import parse_window
+from utils.compact_json import parse_format, json_response
+from app.services.reference_data import get_reference_data, invalidate_reference_data, normalize_stock_code
+from app.services.sector_daily import get_sector_summary, submit_refresh_job
+from app.services.sector_engine import load_sector_bars, SectorPanel, sector_stocks_payload, sector_stocks_compact, DEFAULT_START_DATE
+from app.services.price_cube import get_price_cube
+from config.config import ANALYSIS_CONFIG
+from datetime import datetime
+from app.services.stock_analysis import StockAnalysis
+from app.services.sector_correlation import get_sector_correlation
+from app.services.money_flow import get_sector_money_flow, rollup_sector_moneyflow
 
 logger = setup_logger('sector_routes')
 
 @app.route('/api/sectors')
+@versioned_response
 def get_sectors():
     """获取所有板块列表"""
     try:
-        with get_mysql_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
-            
-            # 获取板块列表及其包含的股票数量
-            cursor.execute('''
-                SELECT 
-                    s.sector_id,
-                    s.sector_name,
-                    s.sector_type,
-                    COUNT(DISTINCT ss.stock_code) as stock_count
-                FROM sectors s
-                LEFT JOIN sector_stocks ss ON s.sector_id = ss.sector_id
-                GROUP BY s.sector_id, s.sector_name, s.sector_type
-                ORDER BY s.sector_type, s.sector_name
-            ''')
+        # 获取板块列表及其包含的股票数量
+        sectors = get_reference_data().list_sectors()
             
-            sectors = cursor.fetchall()
-            
-            return jsonify({
-                'success': True,
-                'sectors': sectors
-            })
+        return jsonify({
+            'success': True,
+            'sectors': sectors
+        })
             
     except Exception as e:
         error_msg = f"获取板块列表失败: {str(e)}"
@@ -41,108 +39,304 @@ def get_sectors():
         }), 500
 
 @app.route('/api/sector/<int:sector_id>/stocks')
+@versioned_response
+@cached_response
 def get_sector_stocks(sector_id):
-    """获取板块内股票列表及其涨跌幅数据"""
+    """获取板块内股票列表及其涨跌幅数据
+
+    start/end 指定区间（YYYYMMDD 或 YYYY-MM-DD），涨跌幅相对区间首日开盘价；
+    summary_only=1 时只返回 sector_daily 中的板块每日汇总，不扫描成分股日线；
+    format=compact 时返回按列组织的紧凑格式，binary=1 时数值数组为 base64 类型化数组
+    """
     try:
-        with get_mysql_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
-            
-            # 获取板块内的股票列表和基本信息
-            cursor.execute('''
-                SELECT DISTINCT
-                    s.证券代码 as code,
-                    s.证券简称 as name,
-                    sd.open,
-                    sd.close,
-                    sd.amount,
-                    sd.trade_date
-                FROM sector_stocks ss
-                JOIN stocks s ON ss.stock_code = s.证券代码
-                LEFT JOIN stock_data sd ON s.证券代码 = sd.ts_code
-                WHERE ss.sector_id = %s
-                AND sd.trade_date >= '20240920'
-                ORDER BY sd.trade_date
-            ''', (sector_id,))
+        try:
+            start_date, end_date = parse_window(request.args, DEFAULT_START_DATE)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': f"日期参数错误: {str(e)}"
+            }), 400
+        
+        try:
+            compact, binary = parse_format(request.args)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+        
+        if request.args.get('summary_only') in ('1', 'true'):
+            with get_mysql_connection() as conn:
+                result = get_sector_summary(conn.cursor(), sector_id, start_date, end_date)
+            return jsonify(dict(result, success=True))
+        
+        # 板块成分股和股票名称从基础数据缓存中获取
+        reference = get_reference_data()
+        stocks = [code for code in reference.sector_members(sector_id) if reference.has_stock(code)]
             
-            price_data = cursor.fetchall()
+        # 明细按 (交易日, 股票) 展开，成分股数和区间长度都设上限
+        if len(stocks) > ANALYSIS_CONFIG['MAX_SECTOR_STOCKS']:
+            return jsonify({
+                'success': False,
+                'message': f"板块成分股 {len(stocks)} 只，超过上限 {ANALYSIS_CONFIG['MAX_SECTOR_STOCKS']}，请使用 summary_only=1"
+            }), 400
+        window_days = (datetime.strptime(end_date or datetime.now().strftime('%Y%m%d'), '%Y%m%d')
+                       - datetime.strptime(start_date, '%Y%m%d')).days
+        if window_days > ANALYSIS_CONFIG['MAX_WINDOW_DAYS']:
+            return jsonify({
+                'success': False,
+                'message': f"区间 {window_days} 天，超过上限 {ANALYSIS_CONFIG['MAX_WINDOW_DAYS']} 天"
+            }), 400
             
-            if not price_data:
-                return jsonify({
-                    'success': True,
-                    'daily_changes': {},
-                    'dates': []
-                })
+        # 优先从行情立方体切片，否则一次查询取出所有成分股的日线，整理成 日期 × 股票 数组后单遍组装
+        cube = get_price_cube(start_date, end_date)
+        if cube is not None:
+            panel = SectorPanel.from_cube(cube, stocks, start_date, end_date)
+        else:
+            with get_mysql_connection() as conn:
+                bars = load_sector_bars(conn.cursor(), stocks, start_date, end_date)
+            panel = SectorPanel.from_frame(bars)
             
-            # 处理数据
-            daily_changes = {}
-            dates = set()
-            stock_names = {}  # 用于存储股票代码和名称的映射
+        if compact:
+            return json_response(dict(sector_stocks_compact(panel, reference.stock_names(stocks), binary), success=True))
+        return jsonify(dict(sector_stocks_payload(panel, reference.stock_names(stocks)), success=True))
             
-            # 首先建立股票代码和名称的映射
-            for row in price_data:
-                stock_names[row['code']] = row['name']
+    except Exception as e:
+        error_msg = f"获取板块股票数据失败: {str(e)}"
+        logger.error(error_msg)
+        return jsonify({
+            'success': False,
+            'message': error_msg
+        }), 500
+
+@app.route('/api/sector/<int:sector_id>/window_returns')
+@versioned_response
+@cached_response
+def get_sector_window_returns(sector_id):
+    """板块成分股在 start/end 区间的收益，按收益从高到低排列"""
+    try:
+        try:
+            start_date, end_date = parse_window(request.args, DEFAULT_START_DATE)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': f"日期参数错误: {str(e)}"
+            }), 400
+        
+        reference = get_reference_data()
+        members = reference.sector_members(sector_id)
+        returns = StockAnalysis().get_window_returns(members, start_date, end_date)
+        if returns is None:
+            raise RuntimeError('区间收益计算失败')
+        
+        names = reference.stock_names(returns)
+        stocks = [{'code': code, 'name': names[code], 'return': value}
+                  for code, value in sorted(returns.items(), key=lambda item: item[1], reverse=True)]
+        return jsonify({
+            'success': True,
+            'start': start_date,
+            'end': end_date,
+            'stocks': stocks
+        })
+        
+    except Exception as e:
+        error_msg = f"获取板块区间收益失败: {str(e)}"
+        logger.error(error_msg)
+        return jsonify({
+            'success': False,
+            'message': error_msg
+        }), 500
+
+@app.route('/api/sector/<int:sector_id>/correlation')
+@versioned_response
+def get_sector_correlation_matrix(sector_id):
+    """板块成分股在 start/end 区间的日收益相关矩阵（按层次聚类排序）和相对板块的 beta"""
+    try:
+        try:
+            start_date, end_date = parse_window(request.args, DEFAULT_START_DATE)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': f"日期参数错误: {str(e)}"
+            }), 400
+        
+        if get_reference_data().get_sector(sector_id) is None:
+            return jsonify({
+                'success': False,
+                'message': f'未找到板块: {sector_id}'
+            }), 404
+        
+        try:
+            result = get_sector_correlation().get(sector_id, start_date, end_date)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+        
+        return jsonify(dict(result, success=True))
+        
+    except Exception as e:
+        error_msg = f"获取板块相关性失败: {str(e)}"
+        logger.error(error_msg)
+        return jsonify({
+            'success': False,
+            'message': error_msg
+        }), 500
+
+@app.route('/api/sector/<int:sector_id>/money_flow')
+@versioned_response
+@cached_response
+def get_sector_money_flow_data(sector_id):
+    """板块 start/end 区间每日资金流向汇总（万元），读 sector_moneyflow"""
+    try:
+        try:
+            start_date, end_date = parse_window(request.args, DEFAULT_START_DATE)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': f"日期参数错误: {str(e)}"
+            }), 400
+        
+        with get_mysql_connection() as conn:
+            flow = get_sector_money_flow(conn.cursor(), sector_id, start_date, end_date)
+        return jsonify(dict(flow, success=True))
+        
+    except Exception as e:
+        error_msg = f"获取板块资金流向失败: {str(e)}"
+        logger.error(error_msg)
+        return jsonify({
+            'success': False,
+            'message': error_msg
+        }), 500
+
+@app.route('/api/save_sector_stocks', methods=['POST'])
+def save_sector_stocks():
+    """保存板块及成分股，板块不存在时新建；成分股整体替换为 stocks"""
+    try:
+        params = request.get_json(silent=True) or {}
+        sector_name = (params.get('name') or '').strip()
+        sector_type = params.get('type') or '自定义'
+        if not sector_name:
+            return jsonify({
+                'success': False,
+                'message': '板块名称不能为空'
+            }), 400
             
-            for row in price_data:
-                trade_date = f"{row['trade_date'][:4]}-{row['trade_date'][4:6]}-{row['trade_date'][6:]}"
-                dates.add(trade_date)
-                
-                if trade_date not in daily_changes:
-                    daily_changes[trade_date] = {
-                        'stocks': [],
-                        'total_amount': 0
-                    }
+        reference = get_reference_data()
+        codes = list(dict.fromkeys(normalize_stock_code(code) for code in params.get('stocks', [])
+                                   if code and code.strip()))
+        unknown = [code for code in codes if not reference.has_stock(code)]
+        if unknown:
+            # 快照可能早于股票列表的更新（如刚上市的股票），重新加载后再检查
+            reference.reload()
+            unknown = [code for code in codes if not reference.has_stock(code)]
+        if unknown:
+            # 不能只保存已知代码: 成分股整体替换，已有成分股会因此被删除
+            return jsonify({
+                'success': False,
+                'message': f"未知的股票代码: {', '.join(unknown)}",
+                'unknown_stocks': unknown
+            }), 400
+        
+        with get_mysql_connection() as conn:
+            cursor = conn.cursor()
+            sector = reference.find_sector(sector_name, sector_type)
+            if sector:
+                sector_id = sector['sector_id']
+            else:
+                cursor.execute('''
+                    INSERT INTO sectors (sector_name, sector_type)
+                    VALUES (%s, %s)
+                    ON DUPLICATE KEY UPDATE sector_id = LAST_INSERT_ID(sector_id)
+                ''', (sector_name, sector_type))
+                sector_id = cursor.lastrowid
                 
-                # 检查该股票是否已经在当天的列表中
-                stock_exists = any(s['code'] == row['code'] for s in daily_changes[trade_date]['stocks'])
-                if not stock_exists:
-                    # 处理成交额（从千元转换为元）
-                    amount = float(row['amount']) * 1000 if row['amount'] else 0
-                    daily_changes[trade_date]['stocks'].append({
-                        'code': row['code'],
-                        'name': stock_names[row['code']],
-                        'open': float(row['open']) if row['open'] else 0,
-                        'close': float(row['close']) if row['close'] else 0,
-                        'amount': amount,
-                        'amount_str': f"{amount/100000000:.2f}亿" if amount >= 100000000 else f"{amount/10000:.2f}万"
-                    })
-                    daily_changes[trade_date]['total_amount'] = daily_changes[trade_date]['total_amount'] + amount
-            
-            # 计算每只股票相对于首日的涨跌幅
-            sorted_dates = sorted(list(dates))
-            first_date = sorted_dates[0]
-            first_day_data = daily_changes[first_date]
-            base_prices = {stock['code']: stock['open'] for stock in first_day_data['stocks']}  # 使用首日开盘价作为基准
+            # 在同一个事务中用 codes 替换成分股: 先删除不在 codes 中的，再插入新增的
+            cursor.execute('''
+                SELECT stock_code FROM sector_stocks
+                WHERE sector_id = %s
+                FOR UPDATE
+            ''', (sector_id,))
+            current = {row[0] for row in cursor.fetchall()}
+            removed = sorted(current.difference(codes))
+            added = [code for code in codes if code not in current]
+            if removed:
+                placeholders = ','.join(['%s'] * len(removed))
+                cursor.execute(f'''
+                    DELETE FROM sector_stocks
+                    WHERE sector_id = %s AND stock_code IN ({placeholders})
+                ''', [sector_id] + removed)
+            if added:
+                cursor.executemany('''
+                    INSERT IGNORE INTO sector_stocks (sector_id, stock_code)
+                    VALUES (%s, %s)
+                ''', [(sector_id, code) for code in added])
+            conn.commit()
+            rollup_sector_moneyflow(conn, sector_ids=[sector_id])
             
-            # 计算每天的涨跌幅
-            for date in sorted_dates:
-                for stock in daily_changes[date]['stocks']:
-                    base_price = base_prices.get(stock['code'])
-                    if base_price and base_price != 0:
-                        if date == first_date:  # 第一天使用当天收盘价相对开盘价的涨跌幅
-                            stock['change'] = ((stock['close'] - stock['open']) / stock['open'] * 100)
-                        else:  # 其他天使用收盘价相对首日开盘价的涨跌幅
-                            stock['change'] = ((stock['close'] - base_price) / base_price * 100)
-                    else:
-                        stock['change'] = 0
+        # 成分股变更后递增版本，所有进程重新加载基础数据，并重算该板块的日汇总
+        invalidate_reference_data()
+        submit_refresh_job()
+        logger.info(f"保存板块 {sector_name}({sector_id})，成分股 {len(codes)} 只，"
+                    f"新增 {len(added)} 只，移除 {len(removed)} 只")
+        
+        return jsonify({
+            'success': True,
+            'sector_id': sector_id,
+            'saved': len(codes),
+            'added': len(added),
+            'removed': len(removed)
+        })
+        
+    except Exception as e:
+        error_msg = f"保存板块失败: {str(e)}"
+        logger.error(error_msg)
+        return jsonify({
+            'success': False,
+            'message': error_msg
+        }), 500
+
+@app.route('/api/remove_sector_stock', methods=['POST'])
+def remove_sector_stock():
+    """从板块中删除股票"""
+    try:
+        params = request.get_json(silent=True) or {}
+        sector_id = params.get('sector_id')
+        stock_code = normalize_stock_code(params.get('stock_code') or '')
+        if not sector_id or not stock_code:
+            return jsonify({
+                'success': False,
+                'message': '缺少 sector_id 或 stock_code'
+            }), 400
             
-            # 对每天的股票按涨跌幅排序
-            for date_data in daily_changes.values():
-                date_data['stocks'].sort(key=lambda x: x['change'])  # 从小到大排序
-                amount = date_data['total_amount']
-                date_data['total_amount_str'] = f"{amount/100000000:.2f}亿" if amount >= 100000000 else f"{amount/10000:.2f}万"
+        with get_mysql_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                DELETE FROM sector_stocks
+                WHERE sector_id = %s AND stock_code = %s
+            ''', (sector_id, stock_code))
+            removed = cursor.rowcount
+            conn.commit()
+            if removed:
+                rollup_sector_moneyflow(conn, sector_ids=[sector_id])
             
-            return jsonify({
-                'success': True,
-                'daily_changes': daily_changes,
-                'dates': sorted_dates
-            })
+        if removed:
+            invalidate_reference_data()
+            submit_refresh_job()
+            logger.info(f"从板块 {sector_id} 删除股票 {stock_code}")
             
+        return jsonify({
+            'success': True,
+            'removed': removed
+        })
+        
     except Exception as e:
-        error_msg = f"获取板块股票数据失败: {str(e)}"
+        error_msg = f"删除板块股票失败: {str(e)}"
         logger.error(error_msg)
         return jsonify({
             'success': False,
             'message': error_msg
         }), 500
-
+        
     # 添加其他板块相关路由... 
\ No newline at end of file
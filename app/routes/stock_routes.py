@@ -1,54 +1,72 @@
-from flask import jsonify
+from flask import jsonify, request
 from app import app
 from utils.database import get_mysql_connection
+from utils.http_cache import versioned_response, cached_response
 from utils.logger import setup_logger, log_error
+from utils.date_utils import format_trade_date, parse_window
+from utils.compact_json import parse_format, encode_array, json_response
+from app.services.sector_engine import DEFAULT_START_DATE
+from app.services.reference_data import get_reference_data, normalize_stock_code
+from app.services.ranking import get_ranking_service
+from app.services.indicators import parse_indicator_groups, get_stock_indicators
+from app.services.screener import get_screener, parse_screen_args
+from app.services.money_flow import get_stock_money_flow, detail_money_flow
 import sys
+import numpy as np
+import pandas as pd
 
 logger = setup_logger('stock_routes')
 
 @app.route('/api/stock/<string:stock_code>/detail')
+@versioned_response
+@cached_response
 def get_stock_detail(stock_code):
-    """获取个股详情数据"""
+    """获取个股详情数据，start/end 指定区间（YYYYMMDD 或 YYYY-MM-DD）
+
+    indicators 指定附带的技术指标（ma,ema,macd,rsi,kdj,boll 或 all），默认不返回；
+    format=compact 时数值序列缺失为 null 而不是 0，binary=1 时为 base64 类型化数组
+    """
     try:
         logger.info(f"获取股票 {stock_code} 的详细信息")
         
+        try:
+            start_date, end_date = parse_window(request.args, DEFAULT_START_DATE)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': f"日期参数错误: {str(e)}"
+            }), 400
+        
+        try:
+            indicator_groups = parse_indicator_groups(request.args.get('indicators'))
+            compact, binary = parse_format(request.args)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+        
         # 标准化股票代码格式
-        stock_code = stock_code.upper()  # 转换为大写
-        if '.' not in stock_code:  # 如果没有后缀，根据股票代码添加后缀
-            if stock_code.startswith('6'):
-                stock_code += '.SH'
-            elif stock_code.startswith(('0', '3')):
-                stock_code += '.SZ'
+        stock_code = normalize_stock_code(stock_code)
+        
+        # 检查股票是否存在并获取基本信息
+        reference = get_reference_data()
+        if not reference.has_stock(stock_code):
+            logger.warning(f"未找到股票: {stock_code}")
+            return jsonify({
+                'success': False,
+                'message': f'未找到股票: {stock_code}'
+            }), 404
+            
+        stock_info = {'code': stock_code, 'name': reference.stock_name(stock_code)}
         
         with get_mysql_connection() as conn:
             cursor = conn.cursor(dictionary=True)
-            
-            # 先检查股票是否存在
-            cursor.execute('''
-                SELECT COUNT(*) as count
-                FROM stocks 
-                WHERE 证券代码 = %s
-            ''', (stock_code,))
-            
-            if cursor.fetchone()['count'] == 0:
-                logger.warning(f"未找到股票: {stock_code}")
-                return jsonify({
-                    'success': False,
-                    'message': f'未找到股票: {stock_code}'
-                }), 404
-            
-            # 获取股票基本信息
-            cursor.execute('''
-                SELECT 证券代码 as code, 证券简称 as name
-                FROM stocks 
-                WHERE 证券代码 = %s
-            ''', (stock_code,))
-            
-            stock_info = cursor.fetchone()
 
             # 获取股票历史数据
             try:
-                cursor.execute('''
+                date_filter = 'AND trade_date <= %s' if end_date else ''
+                cursor.execute(f'''
                     WITH DailyPrices AS (
                         SELECT 
                             trade_date,
@@ -60,7 +78,8 @@ def get_stock_detail(stock_code):
                             LAG(close) OVER (ORDER BY trade_date) as prev_close
                         FROM stock_data
                         WHERE ts_code = %s
-                        AND trade_date >= '20240920'
+                        AND trade_date >= %s
+                        {date_filter}
                         ORDER BY trade_date
                     )
                     SELECT 
@@ -78,7 +97,7 @@ def get_stock_detail(stock_code):
                         END as change_pct
                     FROM DailyPrices
                     ORDER BY trade_date
-                ''', (stock_code,))
+                ''', [stock_code, start_date] + ([end_date] if end_date else []))
             except Exception as e:
                 log_error(logger, f"SQL查询失败: {str(e)}")
                 raise
@@ -93,80 +112,47 @@ def get_stock_detail(stock_code):
                 }), 404
 
             # 获取所属板块
-            cursor.execute('''
-                SELECT 
-                    s.sector_name,
-                    s.sector_type
-                FROM sectors s
-                JOIN sector_stocks ss ON s.sector_id = ss.sector_id
-                WHERE ss.stock_code = %s
-                ORDER BY s.sector_type, s.sector_name
-            ''', (stock_code,))
-            
-            sectors = cursor.fetchall()
+            sectors = reference.stock_sectors(stock_code)
 
-            # 处理数据
-            dates = []
-            opens = []
-            highs = []
-            lows = []
-            closes = []
-            volumes = []
-            changes = []
-            super_large_inflow = []
-            super_large_outflow = []
-            large_inflow = []
-            large_outflow = []
-            net_inflow = []
-            
-            for row in price_data:
-                # 格式化日期
-                trade_date = f"{row['trade_date'][:4]}-{row['trade_date'][4:6]}-{row['trade_date'][6:]}"
-                dates.append(trade_date)
-                
-                # 处理价格数据
-                opens.append(float(row['open']) if row['open'] else 0)
-                highs.append(float(row['high']) if row['high'] else 0)
-                lows.append(float(row['low']) if row['low'] else 0)
-                closes.append(float(row['close']) if row['close'] else 0)
+            # 整列转换成 float64 数组，缺失为 NaN
+            prices = pd.DataFrame(price_data, columns=['trade_date', 'open', 'high', 'low', 'close', 'amount',
+                                                       'change_pct'])
+            dates = [format_trade_date(d) for d in prices['trade_date']]
+            series = {key: pd.to_numeric(prices[column], errors='coerce').to_numpy(dtype=np.float64)
+                      for key, column in [('opens', 'open'), ('highs', 'high'), ('lows', 'low'),
+                                          ('closes', 'close'), ('volumes', 'amount'), ('changes', 'change_pct')]}
+            series['volumes'] *= 1000  # 千元 -> 元
                 
-                # 处理成交额（从千元转换为元）
-                amount = float(row['amount']) * 1000 if row['amount'] else 0
-                volumes.append(amount)
-                
-                # 处理涨跌幅
-                change_pct = float(row['change_pct']) if row['change_pct'] is not None else 0
-                changes.append(change_pct)
-                
-                # 生成资金流向数据
-                money_flow = generate_money_flow(amount)
-                super_large_inflow.append(money_flow['super_large_inflow'])
-                super_large_outflow.append(money_flow['super_large_outflow'])
-                large_inflow.append(money_flow['large_inflow'])
-                large_outflow.append(money_flow['large_outflow'])
-                net_inflow.append(money_flow['net_inflow'])
+            # 资金流向按 (ts_code, trade_date) 主键范围读取
+            flow = detail_money_flow(get_stock_money_flow(conn.cursor(), stock_code, start_date, end_date), dates)
+
+            stock_data = {
+                'name': stock_info['name'],
+                'code': stock_info['code'],
+                'dates': dates
+            }
+            if compact:
+                stock_data['format'] = 'compact'
+                series.update({key: np.array(values, dtype=np.float64) for key, values in flow.items()})
+                stock_data.update({key: encode_array(values, binary) for key, values in series.items()})
+            else:
+                # 行情缺失记 0，资金流向缺失为 null，与原有格式一致
+                stock_data.update({key: np.nan_to_num(values).tolist() for key, values in series.items()})
+                stock_data.update(flow)
+            
+            # 技术指标按日期与行情对齐
+            if indicator_groups:
+                bars = [(row['high'], row['low'], row['close']) for row in price_data]
+                stock_data['indicators'] = get_stock_indicators(conn.cursor(), stock_code, dates,
+                                                                indicator_groups, bars)
 
             logger.info(f"成功获取股票 {stock_code} 的详细信息")
-            return jsonify({
+            result = {
                 'success': True,
-                'stock_data': {
-                    'name': stock_info['name'],
-                    'code': stock_info['code'],
-                    'dates': dates,
-                    'opens': opens,
-                    'highs': highs,
-                    'lows': lows,
-                    'closes': closes,
-                    'volumes': volumes,
-                    'changes': changes,
-                    'super_large_inflow': super_large_inflow,
-                    'super_large_outflow': super_large_outflow,
-                    'large_inflow': large_inflow,
-                    'large_outflow': large_outflow,
-                    'net_inflow': net_inflow
-                },
+                'stock_data': stock_data,
                 'sectors': sectors
-            })
+            }
+            return json_response(result) if compact else jsonify(result)
             
     except Exception as e:
         log_error(logger, f"获取股票详情失败: {str(e)}")
@@ -177,22 +163,101 @@ def get_stock_detail(stock_code):
 
     # 添加其他股票相关路由... 
 
-# 在获取股票历史数据后，添加资金流向数据的模拟计算
-def generate_money_flow(amount):
-    """根据成交额生成资金流向数据"""
-    import random
-    base = amount * 0.01  # 基准金额为成交额的1%
+@app.route('/api/stocks/ranking')
+@versioned_response
+def get_stock_ranking():
+    """区间排行: metric=return|amount|turnover，order=top|bottom，n 默认 20，sector_id 限定板块"""
+    try:
+        try:
+            start_date, end_date = parse_window(request.args, DEFAULT_START_DATE)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': f"日期参数错误: {str(e)}"
+            }), 400
+        
+        try:
+            ranking = get_ranking_service().rank(
+                request.args.get('metric', 'return'),
+                start_date,
+                end_date,
+                n=request.args.get('n', 20),
+                order=request.args.get('order', 'top'),
+                sector_id=request.args.get('sector_id', type=int)
+            )
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+        except RuntimeError as e:
+            return jsonify({
+                'success': False,
+                'message': f"排行暂不可用: {str(e)}"
+            }), 503
+        
+        return jsonify(dict(ranking, success=True))
+        
+    except Exception as e:
+        error_msg = f"获取股票排行失败: {str(e)}"
+        logger.error(error_msg)
+        return jsonify({
+            'success': False,
+            'message': error_msg
+        }), 500
+
+@app.route('/api/stocks/screen')
+@versioned_response
+def screen_stocks():
+    """按最新每日指标筛选: 字段=下限..上限，sort=-total_mv,pe_ttm，limit，sector_id"""
+    try:
+        try:
+            result = get_screener().screen(**parse_screen_args(request.args))
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+        
+        return jsonify(dict(result, success=True))
+        
+    except Exception as e:
+        error_msg = f"筛选股票失败: {str(e)}"
+        logger.error(error_msg)
+        return jsonify({
+            'success': False,
+            'message': error_msg
+        }), 500
+
+@app.route('/api/get_money_flow/<string:stock_code>')
+@versioned_response
+@cached_response
+def get_money_flow(stock_code):
+    """个股 start/end 区间每日资金流向（成交量单位手，金额单位万元），读 moneyflow"""
+    try:
+        try:
+            start_date, end_date = parse_window(request.args, DEFAULT_START_DATE)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': f"日期参数错误: {str(e)}"
+            }), 400
     
-    # 生成资金流向数据
-    super_large_in = base * (0.8 + random.random() * 0.4)  # 80%-120%
-    super_large_out = base * (0.8 + random.random() * 0.4)
-    large_in = base * (0.6 + random.random() * 0.4)   # 60%-100%
-    large_out = base * (0.6 + random.random() * 0.4)
+        stock_code = normalize_stock_code(stock_code)
+        if not get_reference_data().has_stock(stock_code):
+            return jsonify({
+                'success': False,
+                'message': f'未找到股票: {stock_code}'
+            }), 404
     
-    return {
-        'super_large_inflow': round(super_large_in),
-        'super_large_outflow': round(super_large_out),
-        'large_inflow': round(large_in),
-        'large_outflow': round(large_out),
-        'net_inflow': round(super_large_in + large_in - super_large_out - large_out)
-    } 
\ No newline at end of file
+        with get_mysql_connection() as conn:
+            flow = get_stock_money_flow(conn.cursor(), stock_code, start_date, end_date)
+        return jsonify(dict(flow, success=True, code=stock_code))
+        
+    except Exception as e:
+        error_msg = f"获取资金流向失败: {str(e)}"
+        logger.error(error_msg)
+        return jsonify({
+            'success': False,
+            'message': error_msg
+        }), 500
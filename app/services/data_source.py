@@ -0,0 +1,295 @@
+from utils.logger import setup_logger
+from config.config import TUSHARE_TOKEN, DATA_SOURCE_CONFIG
+from datetime import datetime
+import hashlib
+import json
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+logger = setup_logger('data_source')
+
+class TushareDataSource:
+    """Tushare 数据源，接口与 ts.pro_api() 一致
+
+    首次调用接口时才创建 pro_api，Web 进程注册数据更新路由时不需要连接 Tushare
+    """
+
+    def __init__(self, token=None):
+        self.token = token or TUSHARE_TOKEN
+        self._pro = None
+        self._lock = threading.Lock()
+
+    @property
+    def pro(self):
+        with self._lock:
+            if self._pro is None:
+                import tushare as ts
+                self._pro = ts.pro_api(self.token)
+            return self._pro
+
+    def query(self, api_name, **kwargs):
+        return self.pro.query(api_name, **kwargs)
+
+    def daily(self, **kwargs):
+        return self.query('daily', **kwargs)
+
+    def daily_basic(self, **kwargs):
+        return self.query('daily_basic', **kwargs)
+
+    def moneyflow(self, **kwargs):
+        return self.query('moneyflow', **kwargs)
+
+    def stock_basic(self, **kwargs):
+        return self.query('stock_basic', **kwargs)
+
+    def trade_cal(self, **kwargs):
+        return self.query('trade_cal', **kwargs)
+
+class RecordingDataSource:
+    """包装真实数据源，把每次调用的返回结果保存到录制目录，供 FakeDataSource 回放"""
+
+    def __init__(self, source, record_dir):
+        self.source = source
+        self.record_dir = record_dir
+        os.makedirs(record_dir, exist_ok=True)
+
+    def query(self, api_name, **kwargs):
+        df = self.source.query(api_name, **kwargs)
+        if df is not None:
+            df.to_pickle(record_path(self.record_dir, api_name, kwargs))
+        return df
+
+    def daily(self, **kwargs):
+        return self.query('daily', **kwargs)
+
+    def daily_basic(self, **kwargs):
+        return self.query('daily_basic', **kwargs)
+
+    def moneyflow(self, **kwargs):
+        return self.query('moneyflow', **kwargs)
+
+    def stock_basic(self, **kwargs):
+        return self.query('stock_basic', **kwargs)
+
+    def trade_cal(self, **kwargs):
+        return self.query('trade_cal', **kwargs)
+
+class FakeDataSource:
+    """离线数据源
+
+    优先回放录制目录中与调用参数完全一致的结果，没有则生成确定性的模拟数据。
+    latency: 每次调用的模拟网络延迟（秒）
+    rate_limit: 每个接口每分钟调用上限，超过时与 Tushare 一样抛出异常；None 表示不限
+    """
+
+    def __init__(self, record_dir=None, latency=0.0, rate_limit=None, num_stocks=5000):
+        self.record_dir = record_dir
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.num_stocks = num_stocks
+        self.call_count = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._codes = _fake_codes(num_stocks)
+
+    def query(self, api_name, **kwargs):
+        self._check_rate_limit(api_name)
+        if self.latency:
+            time.sleep(self.latency)
+
+        if self.record_dir:
+            path = record_path(self.record_dir, api_name, kwargs)
+            if os.path.exists(path):
+                return pd.read_pickle(path)
+
+        generator = getattr(self, f'_fake_{api_name}', None)
+        if generator is None:
+            raise ValueError(f"模拟数据源不支持接口: {api_name}")
+        df = generator(**kwargs)
+        return _select_fields(df, kwargs.get('fields'))
+
+    def daily(self, **kwargs):
+        return self.query('daily', **kwargs)
+
+    def daily_basic(self, **kwargs):
+        return self.query('daily_basic', **kwargs)
+
+    def moneyflow(self, **kwargs):
+        return self.query('moneyflow', **kwargs)
+
+    def stock_basic(self, **kwargs):
+        return self.query('stock_basic', **kwargs)
+
+    def trade_cal(self, **kwargs):
+        return self.query('trade_cal', **kwargs)
+
+    def _check_rate_limit(self, api_name):
+        with self._lock:
+            self.call_count += 1
+            if self.rate_limit is None:
+                return
+            now = time.time()
+            calls = [t for t in self._calls.get(api_name, []) if now - t < 60]
+            if len(calls) >= self.rate_limit:
+                self._calls[api_name] = calls
+                raise Exception(f"抱歉，您每分钟最多访问该接口{self.rate_limit}次")
+            calls.append(now)
+            self._calls[api_name] = calls
+
+    def _fake_stock_basic(self, **kwargs):
+        return pd.DataFrame({
+            'ts_code': self._codes,
+            'symbol': [code[:6] for code in self._codes],
+            'name': [f'模拟{i:04d}' for i in range(len(self._codes))],
+            'list_date': '20100101'
+        })
+
+    def _fake_trade_cal(self, exchange='SSE', start_date=None, end_date=None, is_open=None, **kwargs):
+        dates = pd.date_range(start_date or '20240101', end_date or time.strftime('%Y%m%d'))
+        df = pd.DataFrame({
+            'exchange': exchange,
+            'cal_date': dates.strftime('%Y%m%d'),
+            'is_open': (dates.dayofweek < 5).astype(int)
+        })
+        if is_open is not None:
+            df = df[df['is_open'] == int(is_open)]
+        return df.reset_index(drop=True)
+
+    def _fake_daily(self, ts_code=None, trade_date=None, start_date=None, end_date=None, **kwargs):
+        if trade_date:
+            dates = [trade_date]
+        else:
+            cal = self._fake_trade_cal(start_date=start_date, end_date=end_date, is_open='1')
+            dates = list(cal['cal_date'])
+        codes = ts_code.split(',') if ts_code else self._codes
+        dates = [d for d in dates if _is_weekday(d)]
+
+        # 与 Tushare 一致，按日期倒序返回
+        return self._bars(codes, sorted(dates, reverse=True))
+
+    def _fake_daily_basic(self, ts_code=None, trade_date=None, **kwargs):
+        codes = ts_code.split(',') if ts_code else self._codes
+        if not trade_date or not _is_weekday(trade_date):
+            return pd.DataFrame(columns=['ts_code', 'trade_date'])
+        bars = self._bars(codes, [trade_date])
+        seed = _stock_seed(codes)
+        total_share = 10000 + seed % 500000
+        float_share = total_share * 0.8
+        return pd.DataFrame({
+            'ts_code': codes,
+            'trade_date': trade_date,
+            'close': bars['close'],
+            'turnover_rate': np.round(bars['vol'] / float_share, 4),
+            'turnover_rate_f': np.round(bars['vol'] / (float_share * 0.7), 4),
+            'volume_ratio': np.round(0.5 + (seed % 200) / 100, 2),
+            'pe': np.round(5 + seed % 80 + bars['pct_chg'] / 10, 4),
+            'pe_ttm': np.round(5 + seed % 70 + bars['pct_chg'] / 10, 4),
+            'pb': np.round(0.5 + (seed % 90) / 10, 4),
+            'ps': np.round(0.3 + (seed % 50) / 10, 4),
+            'ps_ttm': np.round(0.3 + (seed % 40) / 10, 4),
+            'dv_ratio': np.round((seed % 50) / 10, 4),
+            'dv_ttm': np.round((seed % 45) / 10, 4),
+            'total_share': total_share,
+            'float_share': float_share,
+            'free_share': float_share * 0.7,
+            'total_mv': np.round(total_share * bars['close'], 4),
+            'circ_mv': np.round(float_share * bars['close'], 4)
+        })
+
+    def _fake_moneyflow(self, ts_code=None, trade_date=None, **kwargs):
+        codes = ts_code.split(',') if ts_code else self._codes
+        if not trade_date or not _is_weekday(trade_date):
+            return pd.DataFrame(columns=['ts_code', 'trade_date'])
+        bars = self._bars(codes, [trade_date])
+        seed = _stock_seed(codes)
+        vol = bars['vol'].to_numpy()
+        amount = bars['amount'].to_numpy() / 10  # 千元 -> 万元
+        df = pd.DataFrame({'ts_code': codes, 'trade_date': trade_date})
+        # 主动买入、卖出各占成交的一半左右，再按 小/中/大/特大 单拆分
+        buy_share = 0.5 + ((seed + int(trade_date)) % 21 - 10) / 100
+        sizes = ['sm', 'md', 'lg', 'elg']
+        for side, share, offset in [('buy', buy_share, 0), ('sell', 1 - buy_share, 7)]:
+            weights = np.stack([(seed + offset + k) % 5 + 1 for k in range(4)]).astype(float)
+            weights = weights / weights.sum(axis=0) * share
+            for size, weight in zip(sizes, weights):
+                df[f'{side}_{size}_vol'] = np.round(vol * weight)
+                df[f'{side}_{size}_amount'] = np.round(amount * weight, 2)
+        df['net_mf_vol'] = sum(df[f'buy_{s}_vol'] - df[f'sell_{s}_vol'] for s in sizes)
+        df['net_mf_amount'] = np.round(sum(df[f'buy_{s}_amount'] - df[f'sell_{s}_amount'] for s in sizes), 2)
+        columns = [f'{side}_{size}_{unit}' for size in sizes for side in ['buy', 'sell'] for unit in ['vol', 'amount']]
+        return df[['ts_code', 'trade_date'] + columns + ['net_mf_vol', 'net_mf_amount']]
+
+    def _bars(self, codes, trade_dates):
+        """按 (股票, 日期) 确定性生成行情，按日期、股票展开；两种查询方式得到的数据一致"""
+        seed = np.tile(_stock_seed(codes), len(trade_dates))
+        day = np.repeat([datetime.strptime(d, '%Y%m%d').toordinal() for d in trade_dates],
+                        len(codes)).astype(np.int64)
+        base = 5 + seed % 95
+
+        def price(d):
+            return base * (1 + 0.2 * np.sin(d / 9.0 + seed % 17))
+
+        pre_close = np.round(price(day - 1), 2)
+        close = np.round(price(day), 2)
+        open_ = np.round((pre_close + close) / 2, 2)
+        high = np.maximum(open_, close) * 1.01
+        low = np.minimum(open_, close) * 0.99
+        vol = 10000.0 + (seed * 7 + day) % 200000
+        return pd.DataFrame({
+            'ts_code': np.tile(np.asarray(codes, dtype=object), len(trade_dates)),
+            'trade_date': np.repeat(np.asarray(trade_dates, dtype=object), len(codes)),
+            'open': open_,
+            'high': np.round(high, 2),
+            'low': np.round(low, 2),
+            'close': close,
+            'pre_close': pre_close,
+            'change': np.round(close - pre_close, 2),
+            'pct_chg': np.round((close - pre_close) / pre_close * 100, 4),
+            'vol': vol,
+            'amount': np.round(vol * close / 10, 3)  # 千元
+        })
+
+def record_path(record_dir, api_name, kwargs):
+    """录制文件路径，由接口名和调用参数决定"""
+    key = json.dumps(kwargs, sort_keys=True, ensure_ascii=False, default=str)
+    digest = hashlib.md5(key.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(record_dir, f'{api_name}_{digest}.pkl')
+
+def _fake_codes(num_stocks):
+    codes = []
+    for i in range(num_stocks):
+        if i % 2 == 0:
+            codes.append(f'{600000 + i // 2:06d}.SH')
+        else:
+            codes.append(f'{i // 2 + 1:06d}.SZ')
+    return codes
+
+def _stock_seed(codes):
+    return np.array([int(code[:6]) for code in codes], dtype=np.int64)
+
+def _is_weekday(trade_date):
+    return datetime.strptime(trade_date, '%Y%m%d').weekday() < 5
+
+def _select_fields(df, fields):
+    if not fields or df is None or df.empty:
+        return df
+    if isinstance(fields, str):
+        fields = [f.strip() for f in fields.split(',') if f.strip()]
+    return df[[f for f in fields if f in df.columns]]
+
+def get_data_source():
+    """按 DATA_SOURCE_CONFIG 创建数据源"""
+    source_type = DATA_SOURCE_CONFIG['TYPE']
+    if source_type == 'fake':
+        logger.info("使用离线模拟数据源")
+        return FakeDataSource(record_dir=DATA_SOURCE_CONFIG['RECORD_DIR'],
+                              latency=DATA_SOURCE_CONFIG['FAKE_LATENCY'],
+                              rate_limit=DATA_SOURCE_CONFIG['FAKE_RATE_LIMIT'])
+    source = TushareDataSource()
+    if source_type == 'record':
+        logger.info(f"使用 Tushare 数据源并录制到 {DATA_SOURCE_CONFIG['RECORD_DIR']}")
+        return RecordingDataSource(source, DATA_SOURCE_CONFIG['RECORD_DIR'])
+    return source
\ No newline at end of file
@@ -1,14 +1,56 @@
 from utils.logger import setup_logger
-from utils.database import get_mysql_connection
-import tushare as ts
+from utils.database import get_mysql_connection, bulk_upsert
+from utils.date_utils import to_date_str
+from utils.data_version import bump_version, DATA_VERSION
+from utils.rate_limiter import get_rate_limiter
+from utils.fetch_pool import run_fetch_pipeline
+from config.config import (INGESTION_CONFIG, TUSHARE_RATE_LIMIT, TUSHARE_DAILY_BASIC_RATE_LIMIT,
+                           TUSHARE_MONEYFLOW_RATE_LIMIT)
+from app.services.data_source import get_data_source
+from app.services.trade_calendar import TradeCalendar, get_trade_calendar
+from app.services.screener import DAILY_BASIC_VERSION
+from app.services.money_flow import MONEYFLOW_COLUMNS, rollup_sector_moneyflow
 import json
 import os
+import time
 
 logger = setup_logger('data_updater')
 
+# 日线行情字段
+DAILY_FIELDS = 'ts_code,trade_date,open,high,low,close,pre_close,change,pct_chg,vol,amount'
+# stock_data 写入列
+STOCK_DATA_COLUMNS = ['ts_code', 'trade_date', 'open', 'high', 'low', 'close', 'pre_close',
+                      'change', 'pct_chg', 'vol', 'amount']
+# daily_basic 写入列
+DAILY_BASIC_COLUMNS = ['ts_code', 'trade_date', 'close', 'turnover_rate', 'turnover_rate_f',
+                       'volume_ratio', 'pe', 'pe_ttm', 'pb', 'ps', 'ps_ttm', 'dv_ratio',
+                       'dv_ttm', 'total_share', 'float_share', 'free_share', 'total_mv',
+                       'circ_mv']
+# 历史数据起始日期
+HISTORY_START_DATE = '20240920'
+# 进度检查点文件，中断后据此续传
+PROGRESS_FILE = 'update_progress.json'
+# 检查点最短写入间隔（秒）
+CHECKPOINT_INTERVAL = 2
+
 class StockDataUpdater:
-    def __init__(self):
-        self.pro = ts.pro_api()
+    def __init__(self, data_source=None, rate_limiter=None):
+        """data_source 为空时使用配置的数据源，各接口使用进程内共享的 Tushare 限流器
+
+        注入的数据源（如离线模拟）不占用 Tushare 配额，默认不限流；
+        需要时传入 rate_limiter，由所有接口共用
+        """
+        if data_source is not None:
+            # 注入的数据源使用独立的内存日历，不写本地缓存
+            self.pro = data_source
+            self.calendar = TradeCalendar(data_source=data_source, cache_file='')
+            self.rate_limiter = self.daily_basic_limiter = self.moneyflow_limiter = rate_limiter
+        else:
+            self.pro = get_data_source()
+            self.calendar = get_trade_calendar()
+            self.rate_limiter = rate_limiter or get_rate_limiter('tushare', TUSHARE_RATE_LIMIT)
+            self.daily_basic_limiter = get_rate_limiter('tushare_daily_basic', TUSHARE_DAILY_BASIC_RATE_LIMIT)
+            self.moneyflow_limiter = get_rate_limiter('tushare_moneyflow', TUSHARE_MONEYFLOW_RATE_LIMIT)
         self.update_status = {
             'is_running': False,
             'progress': 0,
@@ -17,68 +59,70 @@ class StockDataUpdater:
             'current_index': 0,
             'total_stocks': 0,
             'updated_count': 0,
+            'rows_written': 0,
+            'rows_per_sec': 0,
             'status': 'idle'
         }
+        self.batch_size = INGESTION_CONFIG['BATCH_SIZE']
+        self._write_seconds = 0
+        self._tasks = []
+        self._cancel_event = None
+        self._last_checkpoint = 0
+        
+    def update_historical_data(self, mode='date', full=False, resume=True, cancel_event=None, sink=None):
+        """更新历史数据
         
-    def update_historical_data(self):
-        """更新历史数据"""
+        mode='date'  按交易日拉取全市场数据，每个待更新交易日调用一次接口
+        mode='stock' 按股票逐只拉取
+        full=False 增量更新，只拉取库中最新交易日（水位）之后的数据；
+        full=True  从 HISTORY_START_DATE 起全量重新拉取
+        resume=True 上次同参数的更新未完成时，从检查点的 current_index 继续
+        cancel_event 置位后停止派发新任务，已拉取的数据写完后退出
+        sink(df) 不为空时日线交给 sink 写入（返回 {'rows', 'seconds'}），不连接数据库:
+        任务按全量从数据源构建，不读写检查点，也不递增数据版本；用于基准测试等离线场景
+        """
         try:
             self.update_status['is_running'] = True
             self.update_status['status'] = 'running'
             self.update_status['error_logs'] = []
+            self.update_status['rows_written'] = 0
+            self.update_status['rows_per_sec'] = 0
+            self._write_seconds = 0
+            self._tasks = []
+            self._cancel_event = cancel_event
             
-            with get_mysql_connection() as conn:
-                cursor = conn.cursor(dictionary=True)
-                
-                # 获取所有股票列表
-                cursor.execute('SELECT 证券代码, 证券简称 FROM stocks')
-                stocks = cursor.fetchall()
-                
-                self.update_status['total_stocks'] = len(stocks)
-                self.update_status['current_index'] = 0
+            if sink is not None:
+                tasks = self._build_source_tasks(mode)
                 self.update_status['updated_count'] = 0
+                self.update_status['mode'] = mode
+                self.update_status['full'] = True
+                self._run_pipeline(None, mode, tasks, sink=sink)
+            else:
+                with get_mysql_connection() as conn:
+                    cursor = conn.cursor(dictionary=True)
+                    
+                    checkpoint = self._load_checkpoint(mode, full) if resume else None
+                    if checkpoint:
+                        tasks = checkpoint['tasks']
+                        start_index = checkpoint['current_index']
+                        self.update_status['updated_count'] = checkpoint.get('updated_count', 0)
+                        logger.info(f"从检查点续传: {start_index}/{len(tasks)}")
+                    else:
+                        if mode == 'stock':
+                            tasks = self._build_stock_tasks(cursor, full)
+                        else:
+                            tasks = self._build_date_tasks(cursor, full)
+                        start_index = 0
+                        self.update_status['updated_count'] = 0
+                    
+                    self.update_status['mode'] = mode
+                    self.update_status['full'] = full
+                    self._run_pipeline(conn, mode, tasks, start_index)
                 
-                for index, stock in enumerate(stocks):
-                    try:
-                        self.update_status['current_index'] = index + 1
-                        self.update_status['current_stock'] = f"{stock['证券简称']}({stock['证券代码']})"
-                        
-                        # 获取历史数据
-                        df = self.pro.daily(ts_code=stock['证券代码'], 
-                                          start_date='20240920',
-                                          fields='ts_code,trade_date,open,high,low,close,pre_close,change,pct_chg,vol,amount')
-                        
-                        if df is not None and not df.empty:
-                            # 插入或更新数据
-                            for _, row in df.iterrows():
-                                cursor.execute('''
-                                    INSERT INTO stock_data 
-                                    (ts_code, trade_date, open, high, low, close, pre_close, 
-                                     change, pct_chg, vol, amount)
-                                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                                    ON DUPLICATE KEY UPDATE
-                                    open = VALUES(open),
-                                    high = VALUES(high),
-                                    low = VALUES(low),
-                                    close = VALUES(close),
-                                    pre_close = VALUES(pre_close),
-                                    `change` = VALUES(`change`),
-                                    pct_chg = VALUES(pct_chg),
-                                    vol = VALUES(vol),
-                                    amount = VALUES(amount)
-                                ''', (
-                                    row['ts_code'], row['trade_date'], row['open'], row['high'],
-                                    row['low'], row['close'], row['pre_close'], row['change'],
-                                    row['pct_chg'], row['vol'], row['amount']
-                                ))
-                            
-                            conn.commit()
-                            self.update_status['updated_count'] += 1
-                            
-                    except Exception as e:
-                        error_msg = f"更新 {stock['证券简称']}({stock['证券代码']}) 失败: {str(e)}"
-                        logger.error(error_msg)
-                        self.update_status['error_logs'].append(error_msg)
+            if cancel_event is not None and cancel_event.is_set():
+                self.update_status['status'] = 'stopped'
+                logger.info(f"历史数据更新已停止，进度 {self.update_status['current_index']}/{len(tasks)}")
+                return {'success': True, 'message': '更新已停止'}
                 
             self.update_status['status'] = 'completed'
             logger.info("历史数据更新完成")
@@ -93,16 +137,357 @@ class StockDataUpdater:
             
         finally:
             self.update_status['is_running'] = False
-            self._save_status()
+            self._cancel_event = None
+            if sink is None:
+                # 有新日线入库时递增全局数据版本，读接口的 ETag 随之变化
+                if self.update_status['rows_written']:
+                    bump_version(DATA_VERSION)
+                self._save_status()
+    
+    def _build_date_tasks(self, cursor, full=False):
+        """按交易日更新的任务列表，一次调用返回当日全市场数据"""
+        trade_dates = self._get_open_dates()
+        if not full:
+            watermark = self._get_global_watermark(cursor)
+            if watermark:
+                trade_dates = [d for d in trade_dates if d > watermark]
+            logger.info(f"增量更新，当前水位 {watermark}")
+        logger.info(f"待更新交易日 {len(trade_dates)} 个")
+        return trade_dates
+        
+    def _build_stock_tasks(self, cursor, full=False):
+        """按股票更新的任务列表"""
+        # 获取所有股票列表
+        cursor.execute('SELECT 证券代码, 证券简称 FROM stocks')
+        stocks = cursor.fetchall()
+        
+        if full:
+            for stock in stocks:
+                stock['start_date'] = HISTORY_START_DATE
+        else:
+            stocks = self._filter_stale_stocks(cursor, stocks)
+        logger.info(f"待更新股票 {len(stocks)} 只")
+        return stocks
+        
+    def _build_source_tasks(self, mode):
+        """不依赖数据库的全量任务列表: 交易日来自交易日历，股票来自数据源的 stock_basic"""
+        if mode == 'stock':
+            stocks = self.pro.stock_basic()
+            names = stocks['name'] if 'name' in stocks.columns else stocks['ts_code']
+            return [{'证券代码': code, '证券简称': name, 'start_date': HISTORY_START_DATE}
+                    for code, name in zip(stocks['ts_code'], names)]
+        return self._get_open_dates()
+        
+    def _fetch(self, mode, task):
+        if mode == 'stock':
+            return self.pro.daily(ts_code=task['证券代码'],
+                                  start_date=task['start_date'],
+                                  fields=DAILY_FIELDS)
+        return self.pro.daily(trade_date=task, fields=DAILY_FIELDS)
+        
+    def _describe(self, mode, task):
+        if mode == 'stock':
+            return f"{task['证券简称']}({task['证券代码']})"
+        return f"交易日 {task}"
+        
+    def _run_pipeline(self, conn, mode, tasks, start_index=0, sink=None):
+        """并发拉取任务数据，经有界队列交给当前线程写库（给出 sink 时写入 sink，不写检查点）
+        
+        任务可能乱序完成，current_index 只推进到连续完成的位置，
+        续传时从该位置重新开始，之后已完成的少量任务会被幂等地重复写入
+        """
+        self._tasks = tasks
+        self.update_status['total_stocks'] = len(tasks)
+        self._set_index(start_index)
+        done = set()
+        
+        def mark_done(index):
+            done.add(index)
+            next_index = self.update_status['current_index']
+            while next_index in done:
+                done.discard(next_index)
+                next_index += 1
+            self._set_index(next_index)
+            if sink is None:
+                self._save_checkpoint()
+            
+        def write(item, df):
+            index, task = item
+            self.update_status['current_stock'] = self._describe(mode, task)
+            if df is not None and not df.empty:
+                if sink is not None:
+                    self._record_write(sink(df))
+                else:
+                    self.write_stock_data(conn, df)
+                self.update_status['updated_count'] += 1
+            else:
+                logger.warning(f"{self._describe(mode, task)} 未获取到日线数据")
+            mark_done(index)
+            
+        def handle_error(item, e):
+            index, task = item
+            error_msg = f"更新 {self._describe(mode, task)} 失败: {str(e)}"
+            logger.error(error_msg)
+            self.update_status['error_logs'].append(error_msg)
+            mark_done(index)
+            
+        items = list(enumerate(tasks))[start_index:]
+        return run_fetch_pipeline(items, lambda item: self._fetch(mode, item[1]), write,
+                                  rate_limiter=self.rate_limiter,
+                                  workers=INGESTION_CONFIG['FETCH_WORKERS'],
+                                  queue_size=INGESTION_CONFIG['QUEUE_SIZE'],
+                                  on_error=handle_error,
+                                  stop_event=self._cancel_event)
+    
+    def _set_index(self, index):
+        total = self.update_status['total_stocks']
+        self.update_status['current_index'] = index
+        self.update_status['progress'] = round(index / total * 100, 2) if total else 100
+        
+    def _filter_stale_stocks(self, cursor, stocks):
+        """按每只股票的水位筛选需要更新的股票，并设置各自的起始日期"""
+        open_dates = self._get_open_dates()
+        if not open_dates:
+            return []
+        latest_trade_date = open_dates[-1]
+        watermarks = self._get_stock_watermarks(cursor)
+        
+        stale_stocks = []
+        for stock in stocks:
+            watermark = watermarks.get(stock['证券代码'])
+            if watermark is None:
+                stock['start_date'] = HISTORY_START_DATE
+            elif watermark >= latest_trade_date:
+                continue  # 已是最新
+            else:
+                stock['start_date'] = self.calendar.next_trading_day(watermark)
+            stale_stocks.append(stock)
+            
+        logger.info(f"最新交易日 {latest_trade_date}，跳过已是最新的股票 {len(stocks) - len(stale_stocks)} 只")
+        return stale_stocks
+        
+    def _get_global_watermark(self, cursor):
+        """获取全市场水位（库中最新交易日）"""
+        cursor.execute('SELECT MAX(trade_date) AS max_date FROM stock_data')
+        row = cursor.fetchone()
+        return to_date_str(row['max_date']) if row and row['max_date'] else None
+        
+    def _get_stock_watermarks(self, cursor):
+        """获取每只股票的水位 {ts_code: 最新交易日}"""
+        cursor.execute('''
+            SELECT ts_code, MAX(trade_date) AS max_date
+            FROM stock_data
+            GROUP BY ts_code
+        ''')
+        return {row['ts_code']: to_date_str(row['max_date']) for row in cursor.fetchall()}
+        
+    def _get_open_dates(self, start_date=HISTORY_START_DATE, end_date=None):
+        """获取区间内的交易日列表（升序），end_date 默认为今天"""
+        return self.calendar.trading_days(start_date, end_date)
+    
+    def write_stock_data(self, conn, df):
+        """批量写入日线数据，已存在则更新"""
+        stats = bulk_upsert(conn, 'stock_data', df, STOCK_DATA_COLUMNS,
+                            batch_size=self.batch_size)
+        return self._record_write(stats)
+        
+    def _record_write(self, stats):
+        """累计写入行数和写入速度"""
+        self.update_status['rows_written'] += stats['rows']
+        self._write_seconds += stats['seconds']
+        if self._write_seconds > 0:
+            self.update_status['rows_per_sec'] = round(self.update_status['rows_written'] / self._write_seconds)
+        return stats
+        
+    def update_daily_basic(self, trade_date=None, end_date=None, force=False, cancel_event=None):
+        """更新每日指标数据
+        
+        只给 trade_date 时更新单日，同时给 end_date 时回补区间内的所有交易日；
+        trade_date 为空时更新最近一个交易日。已完整入库的交易日直接跳过（force=True 时重新拉取），
+        各交易日并发拉取，批量写入，重复执行结果相同；cancel_event 置位后停止派发新的交易日
+        """
+        def on_written(conn, updated_dates):
+            # 通知各进程重新加载筛选用的每日指标快照
+            bump_version(DAILY_BASIC_VERSION)
+                
+        return self._backfill_by_trade_date('daily_basic', 'daily_basic', DAILY_BASIC_COLUMNS,
+                                            self.daily_basic_limiter, '每日指标', trade_date, end_date,
+                                            force=force, cancel_event=cancel_event,
+                                            fields=DAILY_BASIC_COLUMNS, on_written=on_written)
+    
+    def update_moneyflow(self, trade_date=None, end_date=None, force=False, cancel_event=None):
+        """更新个股资金流向（按交易日拉取全市场），写入后重算这些交易日的板块资金流向汇总
+
+        参数与 update_daily_basic 相同: 只给 trade_date 时更新单日，同时给 end_date 时回补区间，
+        trade_date 为空时更新最近一个交易日；已完整入库的交易日跳过（force=True 时重新拉取），
+        cancel_event 置位后停止派发新的交易日
+        """
+        def on_written(conn, updated_dates):
+            rollup_sector_moneyflow(conn, trade_dates=updated_dates)
+            bump_version(DATA_VERSION)
+            
+        return self._backfill_by_trade_date('moneyflow', 'moneyflow', MONEYFLOW_COLUMNS,
+                                            self.moneyflow_limiter, '资金流向', trade_date, end_date,
+                                            force=force, cancel_event=cancel_event, on_written=on_written)
+    
+    def _backfill_by_trade_date(self, api, table, columns, limiter, label, trade_date=None, end_date=None,
+                                force=False, cancel_event=None, fields=None, on_written=None):
+        """按交易日拉取全市场数据（数据源接口 api）写入 table
+        
+        交易日的确定、跳过已完整入库的交易日、并发拉取和批量写入由每日指标、资金流向共用；
+        有交易日写入时在同一连接中调用 on_written(conn, 写入的交易日)
+        """
+        try:
+            if trade_date is None:
+                latest = self.calendar.latest_trading_day()
+                trade_dates = [latest] if latest else []
+            else:
+                trade_dates = self._get_open_dates(trade_date, end_date or trade_date)
+                
+            if not trade_dates:
+                logger.warning(f"{trade_date} 至 {end_date or trade_date} 没有交易日")
+                return {'success': True, 'message': '没有需要更新的交易日', 'updated_dates': [],
+                        'skipped_dates': [], 'rows': 0}
+            
+            with get_mysql_connection() as conn:
+                cursor = conn.cursor(dictionary=True)
+                skipped_dates = [] if force else self._get_complete_dates(cursor, table, trade_dates)
+                skipped = set(skipped_dates)
+                pending_dates = [d for d in trade_dates if d not in skipped]
+                logger.info(f"{label}待更新交易日 {len(pending_dates)} 个，已完整入库跳过 {len(skipped_dates)} 个")
+                
+                updated_dates = []
+                errors = []
+                rows = [0]
+                fetch_api = getattr(self.pro, api)
+                
+                def fetch(date):
+                    if fields is None:
+                        return fetch_api(trade_date=date)
+                    return fetch_api(trade_date=date, fields=fields)
+                    
+                def write(date, df):
+                    if df is None or df.empty:
+                        logger.warning(f"未获取到 {date} 的{label}数据")
+                        return
+                    stats = bulk_upsert(conn, table, df, columns, batch_size=self.batch_size)
+                    rows[0] += stats['rows']
+                    updated_dates.append(date)
+                    
+                def on_error(date, e):
+                    error_msg = f"更新 {date} 的{label}数据失败: {str(e)}"
+                    logger.error(error_msg)
+                    errors.append(error_msg)
+                    
+                run_fetch_pipeline(pending_dates, fetch, write,
+                                   rate_limiter=limiter,
+                                   workers=INGESTION_CONFIG['FETCH_WORKERS'],
+                                   queue_size=INGESTION_CONFIG['QUEUE_SIZE'],
+                                   on_error=on_error,
+                                   stop_event=cancel_event)
+                
+                if updated_dates and on_written is not None:
+                    on_written(conn, sorted(updated_dates))
+            
+            logger.info(f"{label}更新了 {len(updated_dates)} 个交易日，共 {rows[0]} 条记录")
+            return {
+                'success': not errors,
+                'message': '更新完成' if not errors else f'{len(errors)} 个交易日更新失败',
+                'updated_dates': sorted(updated_dates),
+                'skipped_dates': skipped_dates,
+                'rows': rows[0],
+                'errors': errors
+            }
+            
+        except Exception as e:
+            error_msg = f"更新{label}数据失败: {str(e)}"
+            logger.error(error_msg)
+            return {'success': False, 'message': error_msg}
+    
+    def _get_complete_dates(self, cursor, table, trade_dates):
+        """table 中已完整入库的交易日：条数不少于当日日线条数"""
+        placeholders = ','.join(['%s'] * len(trade_dates))
+        cursor.execute(f'''
+            SELECT trade_date, COUNT(*) AS cnt
+            FROM {table}
+            WHERE trade_date IN ({placeholders})
+            GROUP BY trade_date
+        ''', trade_dates)
+        loaded = {to_date_str(row['trade_date']): row['cnt'] for row in cursor.fetchall()}
+        
+        cursor.execute(f'''
+            SELECT trade_date, COUNT(*) AS cnt
+            FROM stock_data
+            WHERE trade_date IN ({placeholders})
+            GROUP BY trade_date
+        ''', trade_dates)
+        expected = {to_date_str(row['trade_date']): row['cnt'] for row in cursor.fetchall()}
+        
+        return [d for d in trade_dates
+                if loaded.get(d, 0) > 0 and loaded[d] >= expected.get(d, 0)]
     
     def get_update_progress(self):
         """获取更新进度"""
         return self.update_status
-    
+        
     def _save_status(self):
-        """保存更新状态到文件"""
+        """保存更新状态到检查点文件（先写临时文件再替换，避免中断时写出半个文件）"""
+        try:
+            checkpoint = dict(self.update_status, tasks=self._tasks)
+            tmp_file = f"{PROGRESS_FILE}.tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump(checkpoint, f, ensure_ascii=False)
+            os.replace(tmp_file, PROGRESS_FILE)
+            self._last_checkpoint = time.time()
+        except Exception as e:
+            logger.error(f"保存更新状态失败: {str(e)}")
+    
+    def _save_checkpoint(self):
+        """按间隔写检查点"""
+        if time.time() - self._last_checkpoint >= CHECKPOINT_INTERVAL:
+            self._save_status()
+    
+    def _load_checkpoint(self, mode, full):
+        """读取未完成且参数相同的检查点，没有则返回 None"""
         try:
-            with open('update_progress.json', 'w') as f:
-                json.dump(self.update_status, f)
+            if not os.path.exists(PROGRESS_FILE):
+                return None
+            with open(PROGRESS_FILE) as f:
+                checkpoint = json.load(f)
         except Exception as e:
-            logger.error(f"保存更新状态失败: {str(e)}")
\ No newline at end of file
+            logger.error(f"读取更新检查点失败: {str(e)}")
+            return None
+            
+        tasks = checkpoint.get('tasks') or []
+        if (checkpoint.get('status') in ('running', 'stopped', 'error')
+                and checkpoint.get('mode', 'stock') == mode
+                and checkpoint.get('full', False) == full
+                and checkpoint.get('current_index', 0) < len(tasks)):
+            return checkpoint
+        return None
+
+if __name__ == '__main__':
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='更新股票历史日线数据')
+    parser.add_argument('--mode', choices=['date', 'stock'], default='date',
+                        help='date 按交易日拉取全市场，stock 按股票逐只拉取')
+    parser.add_argument('--full', action='store_true',
+                        help=f'忽略水位，从 {HISTORY_START_DATE} 起全量重新拉取')
+    parser.add_argument('--no-resume', action='store_true',
+                        help='忽略未完成的检查点，重新开始')
+    args = parser.parse_args()
+    
+    updater = StockDataUpdater()
+    result = updater.update_historical_data(mode=args.mode, full=args.full,
+                                            resume=not args.no_resume)
+    logger.info(result['message'])
+    
+    # 有新数据入库时增量刷新板块日汇总、重建行情立方体、推进技术指标
+    if updater.update_status['rows_written']:
+        from app.services.sector_daily import SectorDailyUpdater
+        from app.services.price_cube import PriceCubeBuilder
+        from app.services.indicators import IndicatorUpdater
+        SectorDailyUpdater().refresh()
+        PriceCubeBuilder().build()
+        IndicatorUpdater().update()
\ No newline at end of file
@@ -0,0 +1,325 @@
+from utils.logger import setup_logger
+from utils.database import get_mysql_connection, bulk_upsert
+from utils.date_utils import to_date_str, format_trade_date
+from utils.data_version import bump_version, DATA_VERSION
+from config.config import INDICATOR_CONFIG
+import os
+import time
+import numpy as np
+import pandas as pd
+
+logger = setup_logger('indicators')
+
+# 技术指标引擎
+#
+# 所有股票的递推状态保存在 股票 × 状态 的数组中，每个交易日用一次数组运算推进全市场，
+# 每只股票的计算量与历史长度无关（O(1)）:
+#   MA/BOLL: 环形缓冲保存最近 60 个收盘价，窗口和、平方和加入新值并减去移出窗口的值
+#   EMA/MACD/RSI/KDJ: 本身就是递推公式，只保存上一日的值
+# 参数与通达信默认参数一致
+
+MA_WINDOWS = [5, 10, 20, 60]
+EMA_WINDOWS = [12, 26]
+MACD_SIGNAL = 9
+RSI_WINDOWS = [6, 12, 24]
+KDJ_WINDOW = 9
+BOLL_WINDOW = 20
+BOLL_WIDTH = 2
+
+CLOSE_BUFFER = max(MA_WINDOWS + [BOLL_WINDOW])
+
+# 接口参数 indicators 可选的指标组及对应的列
+INDICATOR_GROUPS = {
+    'ma': [f'ma{w}' for w in MA_WINDOWS],
+    'ema': [f'ema{w}' for w in EMA_WINDOWS],
+    'macd': ['macd_dif', 'macd_dea', 'macd_hist'],
+    'rsi': [f'rsi{w}' for w in RSI_WINDOWS],
+    'kdj': ['kdj_k', 'kdj_d', 'kdj_j'],
+    'boll': ['boll_upper', 'boll_mid', 'boll_lower']
+}
+INDICATOR_COLUMNS = [column for columns in INDICATOR_GROUPS.values() for column in columns]
+
+class IndicatorState:
+    """全市场的指标递推状态，每只股票一行，新股票首次出现时追加"""
+
+    def __init__(self, codes=(), arrays=None):
+        self.codes = list(codes)
+        self._index = {code: i for i, code in enumerate(self.codes)}
+        self.arrays = arrays if arrays is not None else self._allocate(len(self.codes))
+
+    @staticmethod
+    def _allocate(n):
+        arrays = {
+            'bars': np.zeros(n, dtype=np.int64),  # 已处理的日线数
+            'closes': np.full((n, CLOSE_BUFFER), np.nan),
+            'highs': np.full((n, KDJ_WINDOW), np.nan),
+            'lows': np.full((n, KDJ_WINDOW), np.nan),
+            'prev_close': np.full(n, np.nan),
+            'boll_sq_sum': np.zeros(n),
+            'macd_dea': np.zeros(n),
+            'kdj_k': np.full(n, 50.0),
+            'kdj_d': np.full(n, 50.0)
+        }
+        for w in MA_WINDOWS:
+            arrays[f'ma_sum{w}'] = np.zeros(n)
+        for w in EMA_WINDOWS:
+            arrays[f'ema{w}'] = np.zeros(n)
+        for w in RSI_WINDOWS:
+            arrays[f'rsi_gain{w}'] = np.zeros(n)
+            arrays[f'rsi_loss{w}'] = np.zeros(n)
+        return arrays
+
+    def rows(self, codes):
+        """股票代码对应的行下标，新代码追加到末尾"""
+        new_codes = [code for code in dict.fromkeys(codes) if code not in self._index]
+        if new_codes:
+            extra = self._allocate(len(new_codes))
+            self.arrays = {name: np.concatenate([array, extra[name]]) for name, array in self.arrays.items()}
+            for code in new_codes:
+                self._index[code] = len(self.codes)
+                self.codes.append(code)
+        return np.array([self._index[code] for code in codes], dtype=np.int64)
+
+    def step(self, rows, high, low, close):
+        """用一个交易日的日线推进 rows 对应股票的状态，返回 {列名: 数组}
+
+        rows 不能重复；high/low 缺失时按收盘价处理
+        """
+        a = self.arrays
+        close = np.asarray(close, dtype=np.float64)
+        high = np.where(np.isnan(high), close, high)
+        low = np.where(np.isnan(low), close, low)
+        bars = a['bars'][rows]
+        first = bars == 0
+        values = {}
+
+        # MA: 窗口已满时减去移出窗口的收盘价
+        closes = a['closes']
+        for w in MA_WINDOWS:
+            total = a[f'ma_sum{w}'][rows] + close
+            full = bars >= w
+            total[full] -= closes[rows[full], (bars[full] - w) % CLOSE_BUFFER]
+            a[f'ma_sum{w}'][rows] = total
+            values[f'ma{w}'] = np.where(bars + 1 >= w, total / w, np.nan)
+
+        # BOLL: 中轨为 MA20，标准差由窗口平方和得到（总体标准差）
+        sq_sum = a['boll_sq_sum'][rows] + close * close
+        full = bars >= BOLL_WINDOW
+        dropped = closes[rows[full], (bars[full] - BOLL_WINDOW) % CLOSE_BUFFER]
+        sq_sum[full] -= dropped * dropped
+        a['boll_sq_sum'][rows] = sq_sum
+        mid = values[f'ma{BOLL_WINDOW}']
+        std = np.sqrt(np.maximum(sq_sum / BOLL_WINDOW - mid * mid, 0))
+        values['boll_mid'] = mid
+        values['boll_upper'] = mid + BOLL_WIDTH * std
+        values['boll_lower'] = mid - BOLL_WIDTH * std
+        closes[rows, bars % CLOSE_BUFFER] = close
+
+        # EMA/MACD: 首日取收盘价
+        for w in EMA_WINDOWS:
+            prev = a[f'ema{w}'][rows]
+            ema = np.where(first, close, prev + (close - prev) * 2 / (w + 1))
+            a[f'ema{w}'][rows] = values[f'ema{w}'] = ema
+        dif = values[f'ema{EMA_WINDOWS[0]}'] - values[f'ema{EMA_WINDOWS[1]}']
+        prev = a['macd_dea'][rows]
+        dea = np.where(first, dif, prev + (dif - prev) * 2 / (MACD_SIGNAL + 1))
+        a['macd_dea'][rows] = dea
+        values['macd_dif'] = dif
+        values['macd_dea'] = dea
+        values['macd_hist'] = (dif - dea) * 2
+
+        # RSI: SMA(MAX(C-LC,0),N,1) / SMA(ABS(C-LC),N,1)，第二根日线起有值
+        diff = np.nan_to_num(close - a['prev_close'][rows])
+        gain = np.maximum(diff, 0)
+        loss = np.maximum(-diff, 0)
+        second = bars == 1
+        for w in RSI_WINDOWS:
+            avg_gain = np.where(second, gain, (gain + (w - 1) * a[f'rsi_gain{w}'][rows]) / w)
+            avg_loss = np.where(second, loss, (loss + (w - 1) * a[f'rsi_loss{w}'][rows]) / w)
+            a[f'rsi_gain{w}'][rows] = avg_gain
+            a[f'rsi_loss{w}'][rows] = avg_loss
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rsi = avg_gain / (avg_gain + avg_loss) * 100
+            values[f'rsi{w}'] = np.where(first, np.nan, rsi)
+        a['prev_close'][rows] = close
+
+        # KDJ: RSV 取最近 9 日最高最低价，K、D 初值 50
+        slot = bars % KDJ_WINDOW
+        a['highs'][rows, slot] = high
+        a['lows'][rows, slot] = low
+        hhv = np.nanmax(a['highs'][rows], axis=1)
+        llv = np.nanmin(a['lows'][rows], axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsv = np.where(hhv > llv, (close - llv) / (hhv - llv) * 100, 50)
+        k = a['kdj_k'][rows] * 2 / 3 + rsv / 3
+        d = a['kdj_d'][rows] * 2 / 3 + k / 3
+        a['kdj_k'][rows] = k
+        a['kdj_d'][rows] = d
+        values['kdj_k'] = k
+        values['kdj_d'] = d
+        values['kdj_j'] = k * 3 - d * 2
+
+        a['bars'][rows] = bars + 1
+        return values
+
+    def copy(self):
+        return IndicatorState(self.codes, {name: array.copy() for name, array in self.arrays.items()})
+
+    def save(self, path, resume_date):
+        """保存状态，resume_date 为下次需要从哪个交易日（含）开始推进"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_file = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_file, 'wb') as f:
+            np.savez(f, codes=np.array(self.codes, dtype=str), resume_date=np.array(resume_date),
+                     **self.arrays)
+        os.replace(tmp_file, path)
+
+    @classmethod
+    def load(cls, path):
+        """读取保存的状态，返回 (状态, resume_date)；文件不存在时返回 (None, None)"""
+        if not os.path.exists(path):
+            return None, None
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in data.files if name not in ('codes', 'resume_date')}
+            return cls(data['codes'].tolist(), arrays), str(data['resume_date'])
+
+class IndicatorUpdater:
+    """按交易日推进指标状态，结果写入 stock_indicators
+
+    保存的状态停在最后一个交易日之前，下次更新从该交易日（含）开始，
+    覆盖该交易日在上次更新后才补齐的日线
+    """
+
+    def __init__(self, state_file=None, start_date=None):
+        self.state_file = state_file or INDICATOR_CONFIG['STATE_FILE']
+        self.start_date = start_date or INDICATOR_CONFIG['START_DATE']
+
+    def update(self, full=False):
+        start_time = time.time()
+        state, resume_date = (None, None) if full else IndicatorState.load(self.state_file)
+        if state is None:
+            state, resume_date = IndicatorState(), self.start_date
+
+        rows = 0
+        with get_mysql_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT DISTINCT trade_date FROM stock_data WHERE trade_date >= %s', (resume_date,))
+            dates = sorted(to_date_str(row[0]) for row in cursor.fetchall())
+
+            checkpoint = None
+            chunk = INDICATOR_CONFIG['CHUNK_DATES']
+            for i in range(0, len(dates), chunk):
+                for trade_date, day in self._load_bars(cursor, dates[i:i + chunk]):
+                    if trade_date == dates[-1]:
+                        checkpoint = state.copy()
+                    codes = day['ts_code'].tolist()
+                    values = state.step(state.rows(codes), day['high'].to_numpy(),
+                                        day['low'].to_numpy(), day['close'].to_numpy())
+                    df = pd.DataFrame({column: np.round(values[column], 4) for column in INDICATOR_COLUMNS})
+                    df.insert(0, 'trade_date', trade_date)
+                    df.insert(0, 'ts_code', codes)
+                    rows += bulk_upsert(conn, 'stock_indicators', df,
+                                        ['ts_code', 'trade_date'] + INDICATOR_COLUMNS)['rows']
+
+        if dates:
+            (checkpoint or state).save(self.state_file, dates[-1])
+        if rows:
+            bump_version(DATA_VERSION)
+
+        result = {
+            'success': True,
+            'dates': len(dates),
+            'stocks': len(state.codes),
+            'rows': rows,
+            'seconds': round(time.time() - start_time, 2)
+        }
+        logger.info(f"更新技术指标: {result}")
+        return result
+
+    def _load_bars(self, cursor, trade_dates):
+        """按交易日升序返回 (YYYYMMDD, 当日日线)，没有收盘价的行跳过"""
+        placeholders = ','.join(['%s'] * len(trade_dates))
+        cursor.execute(f'''
+            SELECT ts_code, trade_date, high, low, close
+            FROM stock_data
+            WHERE trade_date IN ({placeholders})
+        ''', trade_dates)
+        df = pd.DataFrame(cursor.fetchall(), columns=['ts_code', 'trade_date', 'high', 'low', 'close'])
+        for column in ['high', 'low', 'close']:
+            df[column] = pd.to_numeric(df[column], errors='coerce')
+        df = df[df['close'].notna()]
+        df['trade_date'] = df['trade_date'].map(to_date_str)
+        return sorted(df.groupby('trade_date'), key=lambda item: item[0])
+
+def parse_indicator_groups(value):
+    """解析 indicators 参数（逗号分隔，all 表示全部），返回指标组列表"""
+    if not value:
+        return []
+    groups = [group.strip().lower() for group in value.split(',') if group.strip()]
+    if 'all' in groups:
+        return list(INDICATOR_GROUPS)
+    unknown = [group for group in groups if group not in INDICATOR_GROUPS]
+    if unknown:
+        raise ValueError(f"不支持的指标: {', '.join(unknown)}，可选 {', '.join(INDICATOR_GROUPS)}")
+    return list(dict.fromkeys(groups))
+
+def get_stock_indicators(cursor, stock_code, dates, groups, bars=None):
+    """个股在 dates（YYYY-MM-DD）上的指标 {列名: [值或 None]}
+
+    优先读 stock_indicators；尚未计算时用 bars（(high, low, close) 列表，与 dates 对应）
+    从区间首日起现算，前几日的均线等会因缺少更早的历史而为空
+    """
+    columns = [column for group in groups for column in INDICATOR_GROUPS[group]]
+    if not columns or not dates:
+        return {column: [] for column in columns}
+
+    cursor.execute(f'''
+        SELECT trade_date, {', '.join(columns)}
+        FROM stock_indicators
+        WHERE ts_code = %s AND trade_date BETWEEN %s AND %s
+    ''', (stock_code, dates[0].replace('-', ''), dates[-1].replace('-', '')))
+    stored = {format_trade_date(row[0]): row[1:] for row in cursor.fetchall()}
+    if stored:
+        result = {column: [] for column in columns}
+        for date in dates:
+            row = stored.get(date)
+            for i, column in enumerate(columns):
+                value = row[i] if row else None
+                result[column].append(float(value) if value is not None else None)
+        return result
+
+    if not bars:
+        return {column: [None] * len(dates) for column in columns}
+    state = IndicatorState()
+    rows = state.rows([stock_code])
+    result = {column: [] for column in columns}
+    for high, low, close in bars:
+        if close is None:
+            for column in columns:
+                result[column].append(None)
+            continue
+        values = state.step(rows, np.array([high], dtype=float), np.array([low], dtype=float), [close])
+        for column in columns:
+            value = float(values[column][0])
+            result[column].append(None if np.isnan(value) else round(value, 4))
+    return result
+
+def submit_indicator_job(full=False):
+    """提交后台指标更新任务；已有更新任务在运行时合并到该任务中，任务结束前再更新一次
+
+    运行期间提交的 full=True 不会丢失，再更新的一遍从头计算
+    """
+    from app.services.job_manager import job_manager
+
+    def run_update(job, params):
+        return IndicatorUpdater().update(full=params['full'])
+
+    job, created = job_manager.submit_or_rerun('update_indicators', run_update, {'full': full})
+    return job
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='更新技术指标表 stock_indicators')
+    parser.add_argument('--full', action='store_true', help='丢弃保存的状态，从头计算')
+    args = parser.parse_args()
+    IndicatorUpdater().update(full=args.full)
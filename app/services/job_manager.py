@@ -0,0 +1,412 @@
+from utils.logger import setup_logger
+from config.config import DATA_VERSION_CONFIG
+from contextlib import contextmanager
+import json
+import os
+import threading
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # Windows 下只做进程内去重
+    fcntl = None
+
+logger = setup_logger('job_manager')
+
+# 任务状态在多个 worker 进程间共享
+#
+# DATA_VERSION_CONFIG['DIR']/jobs 下每个任务一个状态文件 <任务ID>.json，运行任务的进程定期写入进度，
+# 任一进程都能查询、列出任务。同名任务只运行一个: 运行中的进程持有 <任务名>.lock 的文件锁，
+# 并在 <任务名>.owner 中登记任务ID，其他进程提交同名任务时据此返回正在运行的任务。
+# 其他进程取消任务时写入 <任务ID>.cancel，运行任务的进程检查到后设置 cancel_event。
+# submit_or_rerun 提交的任务在运行中又有请求时写入 <任务名>.rerun，由 <任务名>.mutex 保证检查与登记互斥
+
+def _job_dir():
+    return os.path.join(DATA_VERSION_CONFIG['DIR'], 'jobs')
+
+class Job:
+    """后台任务
+
+    target(job) 在独立线程中执行，通过 job.cancel_event 感知取消请求，
+    通过 job.progress 上报进度
+    """
+
+    def __init__(self, name, target, params=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.target = target
+        self.params = params or {}
+        self.status = 'pending'
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.cancel_event = threading.Event()
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.pid = os.getpid()
+        self.thread = None
+
+    @classmethod
+    def from_dict(cls, data):
+        """由状态文件还原的任务（可能运行在其他进程中），只用于查询"""
+        job = cls(data['name'], None, data.get('params'))
+        job.id = data['job_id']
+        for key in ('status', 'progress', 'result', 'error', 'created_at', 'started_at', 'finished_at', 'pid'):
+            setattr(job, key, data.get(key))
+        job.progress = job.progress or {}
+        return job
+
+    @property
+    def is_active(self):
+        return self.status in ('pending', 'running')
+
+    def cancel(self):
+        """请求取消任务，任务在处理完当前批次后停止"""
+        self.cancel_event.set()
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'name': self.name,
+            'params': self.params,
+            'status': self.status,
+            'progress': self.progress,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'pid': self.pid
+        }
+
+class JobManager:
+    """后台任务管理，同名任务在所有进程中同一时间只运行一个"""
+
+    def __init__(self, max_history=50, interval=1.0):
+        self.max_history = max_history
+        # 运行中任务的进度写入状态文件、检查取消请求的间隔（秒）
+        self.interval = interval
+        self._jobs = {}
+        self._run_locks = {}  # 任务ID -> 持有的任务名锁
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._watcher = None
+
+    def submit(self, name, target, params=None):
+        """提交任务；同名任务正在运行（包括在其他进程中）时返回该任务，第二个返回值为 False"""
+        with self._lock:
+            deadline = time.time() + 5
+            while True:
+                run_lock = _try_lock(self._path(name, 'lock'))
+                if run_lock is not None:
+                    return self._start(name, target, params, run_lock), True
+                running = self._running(name)
+                if running is not None:
+                    return running, False
+                # 持有锁的任务刚结束、还没释放锁，或刚取得锁、还没登记任务ID
+                if time.time() > deadline:
+                    raise RuntimeError(f"任务 {name} 正在运行，读取任务状态失败")
+                time.sleep(0.01)
+
+    def submit_or_rerun(self, name, target, params=None):
+        """提交可合并的任务，target(job, params) 执行一遍
+
+        同名任务正在运行（包括在其他进程中）时登记一次重跑，该任务执行完当前一遍后用登记的参数再执行一遍；
+        多次登记的参数合并，布尔参数（如 full）任一次为真即为真。
+        “是否在运行”的判断和任务结束前对重跑登记的检查在同一把锁下进行，任务结束前提交的请求不会丢失
+        """
+        params = dict(params or {})
+        with _hold(self._path(name, 'mutex')):
+            deadline = time.time() + 5
+            while True:
+                run_lock = _try_lock(self._path(name, 'lock'))
+                if run_lock is not None:
+                    break
+                running = self._running(name)
+                if running is not None:
+                    self._request_rerun(name, params)
+                    return running, False
+                # 任务被取消或出错，结束后还没释放锁
+                if time.time() > deadline:
+                    raise RuntimeError(f"任务 {name} 正在运行，读取任务状态失败")
+                time.sleep(0.01)
+
+            # 上次任务被取消时留下的重跑登记一并执行
+            params = _merge_params(self._take_rerun(name), params)
+
+            def run(job):
+                run_params = params
+                while True:
+                    job.params = run_params
+                    result = target(job, run_params)
+                    if job.cancel_event.is_set():
+                        return result
+                    with _hold(self._path(name, 'mutex')):
+                        run_params = self._take_rerun(name)
+                        if run_params is None:
+                            # 在锁内释放任务锁，之后提交的请求会启动新任务
+                            self._release(job)
+                            return result
+                    logger.info(f"任务 {name}({job.id}) 按合并的请求再执行一遍，参数: {run_params}")
+
+            with self._lock:
+                return self._start(name, run, params, run_lock), True
+
+    def _start(self, name, target, params, run_lock):
+        job = Job(name, target, params)
+        job.thread = threading.Thread(target=self._run, args=(job,),
+                                      name=f'job-{name}-{job.id}', daemon=True)
+        self._jobs[job.id] = job
+        self._run_locks[job.id] = run_lock
+        self._save(job)
+        # 状态文件写好后再登记任务ID，其他进程读到ID时一定能读到状态
+        _write_file(self._path(name, 'owner'), job.id)
+        self._trim_history()
+        self._start_watcher()
+        job.thread.start()
+        logger.info(f"提交任务 {name}({job.id})，参数: {job.params}")
+        return job
+
+    def _release(self, job):
+        run_lock = self._run_locks.pop(job.id, None)
+        if run_lock is not None:
+            _unlock(run_lock)
+
+    def _request_rerun(self, name, params):
+        path = self._path(name, 'rerun')
+        _write_file(path, json.dumps(_merge_params(_read_json(path), params)))
+
+    def _take_rerun(self, name):
+        path = self._path(name, 'rerun')
+        params = _read_json(path)
+        _remove_file(path)
+        return params
+
+    def get(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        return self._load(job_id)
+
+    def latest(self, name):
+        """获取最近提交的同名任务"""
+        jobs = [job for job in self._all() if job.name == name]
+        return max(jobs, key=lambda job: job.created_at) if jobs else None
+
+    def cancel(self, job_id=None, name=None):
+        """按任务ID或任务名取消正在运行的任务，任务在其他进程中运行时通过取消文件通知"""
+        job = self.get(job_id) if job_id else self._find_active(name)
+        if job is None or not job.is_active:
+            return None
+        if job.id in self._jobs:
+            job.cancel()
+        else:
+            try:
+                with open(self._path(job.id, 'cancel'), 'w'):
+                    pass
+            except OSError as e:
+                logger.warning(f"写入取消请求失败: {str(e)}")
+                return None
+        logger.info(f"请求取消任务 {job.name}({job.id})")
+        return job
+
+    def list(self):
+        return [job.to_dict() for job in sorted(self._all(), key=lambda job: job.created_at)]
+
+    def _find_active(self, name):
+        for job in self._all():
+            if job.name == name and job.is_active:
+                return job
+        return None
+
+    def _running(self, name):
+        """持有同名任务锁的线程或进程登记的任务，已结束时返回 None"""
+        try:
+            with open(self._path(name, 'owner')) as f:
+                job_id = f.read().strip()
+        except OSError:
+            return None
+        job = self.get(job_id) if job_id else None
+        return job if job is not None and job.is_active else None
+
+    def _all(self):
+        """本进程中的任务加上状态文件中其他进程的任务"""
+        jobs = dict(self._jobs)
+        try:
+            names = os.listdir(_job_dir())
+        except FileNotFoundError:
+            names = []
+        for file_name in names:
+            job_id, ext = os.path.splitext(file_name)
+            if ext == '.json' and job_id not in jobs:
+                job = self._load(job_id)
+                if job is not None:
+                    jobs[job_id] = job
+        return list(jobs.values())
+
+    def _path(self, key, ext):
+        """任务ID对应状态、取消文件，任务名对应锁、登记文件"""
+        return os.path.join(_job_dir(), f'{key}.{ext}')
+
+    def _load(self, job_id):
+        try:
+            with open(self._path(job_id, 'json')) as f:
+                job = Job.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError):
+            return None
+        if job.is_active and job.pid != os.getpid() and not _pid_alive(job.pid):
+            job.status = 'error'
+            job.error = f'任务所在进程 {job.pid} 已退出'
+        return job
+
+    def _save(self, job):
+        """写入任务状态文件（先写临时文件再替换）；进度中途变化导致序列化失败时等下一次写入"""
+        path = self._path(job.id, 'json')
+        try:
+            with self._save_lock:
+                _write_file(path, json.dumps(job.to_dict(), ensure_ascii=False, default=str))
+        except (OSError, TypeError, ValueError, RuntimeError) as e:
+            logger.warning(f"写入任务状态失败 {job.name}({job.id}): {str(e)}")
+
+    def _trim_history(self):
+        finished = sorted((job for job in self._all() if not job.is_active),
+                          key=lambda job: job.created_at)
+        for job in finished[:max(0, len(finished) - self.max_history)]:
+            self._jobs.pop(job.id, None)
+            _remove_file(self._path(job.id, 'json'))
+
+    def _start_watcher(self):
+        if self._watcher is None or not self._watcher.is_alive():
+            self._watcher = threading.Thread(target=self._watch, name='job-watcher', daemon=True)
+            self._watcher.start()
+
+    def _watch(self):
+        """定期写入本进程运行中任务的进度，并检查其他进程写入的取消请求"""
+        while True:
+            time.sleep(self.interval)
+            for job in list(self._jobs.values()):
+                if not job.is_active:
+                    continue
+                if os.path.exists(self._path(job.id, 'cancel')):
+                    job.cancel()
+                self._save(job)
+
+    def _run(self, job):
+        job.status = 'running'
+        job.started_at = time.time()
+        self._save(job)
+        try:
+            job.result = job.target(job)
+            if job.cancel_event.is_set():
+                job.status = 'cancelled'
+            elif isinstance(job.result, dict) and job.result.get('success') is False:
+                job.status = 'error'
+                job.error = job.result.get('message')
+            else:
+                job.status = 'completed'
+        except Exception as e:
+            job.error = str(e)
+            job.status = 'error'
+            logger.error(f"任务 {job.name}({job.id}) 执行失败: {str(e)}")
+        finally:
+            job.finished_at = time.time()
+            self._save(job)
+            _remove_file(self._path(job.id, 'cancel'))
+            self._release(job)
+            logger.info(f"任务 {job.name}({job.id}) 结束，状态: {job.status}")
+
+# 没有 fcntl 时按路径在进程内加锁
+_local_locks = {}
+_local_locks_guard = threading.Lock()
+
+def _try_lock(path):
+    """非阻塞地获取文件锁，已被其他进程（或本进程的其他文件句柄）持有时返回 None"""
+    if fcntl is None:
+        with _local_locks_guard:
+            lock = _local_locks.setdefault(path, threading.Lock())
+        return (None, lock) if lock.acquire(blocking=False) else None
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    lock_file = open(path, 'a')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file, None
+
+@contextmanager
+def _hold(path):
+    """阻塞地持有文件锁，跨进程互斥"""
+    if fcntl is None:
+        with _local_locks_guard:
+            lock = _local_locks.setdefault(path, threading.Lock())
+        with lock:
+            yield
+        return
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _write_file(path, content):
+    """先写临时文件再替换，读取方不会读到半个文件"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_file = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_file, 'w') as f:
+        f.write(content)
+    os.replace(tmp_file, path)
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _merge_params(pending, params):
+    """合并两次请求的参数，布尔参数取或"""
+    if pending is None:
+        return params
+    merged = dict(pending)
+    for key, value in params.items():
+        merged[key] = (merged.get(key) or value) if isinstance(value, bool) else value
+    return merged
+
+def _unlock(handle):
+    lock_file, lock = handle
+    if lock_file is not None:
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
+    else:
+        lock.release()
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def active_jobs():
+    """所有进程中正在运行的任务 [(进程号, 任务名)]，所在进程已退出的任务不计入"""
+    return [(job.pid, job.name) for job in job_manager._all() if job.is_active]
+
+def _pid_alive(pid):
+    if os.name != 'posix':  # Windows 下 os.kill 会结束进程，不做检查
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+# 进程内共享的任务管理器
+job_manager = JobManager()
@@ -0,0 +1,96 @@
+from utils.date_utils import format_trade_date
+from app.services.sector_engine import DEFAULT_START_DATE
+
+# 个股资金流向（Tushare moneyflow），成交量单位手，金额单位万元
+# 小单 sm / 中单 md / 大单 lg / 特大单 elg 的买入、卖出，net_mf 为净流入
+FLOW_FIELDS = ['buy_sm_vol', 'buy_sm_amount', 'sell_sm_vol', 'sell_sm_amount',
+               'buy_md_vol', 'buy_md_amount', 'sell_md_vol', 'sell_md_amount',
+               'buy_lg_vol', 'buy_lg_amount', 'sell_lg_vol', 'sell_lg_amount',
+               'buy_elg_vol', 'buy_elg_amount', 'sell_elg_vol', 'sell_elg_amount',
+               'net_mf_vol', 'net_mf_amount']
+# moneyflow 写入列
+MONEYFLOW_COLUMNS = ['ts_code', 'trade_date'] + FLOW_FIELDS
+
+def rollup_sector_moneyflow(conn, trade_dates=None, sector_ids=None):
+    """按板块汇总资金流向写入 sector_moneyflow
+
+    trade_dates: 重算这些交易日的所有板块（资金流向入库后）
+    sector_ids: 重算这些板块的所有交易日（成分股变更后），先删除旧的汇总
+    """
+    cursor = conn.cursor()
+    conditions = []
+    params = []
+    if sector_ids:
+        placeholders = ','.join(['%s'] * len(sector_ids))
+        cursor.execute(f'DELETE FROM sector_moneyflow WHERE sector_id IN ({placeholders})', list(sector_ids))
+        conditions.append(f'ss.sector_id IN ({placeholders})')
+        params += list(sector_ids)
+    if trade_dates:
+        conditions.append(f"mf.trade_date IN ({','.join(['%s'] * len(trade_dates))})")
+        params += list(trade_dates)
+
+    sums = ', '.join(f'SUM(mf.{field})' for field in FLOW_FIELDS)
+    updates = ', '.join(f'{field} = VALUES({field})' for field in FLOW_FIELDS + ['member_count'])
+    cursor.execute(f'''
+        INSERT INTO sector_moneyflow (sector_id, trade_date, {', '.join(FLOW_FIELDS)}, member_count)
+        SELECT ss.sector_id, mf.trade_date, {sums}, COUNT(*)
+        FROM moneyflow mf
+        JOIN sector_stocks ss ON ss.stock_code = mf.ts_code
+        {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+        GROUP BY ss.sector_id, mf.trade_date
+        ON DUPLICATE KEY UPDATE {updates}
+    ''', params)
+    rows = cursor.rowcount
+    conn.commit()
+    return rows
+
+def get_stock_money_flow(cursor, stock_code, start_date=DEFAULT_START_DATE, end_date=None):
+    """个股 [start_date, end_date] 的资金流向 {'dates': [...], 字段: [...]}，按主键范围读取"""
+    return _read_flow(cursor, 'moneyflow', 'ts_code', stock_code, start_date, end_date)
+
+def get_sector_money_flow(cursor, sector_id, start_date=DEFAULT_START_DATE, end_date=None):
+    """板块 [start_date, end_date] 的资金流向汇总，另含每日参与汇总的成分股数 member_count"""
+    return _read_flow(cursor, 'sector_moneyflow', 'sector_id', sector_id, start_date, end_date,
+                      extra=['member_count'])
+
+def detail_money_flow(flow, dates):
+    """按详情接口原有字段组装与 dates 对齐的特大单、大单流入流出（元），当天没有数据为 None"""
+    by_date = {date: i for i, date in enumerate(flow['dates'])}
+
+    def series(field):
+        values = flow[field]
+        return [values[by_date[date]] * 10000 if date in by_date and values[by_date[date]] is not None
+                else None for date in dates]  # 万元 -> 元
+
+    result = {
+        'super_large_inflow': series('buy_elg_amount'),
+        'super_large_outflow': series('sell_elg_amount'),
+        'large_inflow': series('buy_lg_amount'),
+        'large_outflow': series('sell_lg_amount')
+    }
+    result['net_inflow'] = [
+        None if None in values else values[0] + values[1] - values[2] - values[3]
+        for values in zip(result['super_large_inflow'], result['large_inflow'],
+                          result['super_large_outflow'], result['large_outflow'])
+    ]
+    return result
+
+def _read_flow(cursor, table, key_column, key, start_date, end_date, extra=()):
+    columns = FLOW_FIELDS + list(extra)
+    sql = f'''
+        SELECT trade_date, {', '.join(columns)}
+        FROM {table}
+        WHERE {key_column} = %s AND trade_date >= %s
+    '''
+    params = [key, start_date or DEFAULT_START_DATE]
+    if end_date:
+        sql += ' AND trade_date <= %s'
+        params.append(end_date)
+    cursor.execute(sql + ' ORDER BY trade_date', params)
+    rows = cursor.fetchall()
+
+    result = {'dates': [format_trade_date(row[0]) for row in rows]}
+    for i, column in enumerate(columns, start=1):
+        cast = int if column == 'member_count' else float
+        result[column] = [cast(row[i]) if row[i] is not None else None for row in rows]
+    return result
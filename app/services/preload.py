@@ -0,0 +1,37 @@
+from utils.logger import setup_logger
+from utils.database import get_pool
+from utils.data_version import DATA_VERSION, get_version
+from app.services.reference_data import get_reference_data
+from app.services.price_cube import get_price_cube
+from app.services.screener import get_screener
+import time
+
+logger = setup_logger('preload')
+
+# 生产服务器在 fork worker 之前于主进程加载只读数据:
+# 基础数据、行情立方体（内存映射）、每日指标快照，worker 通过写时复制共享，
+# 不必每个进程各查一遍数据库；数据更新后主进程重新加载，再平滑重启 worker
+
+def preload_caches():
+    """加载各项共享数据，返回 {名称: 版本或交易日}；单项失败只记录日志，worker 中会按需重新加载"""
+    start_time = time.time()
+    loaded = {'data_version': get_version(DATA_VERSION)}
+
+    try:
+        reference = get_reference_data()
+        loaded['reference'] = reference.version
+    except Exception as e:
+        logger.error(f"预加载基础数据失败: {str(e)}")
+
+    cube = get_price_cube()
+    loaded['price_cube'] = cube.version if cube is not None else None
+
+    try:
+        loaded['daily_basic'] = get_screener().snapshot().trade_date
+    except Exception as e:
+        logger.error(f"预加载每日指标失败: {str(e)}")
+
+    # 主进程不处理请求，关闭加载时借出的连接，避免 worker 继承同一个 socket
+    get_pool().close_all()
+    logger.info(f"预加载完成: {loaded}，耗时 {time.time() - start_time:.2f} 秒")
+    return loaded
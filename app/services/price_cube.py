@@ -0,0 +1,318 @@
+from utils.logger import setup_logger
+from utils.database import get_mysql_connection
+from utils.data_version import get_version, bump_version
+from utils.date_utils import to_date_str
+from config.config import PRICE_CUBE_CONFIG
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+import numpy as np
+import pandas as pd
+
+logger = setup_logger('price_cube')
+
+# 行情立方体重建后递增的版本名
+PRICE_CUBE_VERSION = 'price_cube'
+
+STOCK_DATA_FIELDS = ['open', 'close', 'amount', 'pct_chg']  # 来自 stock_data
+DAILY_BASIC_FIELDS = ['turnover_rate']  # 来自 daily_basic
+CUBE_FIELDS = STOCK_DATA_FIELDS + DAILY_BASIC_FIELDS
+
+# 构建时预先沿交易日累加的序列，任意区间的收益、成交额、换手率合计都只需两次查表
+#   cum_log_return: log(1 + pct_chg/100) 的累加（float64），缺失记 0，1 + pct_chg/100 不低于 MIN_GROWTH
+#   cum_amount:     成交额（千元）的累加（float64）
+#   cum_turnover:   换手率（%）的累加（float64）
+#   cum_traded:     有日线的交易日数的累加（int32）
+DERIVED_FIELDS = ['cum_log_return', 'cum_amount', 'cum_turnover', 'cum_traded']
+
+# 单日净值比例 1 + pct_chg/100 的下限；pct_chg <= -100 的异常日线取对数时按该值计，
+# 区间收益接近 -100% 而不是 NaN（数据库回退查询同样处理）
+MIN_GROWTH = 1e-6
+
+# window_sum 可汇总的字段及其累加序列
+SUM_FIELDS = {'amount': 'cum_amount', 'turnover_rate': 'cum_turnover'}
+
+# 目录结构:
+#   <DIR>/CURRENT              当前版本的目录名
+#   <DIR>/<版本>/codes.json    股票代码（行）
+#   <DIR>/<版本>/dates.json    交易日 YYYYMMDD（列）
+#   <DIR>/<版本>/<field>.npy   float32 数组，形状 (股票数, 交易日数)，缺失为 NaN
+#   <DIR>/<版本>/cum_*.npy     累加序列，形状同上
+
+class PriceCubeBuilder:
+    """从 stock_data 构建行情立方体，写入新版本目录后原子切换 CURRENT"""
+
+    def __init__(self, cube_dir=None, start_date=None):
+        self.cube_dir = cube_dir or PRICE_CUBE_CONFIG['DIR']
+        self.start_date = start_date or PRICE_CUBE_CONFIG['START_DATE']
+
+    def build(self):
+        start_time = time.time()
+        version = time.strftime('%Y%m%d%H%M%S') + f'_{uuid.uuid4().hex[:8]}'
+        version_dir = os.path.join(self.cube_dir, version)
+        os.makedirs(version_dir)
+
+        try:
+            with get_mysql_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT DISTINCT trade_date FROM stock_data WHERE trade_date >= %s',
+                               (self.start_date,))
+                dates = sorted(to_date_str(row[0]) for row in cursor.fetchall())
+                cursor.execute('SELECT DISTINCT ts_code FROM stock_data WHERE trade_date >= %s',
+                               (self.start_date,))
+                codes = sorted(row[0] for row in cursor.fetchall())
+
+                shape = (len(codes), len(dates))
+                arrays = {field: np.lib.format.open_memmap(os.path.join(version_dir, f'{field}.npy'),
+                                                           mode='w+', dtype=np.float32, shape=shape)
+                          for field in CUBE_FIELDS}
+                for array in arrays.values():
+                    array[:] = np.nan
+
+                index = (pd.Index(codes), pd.Index(dates))
+                rows = self._fill(cursor, 'stock_data', STOCK_DATA_FIELDS, arrays, index, dates)
+                try:
+                    self._fill(cursor, 'daily_basic', DAILY_BASIC_FIELDS, arrays, index, dates)
+                except Exception as e:
+                    # 没有每日指标时换手率保持 NaN，不影响其他字段
+                    logger.warning(f"读取每日指标失败，换手率留空: {str(e)}")
+
+            self._write_cumulative(version_dir, arrays, shape)
+            for array in arrays.values():
+                array.flush()
+            del arrays
+            with open(os.path.join(version_dir, 'codes.json'), 'w') as f:
+                json.dump(codes, f)
+            with open(os.path.join(version_dir, 'dates.json'), 'w') as f:
+                json.dump(dates, f)
+        except Exception:
+            shutil.rmtree(version_dir, ignore_errors=True)
+            raise
+
+        self._switch(version)
+        result = {
+            'success': True,
+            'version': version,
+            'stocks': len(codes),
+            'dates': len(dates),
+            'rows': rows,
+            'seconds': round(time.time() - start_time, 2)
+        }
+        logger.info(f"构建行情立方体: {result}")
+        return result
+
+    def _fill(self, cursor, table, fields, arrays, index, dates):
+        """按交易日分批读取 table 写入数组，走 (trade_date, ts_code) 索引，内存占用与批大小成正比"""
+        code_index, date_index = index
+        rows = 0
+        chunk = PRICE_CUBE_CONFIG['CHUNK_DATES']
+        for i in range(0, len(dates), chunk):
+            chunk_dates = dates[i:i + chunk]
+            placeholders = ','.join(['%s'] * len(chunk_dates))
+            cursor.execute(f'''
+                SELECT ts_code, trade_date, {', '.join(fields)}
+                FROM {table}
+                WHERE trade_date IN ({placeholders})
+            ''', chunk_dates)
+            df = pd.DataFrame(cursor.fetchall(), columns=['ts_code', 'trade_date'] + fields)
+            if df.empty:
+                continue
+            code_idx = code_index.get_indexer(df['ts_code'])
+            date_idx = date_index.get_indexer(df['trade_date'].map(to_date_str))
+            # 构建期间新写入的股票不在代码表中，跳过
+            valid = (code_idx >= 0) & (date_idx >= 0)
+            for field in fields:
+                values = pd.to_numeric(df[field], errors='coerce').to_numpy(dtype=np.float32)
+                arrays[field][code_idx[valid], date_idx[valid]] = values[valid]
+            rows += int(valid.sum())
+        return rows
+
+    def _write_cumulative(self, version_dir, arrays, shape):
+        def open_array(name, dtype):
+            return np.lib.format.open_memmap(os.path.join(version_dir, f'{name}.npy'),
+                                             mode='w+', dtype=dtype, shape=shape)
+
+        cum_log = open_array('cum_log_return', np.float64)
+        cum_amount = open_array('cum_amount', np.float64)
+        cum_turnover = open_array('cum_turnover', np.float64)
+        cum_traded = open_array('cum_traded', np.int32)
+        # 按股票分块计算，避免一次性展开整个 float64 数组
+        for i in range(0, shape[0], 500):
+            block = slice(i, i + 500)
+            pct = arrays['pct_chg'][block].astype(np.float64)
+            cum_log[block] = np.nancumsum(np.log(np.maximum(1 + pct / 100, MIN_GROWTH)), axis=1)
+            cum_amount[block] = np.nancumsum(arrays['amount'][block].astype(np.float64), axis=1)
+            cum_turnover[block] = np.nancumsum(arrays['turnover_rate'][block].astype(np.float64), axis=1)
+            cum_traded[block] = np.cumsum(~np.isnan(arrays['close'][block]), axis=1)
+        for array in (cum_log, cum_amount, cum_turnover, cum_traded):
+            array.flush()
+
+    def _switch(self, version):
+        tmp_file = os.path.join(self.cube_dir, f'CURRENT.{os.getpid()}.tmp')
+        with open(tmp_file, 'w') as f:
+            f.write(version)
+        os.replace(tmp_file, os.path.join(self.cube_dir, 'CURRENT'))
+        bump_version(PRICE_CUBE_VERSION)
+        self._cleanup(version)
+
+    def _cleanup(self, current):
+        # 已被其他进程映射的文件删除后仍可继续读取，直到这些进程切换到新版本
+        versions = sorted((name for name in os.listdir(self.cube_dir)
+                           if os.path.isdir(os.path.join(self.cube_dir, name)) and name != current),
+                          key=lambda name: os.path.getmtime(os.path.join(self.cube_dir, name)))
+        for name in versions[:max(0, len(versions) - PRICE_CUBE_CONFIG['KEEP_VERSIONS'] + 1)]:
+            shutil.rmtree(os.path.join(self.cube_dir, name), ignore_errors=True)
+
+class PriceCube:
+    """只读映射的行情立方体
+
+    数组通过 np.load(mmap_mode='r') 映射，各 worker 进程共享同一份页缓存；
+    切片不需要查询数据库，也没有反序列化开销
+    """
+
+    def __init__(self, version, codes, dates, arrays):
+        self.version = version
+        self.codes = codes
+        self.dates = dates
+        self.arrays = arrays
+        self._code_index = {code: i for i, code in enumerate(codes)}
+        self._date_array = np.array(dates)
+
+    @classmethod
+    def open(cls, cube_dir=None):
+        """打开 CURRENT 指向的版本，尚未构建时返回 None"""
+        cube_dir = cube_dir or PRICE_CUBE_CONFIG['DIR']
+        try:
+            with open(os.path.join(cube_dir, 'CURRENT')) as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return None
+
+        version_dir = os.path.join(cube_dir, version)
+        with open(os.path.join(version_dir, 'codes.json')) as f:
+            codes = json.load(f)
+        with open(os.path.join(version_dir, 'dates.json')) as f:
+            dates = json.load(f)
+        arrays = {field: np.load(os.path.join(version_dir, f'{field}.npy'), mmap_mode='r')
+                  for field in CUBE_FIELDS + DERIVED_FIELDS}
+        return cls(version, codes, dates, arrays)
+
+    def code_index(self, code):
+        return self._code_index.get(code)
+
+    def code_indices(self, codes):
+        """股票代码对应的行下标，不在立方体中的代码跳过；返回 (下标数组, 对应的代码)"""
+        pairs = [(self._code_index[code], code) for code in codes if code in self._code_index]
+        return np.array([i for i, _ in pairs], dtype=np.int64), [code for _, code in pairs]
+
+    def covers(self, start_date=None, end_date=None):
+        """立方体是否覆盖 [start_date, end_date]
+
+        起始日早于立方体首个交易日时，切片会从首个交易日开始、结果与数据库不一致，调用方应回退到数据库查询；
+        结束日晚于最后一个交易日不影响（数据库中也还没有更新的日线）
+        """
+        if not self.dates:
+            return False
+        return not start_date or to_date_str(start_date) >= self.dates[0]
+
+    def date_slice(self, start_date=None, end_date=None):
+        """[start_date, end_date] 对应的列切片"""
+        lo = np.searchsorted(self._date_array, to_date_str(start_date), side='left') if start_date else 0
+        hi = np.searchsorted(self._date_array, to_date_str(end_date), side='right') if end_date else len(self.dates)
+        return slice(int(lo), int(hi))
+
+    def series(self, field, code, start_date=None, end_date=None):
+        """单只股票的序列（只读视图），不在立方体中时返回 None"""
+        index = self._code_index.get(code)
+        if index is None:
+            return None
+        return self.arrays[field][index, self.date_slice(start_date, end_date)]
+
+    def panel(self, field, codes, start_date=None, end_date=None):
+        """多只股票的 股票 × 交易日 数组（副本）和实际包含的代码"""
+        rows, found = self.code_indices(codes)
+        return self.arrays[field][rows, self.date_slice(start_date, end_date)], found
+
+    def window_returns(self, start_date=None, end_date=None, rows=None):
+        """[start_date, end_date] 区间的收益（%），按 pct_chg 复权
+
+        收益 = exp(cum_log_return[end] - cum_log_return[start 前一日]) - 1，每只股票两次查表，
+        与区间长度无关。rows 为行下标（默认全市场），区间内没有日线的股票为 NaN
+        """
+        log_return = self._window_diff('cum_log_return', start_date, end_date, rows)
+        traded = self.traded_days(start_date, end_date, rows)
+        return np.where(traded > 0, np.expm1(log_return) * 100, np.nan)
+
+    def window_sum(self, field, start_date=None, end_date=None, rows=None):
+        """区间内 amount（千元）或 turnover_rate（%）的合计，区间内没有日线的股票为 NaN"""
+        total = self._window_diff(SUM_FIELDS[field], start_date, end_date, rows)
+        traded = self.traded_days(start_date, end_date, rows)
+        return np.where(traded > 0, total, np.nan)
+
+    def traded_days(self, start_date=None, end_date=None, rows=None):
+        """区间内每只股票有日线的交易日数"""
+        return self._window_diff('cum_traded', start_date, end_date, rows)
+
+    def _window_diff(self, derived_field, start_date, end_date, rows):
+        """累加序列在区间末日与区间前一日的差，每只股票两次查表"""
+        window = self.date_slice(start_date, end_date)
+        cumulative = self.arrays[derived_field]
+        if window.start >= window.stop:
+            return np.zeros(self._row_count(rows), dtype=cumulative.dtype)
+        rows = slice(None) if rows is None else rows
+        diff = cumulative[rows, window.stop - 1]
+        if window.start > 0:
+            diff = diff - cumulative[rows, window.start - 1]
+        return diff
+
+    def _row_count(self, rows):
+        return len(self.codes) if rows is None else len(rows)
+
+class _CubeHolder:
+    """进程内持有当前版本的立方体，版本号变化时重新映射"""
+
+    def __init__(self):
+        self._cube = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        version = get_version(PRICE_CUBE_VERSION)
+        if self._cube is not None and self._version == version:
+            return self._cube
+        with self._lock:
+            if self._cube is None or self._version != version:
+                try:
+                    self._cube = PriceCube.open()
+                    self._version = version
+                except Exception as e:
+                    logger.error(f"打开行情立方体失败: {str(e)}")
+            return self._cube
+
+_holder = _CubeHolder()
+
+def get_price_cube(start_date=None, end_date=None):
+    """当前进程的行情立方体，尚未构建时返回 None，调用方回退到数据库查询
+
+    给出 start_date 时，立方体不覆盖该区间也返回 None
+    """
+    cube = _holder.get()
+    if cube is not None and start_date and not cube.covers(start_date, end_date):
+        return None
+    return cube
+
+def submit_build_job():
+    """提交后台重建任务；已有重建任务在运行时合并到该任务中，任务结束前再重建一次"""
+    from app.services.job_manager import job_manager
+
+    def run_build(job, params):
+        return PriceCubeBuilder().build()
+
+    job, created = job_manager.submit_or_rerun('build_price_cube', run_build)
+    return job
+
+if __name__ == '__main__':
+    PriceCubeBuilder().build()
@@ -0,0 +1,87 @@
+from app.services.reference_data import get_reference_data
+from app.services.price_cube import get_price_cube
+from utils.result_cache import get_result_cache
+import threading
+import numpy as np
+
+# 排行指标 -> 在立方体上计算区间值的方法
+#   return:   区间收益（%），按 pct_chg 复权
+#   amount:   区间成交额合计（千元）
+#   turnover: 区间换手率合计（%）
+RANKING_METRICS = {
+    'return': lambda cube, start, end, rows: cube.window_returns(start, end, rows),
+    'amount': lambda cube, start, end, rows: cube.window_sum('amount', start, end, rows),
+    'turnover': lambda cube, start, end, rows: cube.window_sum('turnover_rate', start, end, rows),
+}
+
+MAX_RANKING_SIZE = 500
+
+class RankingService:
+    """全市场或板块内按区间收益、成交额、换手率取前（后）N 名
+
+    区间值由立方体的累加序列两次查表得到，选取前 N 名用 np.argpartition（O(股票数)），
+    只对选中的 N 只排序。结果经共享的结果缓存按 (立方体版本, 指标, 区间, 范围, N, 方向) 缓存，
+    新交易日入库后立方体重建、版本变化，旧结果不再命中
+    """
+
+    def rank(self, metric, start_date=None, end_date=None, n=20, order='top', sector_id=None):
+        if metric not in RANKING_METRICS:
+            raise ValueError(f"不支持的排行指标: {metric}")
+        if order not in ('top', 'bottom'):
+            raise ValueError(f"不支持的排序方向: {order}")
+        n = int(n)
+        if not 0 < n <= MAX_RANKING_SIZE:
+            raise ValueError(f"n 须在 1 到 {MAX_RANKING_SIZE} 之间")
+
+        cube = get_price_cube()
+        if cube is None:
+            raise RuntimeError('行情立方体尚未构建')
+        if not cube.covers(start_date, end_date):
+            raise ValueError(f"起始日期早于行情立方体的首个交易日 {cube.dates[0] if cube.dates else '-'}，排行不支持该区间")
+
+        # 板块范围还取决于成分股，键中带上基础数据版本
+        universe = 'all' if sector_id is None else (sector_id, get_reference_data().version)
+        cache = get_result_cache()
+        key, version = cache.make_key('ranking.rank', (cube.version, metric, start_date, end_date, universe, n, order))
+        return cache.get_or_compute('ranking.rank', key, version,
+                                    lambda: self._compute(cube, metric, start_date, end_date, n, order, sector_id))
+
+    def _compute(self, cube, metric, start_date, end_date, n, order, sector_id):
+        if sector_id is None:
+            rows, codes = None, cube.codes
+        else:
+            rows, codes = cube.code_indices(get_reference_data().sector_members(sector_id))
+
+        values = np.asarray(RANKING_METRICS[metric](cube, start_date, end_date, rows), dtype=np.float64)
+        candidates = np.flatnonzero(~np.isnan(values))
+        # 倒数排行取负值，统一为取最大的 k 个
+        keys = values[candidates] if order == 'top' else -values[candidates]
+        k = min(n, len(candidates))
+        if k < len(candidates):
+            candidates = candidates[np.argpartition(keys, len(keys) - k)[len(keys) - k:]]
+            keys = values[candidates] if order == 'top' else -values[candidates]
+        selected = candidates[np.argsort(-keys, kind='stable')]
+
+        window = cube.date_slice(start_date, end_date)
+        dates = cube.dates[window]
+        names = get_reference_data().stock_names([codes[i] for i in selected.tolist()])
+        return {
+            'metric': metric,
+            'order': order,
+            'start': dates[0] if dates else None,
+            'end': dates[-1] if dates else None,
+            'total': len(values),
+            'stocks': [{'code': codes[i], 'name': names[codes[i]], 'value': round(value, 4)}
+                       for i, value in zip(selected.tolist(), values[selected].tolist())]
+        }
+
+# 进程内共享的排行服务
+_ranking_service = None
+_ranking_lock = threading.Lock()
+
+def get_ranking_service():
+    global _ranking_service
+    with _ranking_lock:
+        if _ranking_service is None:
+            _ranking_service = RankingService()
+        return _ranking_service
@@ -0,0 +1,171 @@
+from utils.logger import setup_logger
+from utils.database import get_mysql_connection
+from utils.data_version import get_version, bump_version
+from config.config import REFERENCE_DATA_CONFIG
+import threading
+import time
+
+logger = setup_logger('reference_data')
+
+# 板块、成分股变更时递增的版本名
+REFERENCE_VERSION = 'reference'
+
+class _Snapshot:
+    """一次加载得到的基础数据，加载完成后只读，替换时整体换掉"""
+
+    def __init__(self, stocks, sectors, memberships, version):
+        self.version = version
+        self.loaded_at = time.time()
+        self.stock_names = stocks  # 证券代码 -> 证券简称
+        self.sectors = sectors  # sector_id -> {'sector_id', 'sector_name', 'sector_type'}
+        self.stock_sectors = {}  # stock_code -> [sector_id, ...]
+
+        members = {}
+        for sector_id, stock_code in memberships:
+            members.setdefault(sector_id, []).append(stock_code)
+            self.stock_sectors.setdefault(stock_code, []).append(sector_id)
+        # sector_id -> (stock_code, ...)
+        self.sector_members = {sector_id: tuple(sorted(codes)) for sector_id, codes in members.items()}
+
+        # 与原来的 ORDER BY s.sector_type, s.sector_name 保持一致（NULL 在前）
+        for sector_ids in self.stock_sectors.values():
+            sector_ids.sort(key=lambda sid: _sector_sort_key(sectors.get(sid)))
+        self.sector_list = sorted(sectors.values(), key=_sector_sort_key)
+
+class ReferenceData:
+    """进程内的基础数据缓存（stocks、sectors、sector_stocks）
+
+    首次使用时整表加载，之后所有查询都是字典查找。板块维护接口修改成分股后调用
+    invalidate() 递增版本，各进程在下次访问时发现版本变化并重新加载；
+    超过 MAX_AGE 秒也会重新加载，兜底直接改库的情况
+    """
+
+    def __init__(self, max_age=None):
+        self.max_age = REFERENCE_DATA_CONFIG['MAX_AGE'] if max_age is None else max_age
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def _current(self):
+        snapshot = self._snapshot
+        if snapshot is not None and not self._is_stale(snapshot):
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or self._is_stale(snapshot):
+                try:
+                    self._snapshot = snapshot = self._load()
+                except Exception as e:
+                    # 已有数据时继续使用旧数据，避免数据库抖动导致接口全部失败
+                    if snapshot is None:
+                        raise
+                    logger.error(f"重新加载基础数据失败，继续使用旧数据: {str(e)}")
+            return snapshot
+
+    def _is_stale(self, snapshot):
+        if snapshot.version != get_version(REFERENCE_VERSION):
+            return True
+        return self.max_age > 0 and time.time() - snapshot.loaded_at > self.max_age
+
+    def _load(self):
+        # 先取版本再读表，读表期间发生的变更会在下次访问时再加载一次
+        version = get_version(REFERENCE_VERSION)
+        start_time = time.time()
+        with get_mysql_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT 证券代码, 证券简称 FROM stocks')
+            stocks = {code: name for code, name in cursor.fetchall()}
+
+            cursor.execute('SELECT sector_id, sector_name, sector_type FROM sectors')
+            sectors = {sector_id: {'sector_id': sector_id, 'sector_name': name, 'sector_type': sector_type}
+                       for sector_id, name, sector_type in cursor.fetchall()}
+
+            cursor.execute('SELECT sector_id, stock_code FROM sector_stocks')
+            memberships = cursor.fetchall()
+
+        snapshot = _Snapshot(stocks, sectors, memberships, version)
+        logger.info(f"加载基础数据: 股票 {len(stocks)} 只，板块 {len(sectors)} 个，"
+                    f"成分股 {len(memberships)} 条，耗时 {time.time() - start_time:.2f} 秒")
+        return snapshot
+
+    @property
+    def version(self):
+        return self._current().version
+
+    def has_stock(self, stock_code):
+        return stock_code in self._current().stock_names
+
+    def stock_name(self, stock_code, default=None):
+        return self._current().stock_names.get(stock_code, default)
+
+    def stock_names(self, stock_codes):
+        """批量获取股票名称 {code: name}，找不到的用代码代替"""
+        names = self._current().stock_names
+        return {code: names.get(code) or code for code in stock_codes}
+
+    def get_sector(self, sector_id):
+        return self._current().sectors.get(sector_id)
+
+    def find_sector(self, sector_name, sector_type=None):
+        """按名称（和类型）查找板块"""
+        for sector in self._current().sector_list:
+            if sector['sector_name'] == sector_name and (sector_type is None or sector['sector_type'] == sector_type):
+                return sector
+        return None
+
+    def list_sectors(self):
+        """所有板块及成分股数量，按类型、名称排序"""
+        snapshot = self._current()
+        return [dict(sector, stock_count=len(snapshot.sector_members.get(sector['sector_id'], ())))
+                for sector in snapshot.sector_list]
+
+    def sector_members(self, sector_id):
+        """板块成分股代码（有序元组）"""
+        return self._current().sector_members.get(sector_id, ())
+
+    def stock_sectors(self, stock_code):
+        """股票所属板块 [{'sector_name', 'sector_type'}]，按类型、名称排序"""
+        snapshot = self._current()
+        return [{'sector_name': snapshot.sectors[sid]['sector_name'],
+                 'sector_type': snapshot.sectors[sid]['sector_type']}
+                for sid in snapshot.stock_sectors.get(stock_code, ()) if sid in snapshot.sectors]
+
+    def reload(self):
+        """立即从数据库重新加载，不等版本变化或 MAX_AGE 到期"""
+        with self._lock:
+            self._snapshot = self._load()
+
+    def invalidate(self):
+        """递增版本，所有进程在下次访问时重新加载"""
+        version = bump_version(REFERENCE_VERSION)
+        logger.info(f"基础数据版本更新为 {version}")
+        return version
+
+def _sector_sort_key(sector):
+    if sector is None:
+        return (True, '', '')
+    return (sector['sector_type'] is not None, sector['sector_type'] or '', sector['sector_name'] or '')
+
+def normalize_stock_code(stock_code):
+    """统一股票代码格式: 600000 -> 600000.SH，000001 -> 000001.SZ"""
+    stock_code = stock_code.strip().upper()
+    if '.' not in stock_code:
+        if stock_code.startswith('6'):
+            stock_code += '.SH'
+        elif stock_code.startswith(('0', '3')):
+            stock_code += '.SZ'
+    return stock_code
+
+# 进程内共享的基础数据
+_reference_data = None
+_reference_lock = threading.Lock()
+
+def get_reference_data():
+    global _reference_data
+    with _reference_lock:
+        if _reference_data is None:
+            _reference_data = ReferenceData()
+        return _reference_data
+
+def invalidate_reference_data():
+    return get_reference_data().invalidate()
@@ -0,0 +1,166 @@
+from utils.logger import setup_logger
+from utils.database import get_mysql_connection
+from utils.data_version import get_version
+from utils.date_utils import to_date_str
+from config.config import REFERENCE_DATA_CONFIG
+from app.services.reference_data import get_reference_data
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+logger = setup_logger('screener')
+
+# 每日指标写入后递增的版本名
+DAILY_BASIC_VERSION = 'daily_basic'
+
+# 可筛选、排序的每日指标列
+SCREEN_FIELDS = ['close', 'turnover_rate', 'turnover_rate_f', 'volume_ratio', 'pe', 'pe_ttm', 'pb',
+                 'ps', 'ps_ttm', 'dv_ratio', 'dv_ttm', 'total_share', 'float_share', 'free_share',
+                 'total_mv', 'circ_mv']
+
+MAX_SCREEN_LIMIT = 500
+
+class FundamentalSnapshot:
+    """最新交易日的每日指标，按列存成 float64 数组（缺失为 NaN），加载后只读"""
+
+    def __init__(self, trade_date, codes, columns, version):
+        self.trade_date = trade_date
+        self.codes = codes
+        self.columns = columns
+        self.version = version
+        self.loaded_at = time.time()
+        self._code_index = {code: i for i, code in enumerate(codes)}
+
+    @classmethod
+    def load(cls):
+        version = get_version(DAILY_BASIC_VERSION)
+        with get_mysql_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT trade_date, ts_code, {', '.join(SCREEN_FIELDS)}
+                FROM daily_basic
+                WHERE trade_date = (SELECT MAX(trade_date) FROM daily_basic)
+            ''')
+            df = pd.DataFrame(cursor.fetchall(), columns=['trade_date', 'ts_code'] + SCREEN_FIELDS)
+        trade_date = to_date_str(df['trade_date'].iloc[0]) if len(df) else None
+        columns = {field: pd.to_numeric(df[field], errors='coerce').to_numpy(dtype=np.float64)
+                   for field in SCREEN_FIELDS}
+        logger.info(f"加载每日指标快照: {trade_date}，{len(df)} 只股票")
+        return cls(trade_date, df['ts_code'].tolist(), columns, version)
+
+    def rows(self, codes):
+        return np.array([self._code_index[code] for code in codes if code in self._code_index], dtype=np.int64)
+
+class Screener:
+    """在每日指标快照上按区间条件筛选、按多列排序
+
+    条件和排序都是整列的布尔掩码、数组运算，不拼 SQL；每日指标更新后版本变化，下次访问时重新加载快照
+    """
+
+    def __init__(self, max_age=None):
+        self.max_age = REFERENCE_DATA_CONFIG['MAX_AGE'] if max_age is None else max_age
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        snapshot = self._snapshot
+        if snapshot is not None and not self._is_stale(snapshot):
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or self._is_stale(snapshot):
+                try:
+                    self._snapshot = snapshot = FundamentalSnapshot.load()
+                except Exception as e:
+                    if snapshot is None:
+                        raise
+                    logger.error(f"重新加载每日指标失败，继续使用旧数据: {str(e)}")
+            return snapshot
+
+    def _is_stale(self, snapshot):
+        if snapshot.version != get_version(DAILY_BASIC_VERSION):
+            return True
+        return self.max_age > 0 and time.time() - snapshot.loaded_at > self.max_age
+
+    def screen(self, ranges=None, sort=None, sector_id=None, limit=50):
+        """ranges: {列名: (下限, 上限)}，闭区间，None 表示不限；sort: ['-total_mv', 'pe_ttm']，- 为降序
+
+        指标缺失的股票不满足该列的任何条件，排序时排在最后
+        """
+        ranges = ranges or {}
+        sort = sort or []
+        for field in list(ranges) + [key.lstrip('-') for key in sort]:
+            if field not in SCREEN_FIELDS:
+                raise ValueError(f"不支持的字段: {field}")
+        if not 0 < limit <= MAX_SCREEN_LIMIT:
+            raise ValueError(f"limit 须在 1 到 {MAX_SCREEN_LIMIT} 之间")
+
+        snapshot = self.snapshot()
+        columns = snapshot.columns
+        mask = np.ones(len(snapshot.codes), dtype=bool)
+        if sector_id is not None:
+            in_sector = np.zeros(len(snapshot.codes), dtype=bool)
+            in_sector[snapshot.rows(get_reference_data().sector_members(sector_id))] = True
+            mask &= in_sector
+        for field, (low, high) in ranges.items():
+            if low is not None:
+                mask &= columns[field] >= low
+            if high is not None:
+                mask &= columns[field] <= high
+
+        matched = np.flatnonzero(mask)
+        if sort:
+            # lexsort 以最后一个键为主键；NaN 在升序、降序（取负）时都排在最后
+            keys = [columns[key.lstrip('-')][matched] * (-1 if key.startswith('-') else 1)
+                    for key in reversed(sort)]
+            matched = matched[np.lexsort(keys)]
+
+        selected = matched[:limit].tolist()
+        codes = [snapshot.codes[i] for i in selected]
+        names = get_reference_data().stock_names(codes)
+        values = {field: columns[field][selected].tolist() for field in SCREEN_FIELDS}
+        return {
+            'trade_date': snapshot.trade_date,
+            'total': int(mask.sum()),
+            'stocks': [dict({'code': code, 'name': names[code]},
+                            **{field: None if values[field][i] != values[field][i] else values[field][i]
+                               for field in SCREEN_FIELDS})
+                       for i, code in enumerate(codes)]
+        }
+
+def parse_screen_args(args):
+    """从查询参数解析筛选条件: 字段=下限..上限（任一侧可省略），sort=-total_mv,pe_ttm，limit，sector_id
+
+    例: ?pe_ttm=..20&turnover_rate=3..&total_mv=1000000..5000000&sort=-total_mv
+    """
+    ranges = {}
+    for field in SCREEN_FIELDS:
+        value = args.get(field)
+        if not value:
+            continue
+        if '..' not in value:
+            raise ValueError(f"{field} 的格式应为 下限..上限: {value}")
+        low, high = value.split('..', 1)
+        try:
+            ranges[field] = (float(low) if low else None, float(high) if high else None)
+        except ValueError:
+            raise ValueError(f"{field} 的取值不是数字: {value}")
+    sort = [key.strip() for key in args.get('sort', '').split(',') if key.strip()]
+    return {
+        'ranges': ranges,
+        'sort': sort,
+        'sector_id': args.get('sector_id', type=int),
+        'limit': args.get('limit', 50, type=int)
+    }
+
+# 进程内共享的筛选器
+_screener = None
+_screener_lock = threading.Lock()
+
+def get_screener():
+    global _screener
+    with _screener_lock:
+        if _screener is None:
+            _screener = Screener()
+        return _screener
@@ -0,0 +1,163 @@
+from utils.database import get_mysql_connection
+from utils.result_cache import get_result_cache
+from app.services.reference_data import get_reference_data
+from app.services.price_cube import get_price_cube
+from app.services.sector_engine import pivot_bars, DEFAULT_START_DATE
+import threading
+import numpy as np
+import pandas as pd
+
+# 板块成分股相关性
+#
+# 成分股日收益整理成 交易日 × 股票 矩阵 R（缺失为 0）和是否有日线的 0/1 矩阵 M，
+# 两两相关系数只用两只股票都有日线的交易日，各项和由几次矩阵乘法一次得到:
+#   n_ij = M'M      Σr_i = R'M      Σr_i² = (R²)'M      Σr_i r_j = R'R
+# beta 相对板块等权日收益（与 sector_daily.equal_return 一致）计算
+
+MAX_SECTOR_SIZE = 500
+MIN_OVERLAP_DAYS = 10  # 共同交易日少于该值的股票对相关系数为空
+
+class SectorCorrelation:
+    """板块成分股相关矩阵、层次聚类顺序和相对板块的 beta
+
+    结果经共享的结果缓存按 (板块, 区间, 全局数据版本, 基础数据版本) 缓存，数据更新或成分股变化后自然失效
+    """
+
+    def get(self, sector_id, start_date=DEFAULT_START_DATE, end_date=None):
+        reference = get_reference_data()
+        # 没有立方体时直接读 stock_data，行情入库只递增全局版本，键中用全局数据版本（make_key 默认）
+        cache = get_result_cache()
+        key, version = cache.make_key('sector_correlation.get', (sector_id, start_date, end_date, reference.version))
+        return cache.get_or_compute('sector_correlation.get', key, version,
+                                    lambda: self._compute(reference, sector_id, start_date, end_date))
+
+    def _compute(self, reference, sector_id, start_date, end_date):
+        members = reference.sector_members(sector_id)
+        if len(members) > MAX_SECTOR_SIZE:
+            raise ValueError(f"板块成分股 {len(members)} 只，超过上限 {MAX_SECTOR_SIZE}")
+        codes, dates, returns = self._load_returns(members, start_date, end_date)
+        return correlation_payload(codes, dates, returns, reference.stock_names(codes))
+
+    def _load_returns(self, members, start_date, end_date):
+        """返回 (股票代码, 交易日 YYYYMMDD, 交易日 × 股票 的日收益 float64，缺失为 NaN)"""
+        start_date = start_date or DEFAULT_START_DATE
+        cube = get_price_cube(start_date, end_date)
+        if cube is not None:
+            panel, codes = cube.panel('pct_chg', members, start_date, end_date)
+            dates = cube.dates[cube.date_slice(start_date, end_date)]
+            return codes, dates, panel.T.astype(np.float64) / 100
+
+        if not members:
+            return [], [], np.empty((0, 0))
+        with get_mysql_connection() as conn:
+            cursor = conn.cursor()
+            sql = f'''
+                SELECT ts_code, trade_date, pct_chg
+                FROM stock_data
+                WHERE ts_code IN ({','.join(['%s'] * len(members))})
+                AND trade_date >= %s
+            '''
+            params = list(members) + [start_date]
+            if end_date:
+                sql += ' AND trade_date <= %s'
+                params.append(end_date)
+            cursor.execute(sql, params)
+            bars = pd.DataFrame(cursor.fetchall(), columns=['ts_code', 'trade_date', 'pct_chg'])
+        codes, dates, values, present = pivot_bars(bars, ['pct_chg'])
+        return codes.tolist(), dates.tolist(), values['pct_chg'] / 100
+
+def pairwise_correlation(returns, min_overlap=MIN_OVERLAP_DAYS):
+    """交易日 × 股票 收益矩阵（NaN 为缺失）的两两相关系数，只用共同交易日；返回 (相关矩阵, 共同交易日数)"""
+    present = ~np.isnan(returns)
+    m = present.astype(np.float64)
+    r = np.where(present, returns, 0)
+
+    n = m.T @ m
+    sum_r = r.T @ m  # [i, j]: 股票 i 在与 j 共同交易日上的收益和
+    sum_sq = (r * r).T @ m
+    sum_rr = r.T @ r
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = sum_r / n
+        cov = sum_rr / n - mean * mean.T
+        var = sum_sq / n - mean * mean
+        corr = cov / np.sqrt(var * var.T)
+    corr[(n < min_overlap) | ~np.isfinite(corr)] = np.nan
+    np.fill_diagonal(corr, np.where(np.diag(n) >= min_overlap, 1.0, np.nan))
+    return np.clip(corr, -1, 1), n.astype(np.int64)
+
+def sector_betas(returns):
+    """每只股票相对板块等权日收益的 beta 和参与计算的交易日数"""
+    present = ~np.isnan(returns)
+    m = present.astype(np.float64)
+    r = np.where(present, returns, 0)
+    counts = m.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        market = np.where(counts > 0, r.sum(axis=1) / counts, 0)
+        days = m.sum(axis=0)
+        mean_r = r.sum(axis=0) / days
+        mean_m = (m.T @ market) / days
+        cov = (r.T @ market) / days - mean_r * mean_m
+        var = (m.T @ (market * market)) / days - mean_m * mean_m
+        beta = cov / var
+    beta[(days < MIN_OVERLAP_DAYS) | ~np.isfinite(beta)] = np.nan
+    return beta, days.astype(np.int64)
+
+def cluster_order(corr):
+    """按距离 sqrt((1 - ρ) / 2) 做平均连接层次聚类，返回树叶从左到右的顺序
+
+    相关系数为空的股票对按不相关（ρ = 0）处理
+    """
+    size = len(corr)
+    if size <= 2:
+        return list(range(size))
+    dist = np.sqrt((1 - np.nan_to_num(corr, nan=0.0)) / 2)
+    np.fill_diagonal(dist, np.inf)
+    orders = [[i] for i in range(size)]
+    weights = np.ones(size)
+    active = np.ones(size, dtype=bool)
+    for _ in range(size - 1):
+        i, j = np.unravel_index(np.argmin(dist), dist.shape)
+        i, j = min(i, j), max(i, j)
+        # 合并后的簇放在 i，与其他簇的距离按簇大小加权平均
+        merged = (dist[i] * weights[i] + dist[j] * weights[j]) / (weights[i] + weights[j])
+        dist[i, :] = dist[:, i] = merged
+        dist[i, i] = np.inf
+        dist[j, :] = dist[:, j] = np.inf
+        orders[i] = orders[i] + orders[j]
+        weights[i] += weights[j]
+        active[j] = False
+    return orders[int(np.flatnonzero(active)[0])]
+
+def correlation_payload(codes, dates, returns, names):
+    """按聚类顺序组装返回结构，相关矩阵的行列与 stocks 顺序一致"""
+    if not len(codes):
+        return {'start': None, 'end': None, 'stocks': [], 'matrix': []}
+    corr, _ = pairwise_correlation(returns)
+    beta, days = sector_betas(returns)
+    order = cluster_order(corr)
+
+    corr = np.round(corr[np.ix_(order, order)], 4)
+    matrix = [[None if value != value else value for value in row] for row in corr.tolist()]
+    stocks = [{
+        'code': codes[i],
+        'name': names.get(codes[i]) or codes[i],
+        'beta': None if np.isnan(beta[i]) else round(float(beta[i]), 4),
+        'days': int(days[i])
+    } for i in order]
+    return {
+        'start': dates[0] if len(dates) else None,
+        'end': dates[-1] if len(dates) else None,
+        'stocks': stocks,
+        'matrix': matrix
+    }
+
+# 进程内共享的相关性服务
+_sector_correlation = None
+_sector_correlation_lock = threading.Lock()
+
+def get_sector_correlation():
+    global _sector_correlation
+    with _sector_correlation_lock:
+        if _sector_correlation is None:
+            _sector_correlation = SectorCorrelation()
+        return _sector_correlation
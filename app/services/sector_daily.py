@@ -0,0 +1,242 @@
+from utils.logger import setup_logger
+from utils.database import get_mysql_connection, bulk_upsert
+from utils.date_utils import to_date_str, format_trade_date
+from utils.data_version import bump_version, DATA_VERSION
+from app.services.reference_data import get_reference_data
+from app.services.sector_engine import pivot_bars, format_amount_wan, DEFAULT_START_DATE
+import hashlib
+import time
+import numpy as np
+import pandas as pd
+
+logger = setup_logger('sector_daily')
+
+SECTOR_DAILY_COLUMNS = ['sector_id', 'trade_date', 'equal_return', 'amount_return', 'total_amount',
+                        'advancers', 'decliners', 'member_count']
+
+class SectorDailyUpdater:
+    """维护 sector_daily 板块日汇总表
+
+    每次刷新只计算两类数据:
+    1. 成分股发生变化的板块（成分股哈希与 sector_daily_state 中记录的不同），从 start_date 起全部重算
+    2. 其余板块只计算 sector_daily 中最新交易日（含）之后的交易日
+    """
+
+    def __init__(self, start_date=DEFAULT_START_DATE):
+        self.start_date = start_date
+
+    def refresh(self, full=False):
+        start_time = time.time()
+        reference = get_reference_data()
+        sectors = {sector['sector_id']: reference.sector_members(sector['sector_id'])
+                   for sector in reference.list_sectors()}
+        hashes = {sector_id: _member_hash(members) for sector_id, members in sectors.items()}
+
+        with get_mysql_connection() as conn:
+            cursor = conn.cursor()
+            state = self._load_state(cursor)
+
+            changed = [sid for sid in sectors if full or state.get(sid) != hashes[sid]]
+            removed = [sid for sid in state if sid not in sectors]
+            unchanged = [sid for sid in sectors if sid not in changed]
+
+            self._delete(conn, changed + removed)
+
+            rows = 0
+            if changed:
+                bars = self._load_bars(cursor, {code for sid in changed for code in sectors[sid]},
+                                       start_date=self.start_date)
+                rows += self._write(conn, compute_sector_daily(bars, {sid: sectors[sid] for sid in changed}))
+
+            new_dates = []
+            if unchanged:
+                # 最新一天也重算，覆盖该交易日在上次刷新后才补齐的日线
+                watermark = self._get_watermark(cursor, unchanged) or self.start_date
+                new_dates = self._get_dates_since(cursor, watermark)
+                if new_dates:
+                    bars = self._load_bars(cursor, {code for sid in unchanged for code in sectors[sid]},
+                                           trade_dates=new_dates)
+                    rows += self._write(conn, compute_sector_daily(bars, {sid: sectors[sid] for sid in unchanged}))
+
+            self._save_state(conn, {sid: hashes[sid] for sid in changed}, removed)
+
+        if rows or removed:
+            bump_version(DATA_VERSION)
+
+        result = {
+            'success': True,
+            'changed_sectors': len(changed),
+            'removed_sectors': len(removed),
+            'new_dates': len(new_dates),
+            'rows': rows,
+            'seconds': round(time.time() - start_time, 2)
+        }
+        logger.info(f"刷新板块日汇总: {result}")
+        return result
+
+    def _load_state(self, cursor):
+        cursor.execute('SELECT sector_id, member_hash FROM sector_daily_state')
+        return dict(cursor.fetchall())
+
+    def _save_state(self, conn, hashes, removed):
+        cursor = conn.cursor()
+        if hashes:
+            cursor.executemany('''
+                INSERT INTO sector_daily_state (sector_id, member_hash)
+                VALUES (%s, %s)
+                ON DUPLICATE KEY UPDATE member_hash = VALUES(member_hash)
+            ''', list(hashes.items()))
+        if removed:
+            placeholders = ','.join(['%s'] * len(removed))
+            cursor.execute(f'DELETE FROM sector_daily_state WHERE sector_id IN ({placeholders})', removed)
+        conn.commit()
+
+    def _delete(self, conn, sector_ids):
+        if not sector_ids:
+            return
+        cursor = conn.cursor()
+        placeholders = ','.join(['%s'] * len(sector_ids))
+        cursor.execute(f'DELETE FROM sector_daily WHERE sector_id IN ({placeholders})', sector_ids)
+        conn.commit()
+
+    def _get_watermark(self, cursor, sector_ids):
+        placeholders = ','.join(['%s'] * len(sector_ids))
+        cursor.execute(f'SELECT MAX(trade_date) FROM sector_daily WHERE sector_id IN ({placeholders})',
+                       sector_ids)
+        max_date = cursor.fetchone()[0]
+        return to_date_str(max_date) if max_date else None
+
+    def _get_dates_since(self, cursor, watermark):
+        cursor.execute('SELECT DISTINCT trade_date FROM stock_data WHERE trade_date >= %s', (watermark,))
+        return sorted(to_date_str(row[0]) for row in cursor.fetchall())
+
+    def _load_bars(self, cursor, codes, start_date=None, trade_dates=None):
+        if not codes:
+            return pd.DataFrame(columns=['ts_code', 'trade_date', 'pct_chg', 'amount'])
+        codes = sorted(codes)
+        sql = f'''
+            SELECT ts_code, trade_date, pct_chg, amount
+            FROM stock_data
+            WHERE ts_code IN ({','.join(['%s'] * len(codes))})
+        '''
+        params = list(codes)
+        if trade_dates:
+            sql += f" AND trade_date IN ({','.join(['%s'] * len(trade_dates))})"
+            params += list(trade_dates)
+        else:
+            sql += ' AND trade_date >= %s'
+            params.append(start_date)
+        cursor.execute(sql, params)
+        return pd.DataFrame(cursor.fetchall(), columns=['ts_code', 'trade_date', 'pct_chg', 'amount'])
+
+    def _write(self, conn, df):
+        return bulk_upsert(conn, 'sector_daily', df, SECTOR_DAILY_COLUMNS)['rows']
+
+def compute_sector_daily(bars, sectors):
+    """按板块计算每日汇总，sectors 为 {sector_id: 成分股代码}
+
+    equal_return: 成分股当日涨跌幅的算术平均（%）
+    amount_return: 按当日成交额加权的涨跌幅（%）
+    total_amount: 成分股当日成交额合计（千元）
+    """
+    codes, dates, values, present = pivot_bars(bars, ['pct_chg', 'amount'])
+    if not len(dates):
+        return pd.DataFrame(columns=SECTOR_DAILY_COLUMNS)
+    column_of = {code: i for i, code in enumerate(codes)}
+    pct_all = values['pct_chg']
+    amount_all = np.nan_to_num(values['amount'])
+
+    frames = []
+    for sector_id, members in sectors.items():
+        columns = [column_of[code] for code in members if code in column_of]
+        if not columns:
+            continue
+        pct = pct_all[:, columns]
+        amount = amount_all[:, columns]
+        has_pct = ~np.isnan(pct)
+        count = present[:, columns].sum(axis=1)
+        pct_filled = np.where(has_pct, pct, 0)
+        weight = np.where(has_pct, amount, 0)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            equal_return = pct_filled.sum(axis=1) / has_pct.sum(axis=1)
+            amount_return = (pct_filled * weight).sum(axis=1) / weight.sum(axis=1)
+
+        rows = count > 0
+        frames.append(pd.DataFrame({
+            'sector_id': sector_id,
+            'trade_date': dates[rows],
+            'equal_return': np.round(equal_return[rows], 4),
+            'amount_return': np.round(amount_return[rows], 4),
+            'total_amount': np.round(amount.sum(axis=1)[rows], 3),
+            'advancers': (pct_filled > 0).sum(axis=1)[rows],
+            'decliners': (pct_filled < 0).sum(axis=1)[rows],
+            'member_count': count[rows]
+        }))
+
+    if not frames:
+        return pd.DataFrame(columns=SECTOR_DAILY_COLUMNS)
+    df = pd.concat(frames, ignore_index=True)
+    # inf（成交额合计为 0）与 NaN 一样写成 NULL
+    return df.replace([np.inf, -np.inf], np.nan)
+
+def get_sector_summary(cursor, sector_id, start_date=DEFAULT_START_DATE, end_date=None):
+    """从 sector_daily 读取板块每日汇总，cum_return 为等权日收益自 start_date 起的复利累计（%），成交额单位为元"""
+    sql = '''
+        SELECT trade_date, equal_return, amount_return, total_amount, advancers, decliners, member_count
+        FROM sector_daily
+        WHERE sector_id = %s AND trade_date >= %s
+    '''
+    params = [sector_id, start_date or DEFAULT_START_DATE]
+    if end_date:
+        sql += ' AND trade_date <= %s'
+        params.append(end_date)
+    cursor.execute(sql + ' ORDER BY trade_date', params)
+    rows = cursor.fetchall()
+
+    dates = []
+    summary = {}
+    cumulative = 1.0
+    for trade_date, equal_return, amount_return, total_amount, advancers, decliners, member_count in rows:
+        date = format_trade_date(trade_date)
+        equal_return = float(equal_return) if equal_return is not None else 0
+        cumulative *= 1 + equal_return / 100
+        amount = float(total_amount) * 1000 if total_amount else 0  # 千元 -> 元
+        dates.append(date)
+        summary[date] = {
+            'equal_return': equal_return,
+            'amount_return': float(amount_return) if amount_return is not None else None,
+            'cum_return': round((cumulative - 1) * 100, 4),
+            'total_amount': amount,
+            'total_amount_str': format_amount_wan(amount / 10000),
+            'advancers': advancers,
+            'decliners': decliners,
+            'member_count': member_count
+        }
+    return {
+        'dates': dates,
+        'summary': summary
+    }
+
+def submit_refresh_job(full=False):
+    """提交后台刷新任务；已有刷新任务在运行时合并到该任务中，任务结束前再刷新一次
+
+    运行期间提交的 full=True 不会丢失，再刷新的一遍全量重算
+    """
+    from app.services.job_manager import job_manager
+
+    def run_refresh(job, params):
+        return SectorDailyUpdater().refresh(full=params['full'])
+
+    job, created = job_manager.submit_or_rerun('refresh_sector_daily', run_refresh, {'full': full})
+    return job
+
+def _member_hash(members):
+    return hashlib.md5(','.join(sorted(members)).encode('utf-8')).hexdigest()
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='刷新板块日汇总表 sector_daily')
+    parser.add_argument('--full', action='store_true', help='所有板块从头重算')
+    args = parser.parse_args()
+    SectorDailyUpdater().refresh(full=args.full)
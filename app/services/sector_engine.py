@@ -0,0 +1,227 @@
+from utils.date_utils import to_date_str, format_trade_date
+from utils.compact_json import encode_array
+from config.config import ANALYSIS_CONFIG
+import numpy as np
+import pandas as pd
+
+# 板块涨幅计算引擎
+#
+# 一次扫描取出板块成分股的日线，整理成 日期 × 股票 的二维数组，
+# 相对首日开盘价的累计涨幅、每日成交额合计、每日排序都用数组运算完成，
+# 只在最后组装返回结构时逐行遍历
+
+DEFAULT_START_DATE = ANALYSIS_CONFIG['DEFAULT_START_DATE']
+
+BAR_COLUMNS = ['ts_code', 'trade_date', 'open', 'close', 'amount']
+
+def load_sector_bars(cursor, codes, start_date=DEFAULT_START_DATE, end_date=None, placeholder='%s'):
+    """一次查询取出成分股 [start_date, end_date] 的日线，placeholder 为 MySQL 的 %s 或 SQLite 的 ?"""
+    if not codes:
+        return pd.DataFrame(columns=BAR_COLUMNS)
+    placeholders = ','.join([placeholder] * len(codes))
+    sql = f'''
+        SELECT ts_code, trade_date, open, close, amount
+        FROM stock_data
+        WHERE ts_code IN ({placeholders})
+        AND trade_date >= {placeholder}
+    '''
+    params = list(codes) + [start_date or DEFAULT_START_DATE]
+    if end_date:
+        sql += f' AND trade_date <= {placeholder}'
+        params.append(end_date)
+    cursor.execute(sql, params)
+    rows = cursor.fetchall()
+    if rows and isinstance(rows[0], dict):
+        rows = [tuple(row[c] for c in BAR_COLUMNS) for row in rows]
+    return pd.DataFrame(rows, columns=BAR_COLUMNS)
+
+class SectorPanel:
+    """板块日线面板，行为交易日（升序），列为股票代码（升序）
+
+    open/close/amount 为 float64 数组，缺失为 NaN；present 标记该股票当天是否有日线
+    """
+
+    def __init__(self, codes, dates, open_, close, amount, present):
+        self.codes = codes
+        self.dates = dates
+        self.open = open_
+        self.close = close
+        self.amount = amount
+        self.present = present
+
+    @classmethod
+    def from_frame(cls, df):
+        codes, dates, values, present = pivot_bars(df, ['open', 'close', 'amount'])
+        return cls(codes, dates, values['open'], values['close'], values['amount'], present)
+
+    @classmethod
+    def from_cube(cls, cube, codes, start_date=DEFAULT_START_DATE, end_date=None):
+        """从行情立方体切出成分股的面板，不查询数据库"""
+        start_date = start_date or DEFAULT_START_DATE
+        dates = np.array(cube.dates[cube.date_slice(start_date, end_date)], dtype=object)
+        values = {}
+        for field in ['open', 'close', 'amount']:
+            panel, found = cube.panel(field, sorted(codes), start_date, end_date)
+            values[field] = panel.T.astype(np.float64)
+        present = ~np.isnan(values['close'])
+        # 去掉整个区间都没有日线的交易日，与按行查询的结果一致
+        rows = present.any(axis=1)
+        return cls(np.array(found, dtype=object), dates[rows], values['open'][rows],
+                   values['close'][rows], values['amount'][rows], present[rows])
+
+    def base_open(self):
+        """每只股票第一个有日线的交易日的开盘价"""
+        if not self.present.size:
+            return np.empty(0)
+        first_row = self.present.argmax(axis=0)
+        return self.open[first_row, np.arange(len(self.codes))]
+
+    def cumulative_change(self, decimals=2):
+        """相对首日开盘价的累计涨幅（%），基准价缺失或为 0 时为 NaN；decimals=None 时不取整"""
+        base = self.base_open()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change = (self.close - base) / np.where(base == 0, np.nan, base) * 100
+        change[~self.present] = np.nan
+        return change if decimals is None else np.round(change, decimals)
+
+    def daily_totals(self):
+        """每日成交额合计（与 amount 同单位）"""
+        return np.nansum(self.amount, axis=1)
+
+    def daily_order(self, values):
+        """每天有日线的股票按 values 从小到大排列的列下标，NaN 排在最后"""
+        order = np.argsort(values, axis=1, kind='stable')
+        return [row_order[self.present[i, row_order]] for i, row_order in enumerate(order)]
+
+def pivot_bars(df, columns):
+    """把 (ts_code, trade_date, ...) 日线整理成 日期 × 股票 的数组
+
+    返回 (有序股票代码, 有序交易日 YYYYMMDD, {列名: float64 数组}, 是否有日线的布尔数组)
+    """
+    if df.empty:
+        empty = np.empty((0, 0))
+        return (np.array([], dtype=object), np.array([], dtype=object),
+                {column: empty for column in columns}, empty.astype(bool))
+
+    code_idx, codes = _sorted_factorize(df['ts_code'], lambda c: c)
+    date_idx, dates = _sorted_factorize(df['trade_date'], to_date_str)
+    shape = (len(dates), len(codes))
+
+    values = {}
+    for column in columns:
+        values[column] = np.full(shape, np.nan)
+        values[column][date_idx, code_idx] = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=float)
+
+    present = np.zeros(shape, dtype=bool)
+    present[date_idx, code_idx] = True
+    return codes, dates, values, present
+
+def daily_changes_payload(panel, names):
+    """按 StockAnalysis.get_daily_changes 的返回结构组装结果，成交额单位为万元"""
+    change = panel.cumulative_change()
+    # 组装前整体转成 Python 列表，避免逐个读取 numpy 标量
+    change_rows = change.tolist()
+    amount_rows = (np.nan_to_num(panel.amount) / 10).tolist()  # 千元 -> 万元
+    totals_wan = (panel.daily_totals() / 10).tolist()
+    codes = panel.codes.tolist()
+    stock_names = [names.get(code) or code for code in codes]
+
+    daily_data = {}
+    dates = [format_trade_date(d) for d in panel.dates]
+    for i, columns in enumerate(panel.daily_order(change)):
+        day_change = change_rows[i]
+        day_amount = amount_rows[i]
+        daily_data[dates[i]] = {
+            'stocks': [{
+                'code': codes[j],
+                'name': stock_names[j],
+                'change': None if day_change[j] != day_change[j] else day_change[j],  # NaN -> None
+                'amount': day_amount[j],
+                'amount_str': format_amount_wan(day_amount[j])
+            } for j in columns.tolist()],
+            'total_amount': totals_wan[i],
+            'total_amount_str': format_amount_wan(totals_wan[i])
+        }
+
+    return {
+        'daily_data': daily_data,
+        'dates': dates
+    }
+
+def sector_stocks_payload(panel, names):
+    """按 /api/sector/<id>/stocks 的返回结构组装结果，成交额单位为元
+
+    每个 (交易日, 股票) 只访问一次；涨跌幅相对该股票区间首日开盘价，
+    没有基准价时记 0，每天按涨跌幅从小到大排列
+    """
+    change = np.nan_to_num(panel.cumulative_change(decimals=None))
+    change_rows = change.tolist()
+    open_rows = np.nan_to_num(panel.open).tolist()
+    close_rows = np.nan_to_num(panel.close).tolist()
+    amount_rows = (np.nan_to_num(panel.amount) * 1000).tolist()  # 千元 -> 元
+    totals = (panel.daily_totals() * 1000).tolist()
+    codes = panel.codes.tolist()
+    stock_names = [names.get(code) or code for code in codes]
+
+    daily_changes = {}
+    dates = [format_trade_date(d) for d in panel.dates]
+    for i, columns in enumerate(panel.daily_order(change)):
+        day_amount = amount_rows[i]
+        daily_changes[dates[i]] = {
+            'stocks': [{
+                'code': codes[j],
+                'name': stock_names[j],
+                'open': open_rows[i][j],
+                'close': close_rows[i][j],
+                'amount': day_amount[j],
+                'amount_str': format_amount_yuan(day_amount[j]),
+                'change': change_rows[i][j]
+            } for j in columns.tolist()],
+            'total_amount': totals[i],
+            'total_amount_str': format_amount_yuan(totals[i])
+        }
+
+    return {
+        'daily_changes': daily_changes,
+        'dates': dates
+    }
+
+def sector_stocks_compact(panel, names, binary=False):
+    """/api/sector/<id>/stocks 的紧凑格式（format=compact）
+
+    股票代码、名称只发送一次；open/close/amount（元）/change 为 交易日 × 股票 的二维数组，
+    当天没有日线为缺失。order 为每天有日线的股票按涨跌幅从小到大的列下标依次拼接，
+    order_counts 为每天的个数。金额字符串由前端格式化
+    """
+    change = np.nan_to_num(panel.cumulative_change(decimals=None))
+    order = panel.daily_order(change)
+    dates = [format_trade_date(d) for d in panel.dates]
+    codes = panel.codes.tolist()
+    return {
+        'format': 'compact',
+        'dates': dates,
+        'codes': codes,
+        'names': [names.get(code) or code for code in codes],
+        'open': encode_array(panel.open, binary, 'float32'),
+        'close': encode_array(panel.close, binary, 'float32'),
+        'amount': encode_array(panel.amount * 1000, binary),  # 千元 -> 元
+        'change': encode_array(np.where(panel.present, change, np.nan), binary, 'float32'),
+        'order': encode_array(np.concatenate(order) if order else np.empty(0), binary, 'int32'),
+        'order_counts': [len(columns) for columns in order],
+        'total_amount': (panel.daily_totals() * 1000).tolist()
+    }
+
+def format_amount_yuan(amount):
+    return f"{amount/100000000:.2f}亿" if amount >= 100000000 else f"{amount/10000:.2f}万"
+
+def format_amount_wan(amount_wan):
+    return f"{amount_wan/10000:.2f}亿" if amount_wan >= 10000 else f"{amount_wan:.2f}万"
+
+def _sorted_factorize(series, normalize):
+    """factorize 后按规范化的值排序，返回 (每行的下标, 有序的唯一值)"""
+    labels, uniques = pd.factorize(series)
+    values = np.array([normalize(v) for v in uniques], dtype=object)
+    order = np.argsort(values, kind='stable')
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    return rank[labels], values[order]
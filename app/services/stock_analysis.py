@@ -1,9 +1,18 @@
 from utils.logger import setup_logger
+from utils.date_utils import format_trade_date
 from utils.database import get_mysql_connection
+from utils.result_cache import cached_result
+from app.services.reference_data import get_reference_data
+from app.services.sector_engine import load_sector_bars, SectorPanel, daily_changes_payload, DEFAULT_START_DATE
+from app.services.sector_daily import get_sector_summary
+from app.services.price_cube import get_price_cube, MIN_GROWTH
+import numpy as np
 
 logger = setup_logger('stock_analysis')
 
 class StockAnalysis:
+    """板块、个股分析；get_window_returns 的结果按 (参数, 数据版本) 缓存，由多个请求共享，不能修改"""
+
     def convert_stock_code(self, code):
         """转换股票代码格式
         sh.600001 -> 600001.SH
@@ -21,154 +30,93 @@ class StockAnalysis:
         except:
             return None
 
-    def get_daily_changes(self, sector_id):
-        """获取板块内股票的每日涨幅数据"""
+    def get_daily_changes(self, sector_id, start_date=DEFAULT_START_DATE, end_date=None, summary_only=False):
+        """获取板块内股票 [start_date, end_date] 的每日涨幅数据，涨幅相对区间首日开盘价
+
+        summary_only=True 时只返回 sector_daily 中的板块每日汇总
+        """
         try:
-            with get_mysql_connection() as conn:
-                cursor = conn.cursor(dictionary=True)
-                
-                # 获取板块内的股票列表
-                cursor.execute('''
-                    SELECT stock_code 
-                    FROM sector_stocks 
-                    WHERE sector_id = %s
-                ''', (sector_id,))
-                stocks = [row['stock_code'] for row in cursor.fetchall()]
-                
-                if not stocks:
-                    return None
-                    
-                # 使用一个SQL查询获取所有股票的数据
-                placeholders = ','.join(['%s' for _ in stocks])
-                cursor.execute(f'''
-                    WITH FirstPrices AS (
-                        -- 获取每只股票的第一个交易日开盘价
-                        SELECT ts_code, open as first_open
-                        FROM stock_data sd1
-                        WHERE ts_code IN ({placeholders})
-                        AND trade_date = (
-                            SELECT MIN(trade_date)
-                            FROM stock_data sd2
-                            WHERE sd2.ts_code = sd1.ts_code
-                            AND trade_date >= '20240920'
-                        )
-                    ),
-                    DailyData AS (
-                        -- 获取每日数据
-                        SELECT 
-                            sd.trade_date,
-                            sd.ts_code,
-                            sd.close,
-                            sd.amount,
-                            fp.first_open
-                        FROM stock_data sd
-                        JOIN FirstPrices fp ON sd.ts_code = fp.ts_code
-                        WHERE sd.ts_code IN ({placeholders})
-                        AND sd.trade_date >= '20240920'
-                    ),
-                    DailyChanges AS (
-                        -- 计算每日涨跌幅
-                        SELECT 
-                            trade_date,
-                            ts_code,
-                            ROUND(((close - first_open) / first_open * 100), 2) as total_change,
-                            amount
-                        FROM DailyData
-                    ),
-                    DailyTotals AS (
-                        -- 计算每日总成交额
-                        SELECT 
-                            trade_date,
-                            SUM(amount) as total_amount
-                        FROM DailyData
-                        GROUP BY trade_date
-                    )
-                    SELECT 
-                        dc.trade_date,
-                        dc.ts_code,
-                        dc.total_change,
-                        dc.amount,
-                        dt.total_amount
-                    FROM DailyChanges dc
-                    JOIN DailyTotals dt ON dc.trade_date = dt.trade_date
-                    ORDER BY dc.trade_date, dc.total_change
-                ''', stocks + stocks)  # ��要两次stocks因为有两个IN子句
-                
-                rows = cursor.fetchall()
-                
-                # 处理查询结果
-                daily_data = {}
-                dates = set()
-                current_date = None
-                daily_stocks = []
-                current_total_amount = 0
-                
-                for row in rows:
-                    trade_date = f"{row['trade_date'][:4]}-{row['trade_date'][4:6]}-{row['trade_date'][6:]}"
-                    stock_code = row['ts_code']
-                    change = row['total_change']
-                    amount = float(row['amount']) if row['amount'] is not None else 0
-                    total_amount = float(row['total_amount']) if row['total_amount'] is not None else 0
-                    
-                    amount_wan = amount / 10
-                    total_amount_wan = total_amount / 10
+            if summary_only:
+                with get_mysql_connection() as conn:
+                    return get_sector_summary(conn.cursor(), sector_id, start_date, end_date)
                     
-                    if trade_date != current_date:
-                        if current_date is not None:
-                            daily_data[current_date] = {
-                                'stocks': sorted(daily_stocks, key=lambda x: x['change']),
-                                'total_amount': total_amount_wan,
-                                'total_amount_str': f"{total_amount_wan/10000:.2f}亿" if total_amount_wan >= 10000 else f"{total_amount_wan:.2f}万"
-                            }
-                        current_date = trade_date
-                        daily_stocks = []
-                        current_total_amount = total_amount_wan
-                        dates.add(trade_date)
-                    
-                    cursor.execute('SELECT 证券简称 FROM stocks WHERE 证券代码 = %s', (stock_code,))
-                    stock_name = cursor.fetchone()
-                    stock_name = stock_name['证券简称'] if stock_name else stock_code
-                    
-                    daily_stocks.append({
-                        'code': stock_code,
-                        'name': stock_name,
-                        'change': change,
-                        'amount': amount_wan,
-                        'amount_str': f"{amount_wan/10000:.2f}亿" if amount_wan >= 10000 else f"{amount_wan:.2f}万"
-                    })
-                
-                if current_date is not None:
-                    daily_data[current_date] = {
-                        'stocks': sorted(daily_stocks, key=lambda x: x['change']),
-                        'total_amount': current_total_amount,
-                        'total_amount_str': f"{current_total_amount/10000:.2f}亿" if current_total_amount >= 10000 else f"{current_total_amount:.2f}万"
-                    }
-                
-                return {
-                    'daily_data': daily_data,
-                    'dates': sorted(list(dates))
-                }
-                
+            # 获取板块内的股票列表
+            reference = get_reference_data()
+            stocks = list(reference.sector_members(sector_id))
+            
+            if not stocks:
+                return None
+            stock_names = reference.stock_names(stocks)
+            
+            # 优先从行情立方体切片，尚未构建时一次扫描取出所有成分股的日线
+            cube = get_price_cube(start_date or DEFAULT_START_DATE, end_date)
+            if cube is not None:
+                panel = SectorPanel.from_cube(cube, stocks, start_date, end_date)
+            else:
+                with get_mysql_connection() as conn:
+                    bars = load_sector_bars(conn.cursor(), stocks, start_date, end_date)
+                panel = SectorPanel.from_frame(bars)
+                
+            # 涨幅、成交额合计和排序在数组上计算
+            return daily_changes_payload(panel, stock_names)
+            
         except Exception as e:
             logger.error(f"获取每日涨幅数据失败: {str(e)}")
             return None
 
-    def get_stock_daily_data(self, stock_code):
-        """获取单个股票的每日涨幅和成交额数据"""
+    @cached_result('stock_analysis.window_returns', method=True)
+    def get_window_returns(self, stock_codes, start_date=DEFAULT_START_DATE, end_date=None):
+        """股票在 [start_date, end_date] 区间的复权收益（%）{code: 收益}，区间内没有日线的股票不返回
+
+        行情立方体可用时每只股票只需两次查表（累计对数收益之差），否则按 pct_chg 在数据库中聚合
+        """
         try:
+            cube = get_price_cube(start_date or DEFAULT_START_DATE, end_date)
+            if cube is not None:
+                rows, codes = cube.code_indices(stock_codes)
+                returns = cube.window_returns(start_date, end_date, rows)
+                return {code: round(float(value), 4) for code, value in zip(codes, returns) if not np.isnan(value)}
+                
+            if not stock_codes:
+                return {}
             with get_mysql_connection() as conn:
-                cursor = conn.cursor(dictionary=True)
+                cursor = conn.cursor()
+                placeholders = ','.join(['%s'] * len(stock_codes))
+                sql = f'''
+                    SELECT ts_code, (EXP(SUM(LN(GREATEST(1 + pct_chg / 100, %s)))) - 1) * 100
+                    FROM stock_data
+                    WHERE ts_code IN ({placeholders})
+                    AND trade_date >= %s
+                    AND pct_chg IS NOT NULL
+                '''
+                params = [MIN_GROWTH] + list(stock_codes) + [start_date or DEFAULT_START_DATE]
+                if end_date:
+                    sql += ' AND trade_date <= %s'
+                    params.append(end_date)
+                cursor.execute(sql + ' GROUP BY ts_code', params)
+                return {code: round(float(value), 4) for code, value in cursor.fetchall() if value is not None}
                 
-                # 获取股票名称
-                cursor.execute('SELECT 证券简称 FROM stocks WHERE 证券代码 = %s', (stock_code,))
-                stock_name = cursor.fetchone()
+        except Exception as e:
+            logger.error(f"获取区间收益失败: {str(e)}")
+            return None
+
+    def get_stock_daily_data(self, stock_code, start_date=DEFAULT_START_DATE, end_date=None):
+        """获取单个股票 [start_date, end_date] 的每日涨幅和成交额数据"""
+        try:
+            # 获取股票名称
+            stock_name = get_reference_data().stock_name(stock_code)
+            
+            if not stock_name:
+                logger.warning(f"未找到股票: {stock_code}")
+                return None
                 
-                if not stock_name:
-                    logger.warning(f"未找到股票: {stock_code}")
-                    return None
+            with get_mysql_connection() as conn:
+                cursor = conn.cursor(dictionary=True)
                 
                 # 获取股票数据
-                cursor.execute('''
+                date_filter = 'AND trade_date <= %s' if end_date else ''
+                params = [stock_code, start_date or DEFAULT_START_DATE] + ([end_date] if end_date else [])
+                cursor.execute(f'''
                     WITH DailyChanges AS (
                         SELECT 
                             trade_date,
@@ -177,7 +125,8 @@ class StockAnalysis:
                             amount/10000 as amount
                         FROM stock_data
                         WHERE ts_code = %s
-                        AND trade_date >= '20240920'
+                        AND trade_date >= %s
+                        {date_filter}
                         ORDER BY trade_date
                     )
                     SELECT 
@@ -190,7 +139,7 @@ class StockAnalysis:
                         amount
                     FROM DailyChanges
                     ORDER BY trade_date
-                ''', (stock_code,))
+                ''', params)
                 
                 results = cursor.fetchall()
                 
@@ -199,14 +148,14 @@ class StockAnalysis:
                     return None
                     
                 formatted_data = {
-                    'name': stock_name['证券简称'],
+                    'name': stock_name,
                     'dates': [],
                     'changes': [],
                     'volumes': []
                 }
                 
                 for row in results:
-                    date = f"{row['trade_date'][:4]}-{row['trade_date'][4:6]}-{row['trade_date'][6:]}"
+                    date = format_trade_date(row['trade_date'])
                     formatted_data['dates'].append(date)
                     formatted_data['changes'].append(float(row['pct_chg']) if row['pct_chg'] is not None else 0)
                     formatted_data['volumes'].append(float(row['amount']) if row['amount'] is not None else 0)
@@ -220,18 +169,7 @@ class StockAnalysis:
     def get_stock_sectors(self, stock_code):
         """获取股票所属的板块列表"""
         try:
-            with get_mysql_connection() as conn:
-                cursor = conn.cursor(dictionary=True)
-                
-                cursor.execute('''
-                    SELECT s.sector_name, s.sector_type
-                    FROM sectors s
-                    JOIN sector_stocks ss ON s.sector_id = ss.sector_id
-                    WHERE ss.stock_code = %s
-                    ORDER BY s.sector_type, s.sector_name
-                ''', (stock_code,))
-                
-                return cursor.fetchall()
+            return get_reference_data().stock_sectors(stock_code)
                 
         except Exception as e:
             logger.error(f"获取股票所属板块失败: {str(e)}")
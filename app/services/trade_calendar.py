@@ -0,0 +1,178 @@
+from utils.logger import setup_logger
+from utils.rate_limiter import get_rate_limiter
+from config.config import TRADE_CALENDAR_CONFIG, TUSHARE_RATE_LIMIT
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+import json
+import os
+import threading
+import time
+
+logger = setup_logger('trade_calendar')
+
+class TradeCalendar:
+    """交易日历
+
+    从 trade_cal 接口加载后缓存到本地文件，超过 REFRESH_DAYS 天或不再覆盖今天时才重新拉取；
+    查询全部在内存中完成（有序列表 + 二分查找）。cache_file='' 时只保存在内存中
+    """
+
+    def __init__(self, data_source=None, exchange='SSE', cache_file=None):
+        self.exchange = exchange
+        self.cache_file = TRADE_CALENDAR_CONFIG['CACHE_FILE'] if cache_file is None else cache_file
+        self._data_source = data_source
+        self._dates = []
+        self._date_set = set()
+        self._loaded_at = 0
+        self._lock = threading.Lock()
+
+    def load(self, force_refresh=False):
+        """加载日历，优先使用本地缓存"""
+        with self._lock:
+            cached = None if force_refresh else self._read_cache()
+            if cached is not None:
+                dates = cached
+            else:
+                dates = self._fetch()
+                self._write_cache(dates)
+            self._dates = dates
+            self._date_set = set(dates)
+            self._loaded_at = time.time()
+            return self
+
+    def refresh(self):
+        return self.load(force_refresh=True)
+
+    def _ensure_loaded(self):
+        # 常驻进程中按刷新周期重新检查缓存
+        if not self._dates or time.time() - self._loaded_at > TRADE_CALENDAR_CONFIG['REFRESH_DAYS'] * 86400:
+            self.load()
+
+    def is_trading_day(self, date):
+        self._ensure_loaded()
+        return _normalize(date) in self._date_set
+
+    def next_trading_day(self, date):
+        """date 之后的第一个交易日（不含 date）"""
+        self._ensure_loaded()
+        index = bisect_right(self._dates, _normalize(date))
+        return self._dates[index] if index < len(self._dates) else None
+
+    def prev_trading_day(self, date):
+        """date 之前的最后一个交易日（不含 date）"""
+        self._ensure_loaded()
+        index = bisect_left(self._dates, _normalize(date))
+        return self._dates[index - 1] if index > 0 else None
+
+    def latest_trading_day(self, date=None):
+        """不晚于 date 的最近交易日，date 默认为今天"""
+        self._ensure_loaded()
+        date = _normalize(date) if date else time.strftime('%Y%m%d')
+        index = bisect_right(self._dates, date)
+        return self._dates[index - 1] if index > 0 else None
+
+    def trading_days(self, start_date, end_date=None):
+        """[start_date, end_date] 区间内的交易日（升序），end_date 默认为今天"""
+        self._ensure_loaded()
+        end_date = _normalize(end_date) if end_date else time.strftime('%Y%m%d')
+        lo = bisect_left(self._dates, _normalize(start_date))
+        hi = bisect_right(self._dates, end_date)
+        return self._dates[lo:hi]
+
+    def missing_days(self, loaded_dates, start_date, end_date=None):
+        """区间内不在 loaded_dates 中的交易日"""
+        loaded = {_normalize(d) for d in loaded_dates}
+        return [d for d in self.trading_days(start_date, end_date) if d not in loaded]
+
+    def missing_days_by_stock(self, cursor, start_date, end_date=None, ts_codes=None):
+        """每只股票在区间内缺失的交易日 {ts_code: [trade_date, ...]}，只返回有缺失的股票"""
+        days = self.trading_days(start_date, end_date)
+        if not days:
+            return {}
+
+        sql = '''
+            SELECT ts_code, trade_date
+            FROM stock_data
+            WHERE trade_date >= %s AND trade_date <= %s
+        '''
+        params = [days[0], days[-1]]
+        if ts_codes:
+            sql += f" AND ts_code IN ({','.join(['%s'] * len(ts_codes))})"
+            params += list(ts_codes)
+        cursor.execute(sql, params)
+
+        loaded = {code: set() for code in (ts_codes or [])}
+        for row in cursor.fetchall():
+            loaded.setdefault(row['ts_code'], set()).add(_normalize(row['trade_date']))
+
+        missing = {}
+        for code, dates in loaded.items():
+            stock_missing = [d for d in days if d not in dates]
+            if stock_missing:
+                missing[code] = stock_missing
+        return missing
+
+    def _read_cache(self):
+        try:
+            if not self.cache_file or not os.path.exists(self.cache_file):
+                return None
+            age_days = (time.time() - os.path.getmtime(self.cache_file)) / 86400
+            if age_days > TRADE_CALENDAR_CONFIG['REFRESH_DAYS']:
+                return None
+            with open(self.cache_file) as f:
+                cache = json.load(f)
+            if cache.get('exchange') != self.exchange or cache.get('end_date', '') < time.strftime('%Y%m%d'):
+                return None
+            return cache['dates']
+        except Exception as e:
+            logger.error(f"读取交易日历缓存失败: {str(e)}")
+            return None
+
+    def _write_cache(self, dates):
+        if not self.cache_file:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_file) or '.', exist_ok=True)
+            tmp_file = f"{self.cache_file}.tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump({'exchange': self.exchange, 'end_date': self._end_date, 'dates': dates}, f)
+            os.replace(tmp_file, self.cache_file)
+        except Exception as e:
+            logger.error(f"写入交易日历缓存失败: {str(e)}")
+
+    @property
+    def _end_date(self):
+        return f'{datetime.now().year}1231'
+
+    def _fetch(self):
+        if self._data_source is None:
+            from app.services.data_source import get_data_source
+            self._data_source = get_data_source()
+
+        get_rate_limiter('tushare', TUSHARE_RATE_LIMIT).acquire()
+        df = self._data_source.trade_cal(exchange=self.exchange,
+                                         start_date=TRADE_CALENDAR_CONFIG['START_DATE'],
+                                         end_date=self._end_date,
+                                         is_open='1', fields='cal_date')
+        if df is None or df.empty:
+            raise ValueError("未获取到交易日历")
+        dates = sorted(df['cal_date'].astype(str))
+        logger.info(f"从接口加载交易日历 {dates[0]} 至 {dates[-1]}，共 {len(dates)} 个交易日")
+        return dates
+
+def _normalize(date):
+    """统一为 YYYYMMDD 字符串"""
+    if hasattr(date, 'strftime'):
+        return date.strftime('%Y%m%d')
+    return str(date).replace('-', '')
+
+# 进程内共享的交易日历
+_calendar = None
+_calendar_lock = threading.Lock()
+
+def get_trade_calendar():
+    global _calendar
+    with _calendar_lock:
+        if _calendar is None:
+            _calendar = TradeCalendar()
+        return _calendar
\ No newline at end of file
@@ -10,8 +10,27 @@ MYSQL_CONFIG = {
     'charset': 'utf8mb4'
 }
 
+# MySQL连接池配置
+MYSQL_POOL_CONFIG = {
+    'SIZE': int(os.getenv('MYSQL_POOL_SIZE', 10)),  # 每个进程的最大连接数
+    'MAX_LIFETIME': int(os.getenv('MYSQL_POOL_MAX_LIFETIME', 3600)),  # 连接最长存活秒数
+    'CHECKOUT_TIMEOUT': int(os.getenv('MYSQL_POOL_CHECKOUT_TIMEOUT', 30)),  # 等待空闲连接的最长秒数
+    'PING_IDLE': int(os.getenv('MYSQL_POOL_PING_IDLE', 5))  # 空闲超过该秒数的连接借出前先 ping
+}
+
 # Tushare配置
 TUSHARE_TOKEN = os.getenv('TUSHARE_TOKEN', '7e48b6886e59f9c5d6a6e23e6018e8c2c4f029c3c9c9f1f8c9c9f1f8')
+TUSHARE_RATE_LIMIT = int(os.getenv('TUSHARE_RATE_LIMIT', 500))  # 每分钟调用上限
+TUSHARE_DAILY_BASIC_RATE_LIMIT = int(os.getenv('TUSHARE_DAILY_BASIC_RATE_LIMIT', 200))  # daily_basic 接口每分钟调用上限
+TUSHARE_MONEYFLOW_RATE_LIMIT = int(os.getenv('TUSHARE_MONEYFLOW_RATE_LIMIT', 200))  # moneyflow 接口每分钟调用上限
+
+# 数据源配置
+DATA_SOURCE_CONFIG = {
+    'TYPE': os.getenv('DATA_SOURCE', 'tushare'),  # tushare 真实接口，record 真实接口并录制，fake 离线回放/模拟
+    'RECORD_DIR': os.getenv('DATA_SOURCE_RECORD_DIR', 'data/recordings'),
+    'FAKE_LATENCY': float(os.getenv('FAKE_SOURCE_LATENCY', 0.2)),  # 模拟接口延迟（秒）
+    'FAKE_RATE_LIMIT': int(os.getenv('FAKE_SOURCE_RATE_LIMIT', 500))  # 模拟接口每分钟调用上限
+}
 
 # 日志配置
 LOG_CONFIG = {
@@ -22,7 +41,75 @@ LOG_CONFIG = {
 
 # 其他配置
 APP_CONFIG = {
-    'DEBUG': True,
-    'HOST': '127.0.0.1',
-    'PORT': 5000
-} 
\ No newline at end of file
+    'DEBUG': os.getenv('APP_DEBUG', 'true').lower() in ('1', 'true'),  # 只用于 run.py 的开发服务器
+    'HOST': os.getenv('APP_HOST', '127.0.0.1'),
+    'PORT': int(os.getenv('APP_PORT', 5000)),
+    'WORKERS': int(os.getenv('APP_WORKERS', 4)),  # server.py 的 worker 进程数
+    'THREADS': int(os.getenv('APP_THREADS', 8)),  # 每个 worker 的处理线程数
+    'TIMEOUT': int(os.getenv('APP_TIMEOUT', 120)),  # worker 无响应超过该秒数时重启
+    'GRACEFUL_TIMEOUT': int(os.getenv('APP_GRACEFUL_TIMEOUT', 60)),  # 重载时等待进行中请求的最长秒数
+    'RELOAD_CHECK_INTERVAL': int(os.getenv('APP_RELOAD_CHECK_INTERVAL', 30)),  # 主进程检查数据版本的间隔秒数，0 表示不自动重载
+    'RELOAD_SETTLE': int(os.getenv('APP_RELOAD_SETTLE', 60))  # 数据版本保持不变该秒数、没有运行中的任务后才重载
+} 
+
+# 交易日历配置
+TRADE_CALENDAR_CONFIG = {
+    'CACHE_FILE': os.getenv('TRADE_CALENDAR_CACHE', 'data/trade_cal.json'),
+    'REFRESH_DAYS': int(os.getenv('TRADE_CALENDAR_REFRESH_DAYS', 7)),  # 本地缓存有效天数
+    'START_DATE': '20100101'
+}
+
+# 数据写入配置
+INGESTION_CONFIG = {
+    'BATCH_SIZE': int(os.getenv('INGESTION_BATCH_SIZE', 1000)),  # 每批写入行数，每批提交一次
+    'FETCH_WORKERS': int(os.getenv('INGESTION_FETCH_WORKERS', 4)),  # 并发拉取线程数
+    'QUEUE_SIZE': int(os.getenv('INGESTION_QUEUE_SIZE', 16))  # 拉取结果队列长度
+}
+
+# 数据版本配置（多个进程通过版本文件感知数据变更）
+DATA_VERSION_CONFIG = {
+    'DIR': os.getenv('DATA_VERSION_DIR', 'data/versions')
+}
+
+# 基础数据缓存配置（stocks、sectors、sector_stocks）
+REFERENCE_DATA_CONFIG = {
+    'MAX_AGE': int(os.getenv('REFERENCE_DATA_MAX_AGE', 3600))  # 没有版本变更时的最长缓存秒数，兜底直接改库的情况
+}
+
+# 分析接口配置
+ANALYSIS_CONFIG = {
+    'DEFAULT_START_DATE': os.getenv('ANALYSIS_START_DATE', '20240920'),  # 接口未指定 start 时的起始日期
+    'MAX_SECTOR_STOCKS': int(os.getenv('ANALYSIS_MAX_SECTOR_STOCKS', 1000)),  # 板块明细接口的成分股上限
+    'MAX_WINDOW_DAYS': int(os.getenv('ANALYSIS_MAX_WINDOW_DAYS', 1100))  # 板块明细接口的区间上限（自然日）
+}
+
+# 行情立方体配置（全市场 open/close/amount 按 股票 × 交易日 存成 float32，各进程只读映射）
+PRICE_CUBE_CONFIG = {
+    'DIR': os.getenv('PRICE_CUBE_DIR', 'data/price_cube'),
+    'START_DATE': os.getenv('PRICE_CUBE_START_DATE', '20240920'),
+    'KEEP_VERSIONS': 2,  # 保留的历史版本数，旧版本可能仍被其他进程映射
+    'CHUNK_DATES': 20  # 构建时每次查询的交易日数
+}
+
+# 技术指标配置（MA/EMA/MACD/RSI/KDJ/BOLL 递推状态与结果表 stock_indicators）
+INDICATOR_CONFIG = {
+    'STATE_FILE': os.getenv('INDICATOR_STATE_FILE', 'data/indicators/state.npz'),
+    'START_DATE': os.getenv('INDICATOR_START_DATE', '20240920'),  # 无保存状态时从该日起计算
+    'CHUNK_DATES': 20  # 每次查询的交易日数
+}
+
+# 计算结果缓存配置（StockAnalysis 和读接口的结果，键含全局数据版本）
+RESULT_CACHE_CONFIG = {
+    'MAX_ENTRIES': int(os.getenv('RESULT_CACHE_MAX_ENTRIES', 256)),  # 每个进程最多缓存的结果数
+    'MAX_BYTES': int(os.getenv('RESULT_CACHE_MAX_BYTES', 256 * 1024 * 1024)),  # 接口响应体合计字节上限
+    'TTL': int(os.getenv('RESULT_CACHE_TTL', 600)),  # 结果最长缓存秒数
+    'REDIS_URL': os.getenv('RESULT_CACHE_REDIS_URL', ''),  # 如 redis://127.0.0.1:6379/0，为空时只用进程内缓存
+    'LOCK_TIMEOUT': int(os.getenv('RESULT_CACHE_LOCK_TIMEOUT', 30))  # 跨进程等待同一结果的最长秒数
+}
+
+# 接口响应压缩配置（Accept-Encoding 协商，安装了 brotli 时优先 br）
+RESPONSE_CONFIG = {
+    'COMPRESS_MIN_BYTES': int(os.getenv('RESPONSE_COMPRESS_MIN_BYTES', 1024)),  # 小于该字节数的响应不压缩
+    'GZIP_LEVEL': int(os.getenv('RESPONSE_GZIP_LEVEL', 6)),
+    'BROTLI_QUALITY': int(os.getenv('RESPONSE_BROTLI_QUALITY', 5))
+}
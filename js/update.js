@@ -1518,6 +1518,21 @@ async function monitorUpdateProgress(progressBar) {
     }
 }
 
+// 等待后台任务结束，返回任务信息
+async function waitForJob(jobId) {
+    while (true) {
+        const response = await fetch(`/api/jobs/${jobId}`);
+        const data = await response.json();
+        if (!data.success) {
+            throw new Error(data.message);
+        }
+        if (data.job.status !== 'pending' && data.job.status !== 'running') {
+            return data.job;
+        }
+        await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+}
+
 // 更新财务数据
 async function updateFinancialData() {
     try {
@@ -1604,6 +1619,12 @@ async function updateDailyBasic(date = null) {
             throw new Error(data.message);
         }
         
+        // 更新在后台任务中执行，轮询到任务结束
+        const job = await waitForJob(data.job_id);
+        if (job.status !== 'completed') {
+            throw new Error(job.error || `任务状态: ${job.status}`);
+        }
+        
         alert('每日指标更新完成');
         
     } catch (error) {
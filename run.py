@@ -1,4 +1,5 @@
 from app import create_app
+from config.config import APP_CONFIG
 from utils.logger import setup_logger
 
 logger = setup_logger('main')
@@ -6,8 +7,8 @@ logger = setup_logger('main')
 if __name__ == '__main__':
     try:
         app = create_app()
-        logger.info("启动应用服务器")
-        app.run(debug=True, host='127.0.0.1', port=5000, use_reloader=False)
+        logger.info("启动应用服务器（开发模式，生产环境使用 server.py）")
+        app.run(debug=APP_CONFIG['DEBUG'], host=APP_CONFIG['HOST'], port=APP_CONFIG['PORT'], use_reloader=False)
     except Exception as e:
         logger.error(f"应用启动失败: {str(e)}")
         raise 
\ No newline at end of file
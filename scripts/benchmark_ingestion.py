@@ -0,0 +1,68 @@
+import sys
+import time
+import logging
+import argparse
+from pathlib import Path
+
+# 添加项目根目录到系统路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from app.services.data_source import FakeDataSource
+from app.services.data_updater import StockDataUpdater, STOCK_DATA_COLUMNS
+from utils.rate_limiter import TokenBucket
+from config.config import INGESTION_CONFIG
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def null_sink(df):
+    """只统计行数不写库，用于单独衡量拉取链路的吞吐"""
+    return {'rows': len(df), 'seconds': 0}
+
+def run_benchmark(args):
+    """用离线数据源经 update_historical_data 跑一遍完整的拉取 + 写入流程，输出行/秒
+
+    任务为 HISTORY_START_DATE 至今的全量更新，不读写检查点、不递增数据版本。
+    默认不经过共享的 Tushare 限流器，--throttle 给出时使用独立的限流器
+    """
+    source = FakeDataSource(record_dir=args.record_dir, latency=args.latency,
+                            rate_limit=args.rate_limit, num_stocks=args.stocks)
+    rate_limiter = TokenBucket(args.throttle) if args.throttle else None
+    updater = StockDataUpdater(data_source=source, rate_limiter=rate_limiter)
+    throttle = f'{args.throttle} 次/分钟' if args.throttle else '无'
+    logger.info(f"模式 {args.mode}，股票 {args.stocks} 只，写入 {args.sink}，限流 {throttle}")
+
+    start_time = time.time()
+    if args.sink == 'mysql':
+        from utils.database import get_mysql_connection, bulk_upsert
+        with get_mysql_connection() as conn:
+            result = updater.update_historical_data(
+                mode=args.mode, full=True, resume=False,
+                sink=lambda df: bulk_upsert(conn, 'stock_data', df, STOCK_DATA_COLUMNS,
+                                            batch_size=INGESTION_CONFIG['BATCH_SIZE']))
+    else:
+        result = updater.update_historical_data(mode=args.mode, full=True, resume=False, sink=null_sink)
+    elapsed = time.time() - start_time
+
+    status = updater.get_update_progress()
+    rows = status['rows_written']
+    logger.info(f"{result['message']}，任务 {status['total_stocks']} 个，接口调用 {source.call_count} 次，"
+                f"成功 {status['updated_count']}，失败 {len(status['error_logs'])}")
+    logger.info(f"写入 {rows} 行，耗时 {elapsed:.2f} 秒，端到端 {rows / elapsed:.0f} 行/秒")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='离线数据源上的历史数据导入基准测试')
+    parser.add_argument('--mode', choices=['date', 'stock'], default='date')
+    parser.add_argument('--sink', choices=['null', 'mysql'], default='null',
+                        help='null 只统计不写库，mysql 写入配置的数据库')
+    parser.add_argument('--stocks', type=int, default=5000, help='模拟股票数量')
+    parser.add_argument('--latency', type=float, default=0.2, help='模拟接口延迟（秒）')
+    parser.add_argument('--rate-limit', type=int, default=None, help='模拟接口每分钟调用上限')
+    parser.add_argument('--throttle', type=int, default=None, help='客户端限流，每分钟调用次数，默认不限流')
+    parser.add_argument('--record-dir', default=None, help='回放录制数据的目录')
+    run_benchmark(parser.parse_args())
\ No newline at end of file
@@ -0,0 +1,218 @@
+import sys
+import time
+import sqlite3
+import logging
+import argparse
+from pathlib import Path
+
+# 添加项目根目录到系统路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+import numpy as np
+from datetime import datetime, timedelta
+from app.services.data_source import FakeDataSource
+from app.services.sector_engine import (load_sector_bars, SectorPanel, daily_changes_payload,
+                                        sector_stocks_payload, DEFAULT_START_DATE)
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# 原来 get_daily_changes 中的查询（相关子查询取首日开盘价，IN 列表出现两次）
+LEGACY_SQL = '''
+    WITH FirstPrices AS (
+        SELECT ts_code, open as first_open
+        FROM stock_data sd1
+        WHERE ts_code IN ({placeholders})
+        AND trade_date = (
+            SELECT MIN(trade_date)
+            FROM stock_data sd2
+            WHERE sd2.ts_code = sd1.ts_code
+            AND trade_date >= '{start_date}'
+        )
+    ),
+    DailyData AS (
+        SELECT sd.trade_date, sd.ts_code, sd.close, sd.amount, fp.first_open
+        FROM stock_data sd
+        JOIN FirstPrices fp ON sd.ts_code = fp.ts_code
+        WHERE sd.ts_code IN ({placeholders})
+        AND sd.trade_date >= '{start_date}'
+    ),
+    DailyChanges AS (
+        SELECT trade_date, ts_code,
+            ROUND(((close - first_open) / first_open * 100), 2) as total_change,
+            amount
+        FROM DailyData
+    ),
+    DailyTotals AS (
+        SELECT trade_date, SUM(amount) as total_amount
+        FROM DailyData
+        GROUP BY trade_date
+    )
+    SELECT dc.trade_date, dc.ts_code, dc.total_change, dc.amount, dt.total_amount
+    FROM DailyChanges dc
+    JOIN DailyTotals dt ON dc.trade_date = dt.trade_date
+    ORDER BY dc.trade_date, dc.total_change
+'''
+
+def legacy_daily_changes(cursor, stocks, placeholder):
+    """原实现: 关联子查询 + 逐行组装 + 逐行查询股票名称"""
+    placeholders = ','.join([placeholder] * len(stocks))
+    cursor.execute(LEGACY_SQL.format(placeholders=placeholders, start_date=DEFAULT_START_DATE),
+                   list(stocks) + list(stocks))
+    daily_data = {}
+    for trade_date, code, change, amount, total_amount in cursor.fetchall():
+        cursor.execute(f'SELECT 证券简称 FROM stocks WHERE 证券代码 = {placeholder}', (code,))
+        name = cursor.fetchone()
+        day = daily_data.setdefault(str(trade_date), {'stocks': [], 'total_amount': float(total_amount or 0) / 10})
+        day['stocks'].append({'code': code, 'name': name[0] if name else code,
+                              'change': float(change) if change is not None else None,
+                              'amount': float(amount or 0) / 10})
+    return daily_data
+
+def engine_daily_changes(cursor, stocks, placeholder):
+    placeholders = ','.join([placeholder] * len(stocks))
+    cursor.execute(f'SELECT 证券代码, 证券简称 FROM stocks WHERE 证券代码 IN ({placeholders})', list(stocks))
+    names = dict(cursor.fetchall())
+    bars = load_sector_bars(cursor, stocks, placeholder=placeholder)
+    return daily_changes_payload(SectorPanel.from_frame(bars), names)
+
+def legacy_sector_stocks(cursor, stocks, placeholder, start_date):
+    """原 /api/sector/<id>/stocks: SELECT DISTINCT 后逐行查重（当天列表线性扫描）、逐日排序"""
+    placeholders = ','.join([placeholder] * len(stocks))
+    cursor.execute(f'SELECT 证券代码, 证券简称 FROM stocks WHERE 证券代码 IN ({placeholders})', list(stocks))
+    stock_names = dict(cursor.fetchall())
+    cursor.execute(f'''
+        SELECT DISTINCT ts_code, open, close, amount, trade_date
+        FROM stock_data
+        WHERE ts_code IN ({placeholders}) AND trade_date >= {placeholder}
+        ORDER BY trade_date
+    ''', list(stocks) + [start_date])
+    daily_changes = {}
+    for code, open_, close, amount, trade_date in cursor.fetchall():
+        day = daily_changes.setdefault(str(trade_date), {'stocks': [], 'total_amount': 0})
+        if not any(s['code'] == code for s in day['stocks']):
+            amount = float(amount) * 1000 if amount else 0
+            day['stocks'].append({'code': code, 'name': stock_names[code], 'open': float(open_ or 0),
+                                  'close': float(close or 0), 'amount': amount})
+            day['total_amount'] += amount
+    dates = sorted(daily_changes)
+    base_prices = {s['code']: s['open'] for s in daily_changes[dates[0]]['stocks']} if dates else {}
+    for date in dates:
+        for stock in daily_changes[date]['stocks']:
+            base = base_prices.get(stock['code'])
+            stock['change'] = (stock['close'] - base) / base * 100 if base else 0
+        daily_changes[date]['stocks'].sort(key=lambda s: s['change'])
+    return daily_changes
+
+def engine_sector_stocks(cursor, stocks, placeholder, start_date):
+    placeholders = ','.join([placeholder] * len(stocks))
+    cursor.execute(f'SELECT 证券代码, 证券简称 FROM stocks WHERE 证券代码 IN ({placeholders})', list(stocks))
+    names = dict(cursor.fetchall())
+    bars = load_sector_bars(cursor, stocks, start_date, placeholder=placeholder)
+    return sector_stocks_payload(SectorPanel.from_frame(bars), names)
+
+def check_same_stocks(legacy, engine):
+    """逐日比较每只股票的涨跌幅、成交额和当天的排列顺序"""
+    mismatches = 0
+    for date, day in legacy.items():
+        formatted = f'{date[:4]}-{date[4:6]}-{date[6:8]}' if '-' not in date else date
+        engine_stocks = engine['daily_changes'].get(formatted, {}).get('stocks', [])
+        if [s['code'] for s in engine_stocks] != [s['code'] for s in day['stocks']]:
+            mismatches += 1
+            continue
+        for stock, other in zip(day['stocks'], engine_stocks):
+            if not np.isclose(other['change'], stock['change'], atol=1e-4) or not np.isclose(other['amount'], stock['amount']):
+                mismatches += 1
+    return mismatches
+
+def build_sqlite(num_stocks, start_date, end_date):
+    """内存 SQLite，用离线数据源生成 num_stocks 只股票的日线"""
+    source = FakeDataSource(num_stocks=num_stocks)
+    cal = source.trade_cal(start_date=start_date, end_date=end_date, is_open='1')
+    codes = list(source.stock_basic()['ts_code'])
+    bars = source.daily(start_date=start_date, end_date=end_date)
+
+    conn = sqlite3.connect(':memory:')
+    cursor = conn.cursor()
+    cursor.execute('CREATE TABLE stocks (证券代码 TEXT PRIMARY KEY, 证券简称 TEXT)')
+    cursor.execute('''CREATE TABLE stock_data (ts_code TEXT, trade_date TEXT, open REAL, close REAL,
+                      amount REAL, PRIMARY KEY (ts_code, trade_date))''')
+    cursor.executemany('INSERT INTO stocks VALUES (?, ?)', [(code, f'股票{code[:6]}') for code in codes])
+    cursor.executemany('INSERT INTO stock_data VALUES (?, ?, ?, ?, ?)',
+                       bars[['ts_code', 'trade_date', 'open', 'close', 'amount']].itertuples(index=False))
+    conn.commit()
+    logger.info(f"生成 {len(codes)} 只股票 × {len(cal)} 个交易日，共 {len(bars)} 行")
+    return conn, codes
+
+def check_same(legacy, engine):
+    """逐日比较每只股票的涨幅和成交额"""
+    mismatches = 0
+    for date, day in legacy.items():
+        formatted = f'{date[:4]}-{date[4:6]}-{date[6:8]}' if '-' not in date else date
+        engine_stocks = {s['code']: s for s in engine['daily_data'].get(formatted, {}).get('stocks', [])}
+        for stock in day['stocks']:
+            other = engine_stocks.get(stock['code'])
+            if other is None or not np.isclose(other['change'], stock['change'], atol=0.011) \
+                    or not np.isclose(other['amount'], stock['amount']):
+                mismatches += 1
+    return mismatches
+
+def timed(func, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def run_benchmark(args):
+    if args.mysql:
+        from utils.database import get_mysql_connection
+        from app.services.reference_data import get_reference_data
+        stocks = list(get_reference_data().sector_members(args.sector_id))
+        with get_mysql_connection() as conn:
+            cursor = conn.cursor()
+            legacy_time, legacy = timed(lambda: legacy_daily_changes(cursor, stocks, '%s'), args.repeat)
+            engine_time, engine = timed(lambda: engine_daily_changes(cursor, stocks, '%s'), args.repeat)
+            stocks_legacy_time, stocks_legacy = timed(
+                lambda: legacy_sector_stocks(cursor, stocks, '%s', args.start_date), args.repeat)
+            stocks_engine_time, stocks_engine = timed(
+                lambda: engine_sector_stocks(cursor, stocks, '%s', args.start_date), args.repeat)
+    else:
+        conn, codes = build_sqlite(args.stocks, args.start_date, args.end_date)
+        stocks = codes[:args.sector_size]
+        cursor = conn.cursor()
+        legacy_time, legacy = timed(lambda: legacy_daily_changes(cursor, stocks, '?'), args.repeat)
+        engine_time, engine = timed(lambda: engine_daily_changes(cursor, stocks, '?'), args.repeat)
+        stocks_legacy_time, stocks_legacy = timed(
+            lambda: legacy_sector_stocks(cursor, stocks, '?', args.start_date), args.repeat)
+        stocks_engine_time, stocks_engine = timed(
+            lambda: engine_sector_stocks(cursor, stocks, '?', args.start_date), args.repeat)
+
+    logger.info(f"板块 {len(stocks)} 只股票，{len(engine['dates'])} 个交易日")
+    logger.info(f"原 SQL: {legacy_time * 1000:.1f} ms")
+    logger.info(f"数组引擎: {engine_time * 1000:.1f} ms，加速 {legacy_time / engine_time:.1f} 倍")
+    logger.info(f"结果不一致的 (日期, 股票): {check_same(legacy, engine)}")
+    logger.info("/api/sector/<id>/stocks 明细:")
+    logger.info(f"原逐行组装: {stocks_legacy_time * 1000:.1f} ms")
+    logger.info(f"单遍组装: {stocks_engine_time * 1000:.1f} ms，加速 {stocks_legacy_time / stocks_engine_time:.1f} 倍")
+    logger.info(f"结果不一致的 (日期, 股票): {check_same_stocks(stocks_legacy, stocks_engine)}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='板块涨幅计算: 原 SQL 与数组引擎对比')
+    parser.add_argument('--stocks', type=int, default=1000, help='生成的股票数量（SQLite 模式）')
+    parser.add_argument('--sector-size', type=int, default=300, help='板块成分股数量（SQLite 模式）')
+    # 默认: 最近一年
+    parser.add_argument('--start-date', default=(datetime.now() - timedelta(days=365)).strftime('%Y%m%d'))
+    parser.add_argument('--end-date', default=time.strftime('%Y%m%d'))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--mysql', action='store_true', help='在配置的 MySQL 上对比')
+    parser.add_argument('--sector-id', type=int, help='MySQL 模式下的板块ID')
+    run_benchmark(parser.parse_args())
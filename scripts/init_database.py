@@ -41,21 +41,21 @@ CREATE TABLE IF NOT EXISTS stocks (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 );
 
--- 创建股票日线数据表
+-- 创建股票日线数据表（(ts_code, trade_date) 聚簇主键，按股票区间扫描；(trade_date, ts_code) 用于截面查询）
 CREATE TABLE IF NOT EXISTS stock_data (
-    id BIGINT AUTO_INCREMENT PRIMARY KEY,
-    ts_code VARCHAR(20),
-    trade_date VARCHAR(8),
+    ts_code VARCHAR(20) NOT NULL,
+    trade_date DATE NOT NULL,
     open DECIMAL(10,2),
     high DECIMAL(10,2),
     low DECIMAL(10,2),
     close DECIMAL(10,2),
+    pre_close DECIMAL(10,2),
+    `change` DECIMAL(10,2),
+    pct_chg DECIMAL(10,4),
     vol DECIMAL(20,2),
-    amount DECIMAL(20,2),
-    change_pct DECIMAL(10,2),
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-    INDEX idx_ts_code_date (ts_code, trade_date)
+    amount DECIMAL(20,3),
+    PRIMARY KEY (ts_code, trade_date),
+    KEY idx_trade_date_code (trade_date, ts_code)
 );
 
 -- 创建指数日线数据表
@@ -76,6 +76,31 @@ CREATE TABLE IF NOT EXISTS stock_index_daily (
     INDEX idx_ts_code_date (ts_code, trade_date)
 );
 
+-- 创建每日指标表
+CREATE TABLE IF NOT EXISTS daily_basic (
+    ts_code VARCHAR(20) NOT NULL,
+    trade_date DATE NOT NULL,
+    close DECIMAL(20,4),
+    turnover_rate DECIMAL(20,4),
+    turnover_rate_f DECIMAL(20,4),
+    volume_ratio DECIMAL(20,4),
+    pe DECIMAL(20,4),
+    pe_ttm DECIMAL(20,4),
+    pb DECIMAL(20,4),
+    ps DECIMAL(20,4),
+    ps_ttm DECIMAL(20,4),
+    dv_ratio DECIMAL(20,4),
+    dv_ttm DECIMAL(20,4),
+    total_share DECIMAL(20,4),
+    float_share DECIMAL(20,4),
+    free_share DECIMAL(20,4),
+    total_mv DECIMAL(20,4),
+    circ_mv DECIMAL(20,4),
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (ts_code, trade_date),
+    KEY idx_trade_date_code (trade_date, ts_code)
+);
+
 -- 创建板块表
 CREATE TABLE IF NOT EXISTS sectors (
     sector_id INT AUTO_INCREMENT PRIMARY KEY,
@@ -97,6 +122,103 @@ CREATE TABLE IF NOT EXISTS sector_stocks (
     FOREIGN KEY (sector_id) REFERENCES sectors(sector_id),
     FOREIGN KEY (stock_code) REFERENCES stocks(证券代码)
 );
+
+-- 创建板块日汇总表（由 app/services/sector_daily.py 在每次数据更新后增量刷新）
+CREATE TABLE IF NOT EXISTS sector_daily (
+    sector_id INT NOT NULL,
+    trade_date DATE NOT NULL,
+    equal_return DECIMAL(12,4),
+    amount_return DECIMAL(12,4),
+    total_amount DECIMAL(24,3),
+    advancers INT,
+    decliners INT,
+    member_count INT,
+    PRIMARY KEY (sector_id, trade_date)
+);
+
+-- 板块日汇总对应的成分股哈希，成分股变化时整板块重算
+CREATE TABLE IF NOT EXISTS sector_daily_state (
+    sector_id INT PRIMARY KEY,
+    member_hash CHAR(32) NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+-- 创建技术指标表（由 app/services/indicators.py 在每次数据更新后按交易日推进）
+CREATE TABLE IF NOT EXISTS stock_indicators (
+    ts_code VARCHAR(20) NOT NULL,
+    trade_date DATE NOT NULL,
+    ma5 DECIMAL(16,4),
+    ma10 DECIMAL(16,4),
+    ma20 DECIMAL(16,4),
+    ma60 DECIMAL(16,4),
+    ema12 DECIMAL(16,4),
+    ema26 DECIMAL(16,4),
+    macd_dif DECIMAL(16,4),
+    macd_dea DECIMAL(16,4),
+    macd_hist DECIMAL(16,4),
+    rsi6 DECIMAL(16,4),
+    rsi12 DECIMAL(16,4),
+    rsi24 DECIMAL(16,4),
+    kdj_k DECIMAL(16,4),
+    kdj_d DECIMAL(16,4),
+    kdj_j DECIMAL(16,4),
+    boll_upper DECIMAL(16,4),
+    boll_mid DECIMAL(16,4),
+    boll_lower DECIMAL(16,4),
+    PRIMARY KEY (ts_code, trade_date)
+);
+
+-- 创建个股资金流向表（Tushare moneyflow，成交量单位手，金额单位万元）
+CREATE TABLE IF NOT EXISTS moneyflow (
+    ts_code VARCHAR(20) NOT NULL,
+    trade_date DATE NOT NULL,
+    buy_sm_vol DECIMAL(20,2),
+    buy_sm_amount DECIMAL(20,2),
+    sell_sm_vol DECIMAL(20,2),
+    sell_sm_amount DECIMAL(20,2),
+    buy_md_vol DECIMAL(20,2),
+    buy_md_amount DECIMAL(20,2),
+    sell_md_vol DECIMAL(20,2),
+    sell_md_amount DECIMAL(20,2),
+    buy_lg_vol DECIMAL(20,2),
+    buy_lg_amount DECIMAL(20,2),
+    sell_lg_vol DECIMAL(20,2),
+    sell_lg_amount DECIMAL(20,2),
+    buy_elg_vol DECIMAL(20,2),
+    buy_elg_amount DECIMAL(20,2),
+    sell_elg_vol DECIMAL(20,2),
+    sell_elg_amount DECIMAL(20,2),
+    net_mf_vol DECIMAL(20,2),
+    net_mf_amount DECIMAL(20,2),
+    PRIMARY KEY (ts_code, trade_date),
+    INDEX idx_trade_date (trade_date)
+);
+
+-- 板块资金流向汇总（资金流向入库、成分股变更后由 app/services/money_flow.py 重算）
+CREATE TABLE IF NOT EXISTS sector_moneyflow (
+    sector_id INT NOT NULL,
+    trade_date DATE NOT NULL,
+    buy_sm_vol DECIMAL(24,2),
+    buy_sm_amount DECIMAL(24,2),
+    sell_sm_vol DECIMAL(24,2),
+    sell_sm_amount DECIMAL(24,2),
+    buy_md_vol DECIMAL(24,2),
+    buy_md_amount DECIMAL(24,2),
+    sell_md_vol DECIMAL(24,2),
+    sell_md_amount DECIMAL(24,2),
+    buy_lg_vol DECIMAL(24,2),
+    buy_lg_amount DECIMAL(24,2),
+    sell_lg_vol DECIMAL(24,2),
+    sell_lg_amount DECIMAL(24,2),
+    buy_elg_vol DECIMAL(24,2),
+    buy_elg_amount DECIMAL(24,2),
+    sell_elg_vol DECIMAL(24,2),
+    sell_elg_amount DECIMAL(24,2),
+    net_mf_vol DECIMAL(24,2),
+    net_mf_amount DECIMAL(24,2),
+    member_count INT,
+    PRIMARY KEY (sector_id, trade_date)
+);
 """
 
 def init_database():
@@ -0,0 +1,415 @@
+import sys
+import time
+import logging
+import argparse
+from pathlib import Path
+
+# 添加项目根目录到系统路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from utils.database import get_mysql_connection
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# stock_data 表结构迁移
+#
+# 旧表: 自增 id 主键，trade_date VARCHAR(8)，只有 (ts_code, trade_date) 二级索引
+# 新表: (ts_code, trade_date) 聚簇主键，trade_date DATE，(trade_date, ts_code) 二级索引，可选按年分区
+#
+# 步骤（每一步都可重复执行，中断后重新运行会从上次的位置继续）:
+#   prepare  创建 stock_data_new、进度表，并在旧表上建触发器同步迁移期间的写入
+#   copy     按 ts_code 分批复制历史数据，每批提交并记录进度
+#   verify   比较新旧表行数
+#   swap     原子重命名: stock_data -> stock_data_old, stock_data_new -> stock_data
+#   cleanup  删除 stock_data_old
+#   bench    对主要查询做基准测试（迁移前后各跑一次对比）
+#   run      依次执行 prepare、copy、verify、swap
+#
+# 其他表:
+#   sectors  合并同名同类型的重复板块，并补建 (sector_name, sector_type) 唯一键；
+#            保存板块接口的 INSERT ... ON DUPLICATE KEY UPDATE 依赖这个唯一键
+#   daily_basic  与 stock_data 相同改为 (ts_code, trade_date) 聚簇主键、DATE 类型；
+#                表较小，一次复制到新表后原子重命名，旧表保留为 daily_basic_old（cleanup 删除），
+#                复制期间不要运行每日指标更新
+
+NEW_TABLE = 'stock_data_new'
+OLD_TABLE = 'stock_data_old'
+MIGRATION_NAME = 'stock_data_clustered_pk'
+
+# 新表的数据列（不含 trade_date）
+VALUE_COLUMNS = ['open', 'high', 'low', 'close', 'pre_close', 'change', 'pct_chg', 'vol', 'amount']
+
+CREATE_NEW_TABLE_SQL = f"""
+CREATE TABLE IF NOT EXISTS {NEW_TABLE} (
+    ts_code VARCHAR(20) NOT NULL,
+    trade_date DATE NOT NULL,
+    open DECIMAL(10,2),
+    high DECIMAL(10,2),
+    low DECIMAL(10,2),
+    close DECIMAL(10,2),
+    pre_close DECIMAL(10,2),
+    `change` DECIMAL(10,2),
+    pct_chg DECIMAL(10,4),
+    vol DECIMAL(20,2),
+    amount DECIMAL(20,3),
+    PRIMARY KEY (ts_code, trade_date),
+    KEY idx_trade_date_code (trade_date, ts_code)
+)
+"""
+
+DAILY_BASIC_NEW_TABLE = 'daily_basic_new'
+DAILY_BASIC_OLD_TABLE = 'daily_basic_old'
+
+DAILY_BASIC_COLUMNS = ['close', 'turnover_rate', 'turnover_rate_f', 'volume_ratio', 'pe', 'pe_ttm',
+                       'pb', 'ps', 'ps_ttm', 'dv_ratio', 'dv_ttm', 'total_share', 'float_share',
+                       'free_share', 'total_mv', 'circ_mv']
+
+CREATE_DAILY_BASIC_TABLE_SQL = f"""
+CREATE TABLE {DAILY_BASIC_NEW_TABLE} (
+    ts_code VARCHAR(20) NOT NULL,
+    trade_date DATE NOT NULL,
+    {', '.join(f'{c} DECIMAL(20,4)' for c in DAILY_BASIC_COLUMNS)},
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (ts_code, trade_date),
+    KEY idx_trade_date_code (trade_date, ts_code)
+)
+"""
+
+CREATE_PROGRESS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS schema_migration_progress (
+    name VARCHAR(64) PRIMARY KEY,
+    last_key VARCHAR(64),
+    copied_rows BIGINT DEFAULT 0,
+    status VARCHAR(20),
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+)
+"""
+
+def _partition_sql(start_year, end_year):
+    """按年分区，每年一个分区，最后一个分区兜底"""
+    parts = [f"PARTITION p{year} VALUES LESS THAN ('{year + 1}-01-01')"
+             for year in range(start_year, end_year + 1)]
+    parts.append("PARTITION pmax VALUES LESS THAN (MAXVALUE)")
+    return f"ALTER TABLE {NEW_TABLE} PARTITION BY RANGE COLUMNS(trade_date) ({', '.join(parts)})"
+
+def _column_types(cursor, table):
+    """{列名: 数据类型}"""
+    cursor.execute('''
+        SELECT COLUMN_NAME, DATA_TYPE
+        FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    ''', (table,))
+    return {row[0]: row[1] for row in cursor.fetchall()}
+
+def _source_columns(cursor):
+    """旧表中存在的数据列（旧库可能缺少 pre_close 等列）"""
+    existing = _column_types(cursor, 'stock_data')
+    return [c for c in VALUE_COLUMNS if c in existing]
+
+def _table_exists(cursor, table):
+    cursor.execute('''
+        SELECT COUNT(*)
+        FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    ''', (table,))
+    return cursor.fetchone()[0] > 0
+
+def _index_exists(cursor, table, index):
+    cursor.execute('''
+        SELECT COUNT(*)
+        FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+    ''', (table, index))
+    return cursor.fetchone()[0] > 0
+
+def _is_partitioned(cursor, table):
+    cursor.execute('''
+        SELECT COUNT(*)
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+    ''', (table,))
+    return cursor.fetchone()[0] > 0
+
+def _trade_date_expr(prefix, escape=False):
+    # 旧表 trade_date 为 YYYYMMDD 字符串；带参数执行的语句中 % 需要转义
+    fmt = '%%Y%%m%%d' if escape else '%Y%m%d'
+    return f"STR_TO_DATE({prefix}trade_date, '{fmt}')"
+
+def prepare(conn, partition=False):
+    """创建新表、进度表和同步触发器"""
+    cursor = conn.cursor()
+    if not _table_exists(cursor, 'stock_data'):
+        raise RuntimeError("stock_data 表不存在")
+        
+    cursor.execute(CREATE_NEW_TABLE_SQL)
+    cursor.execute(CREATE_PROGRESS_TABLE_SQL)
+    cursor.execute('''
+        INSERT IGNORE INTO schema_migration_progress (name, last_key, copied_rows, status)
+        VALUES (%s, '', 0, 'copying')
+    ''', (MIGRATION_NAME,))
+    
+    if partition and not _is_partitioned(cursor, NEW_TABLE):
+        cursor.execute('SELECT MIN(trade_date), MAX(trade_date) FROM stock_data')
+        min_date, max_date = cursor.fetchone()
+        start_year = int(str(min_date)[:4]) if min_date else int(time.strftime('%Y'))
+        end_year = max(int(str(max_date)[:4]) if max_date else start_year, int(time.strftime('%Y'))) + 1
+        cursor.execute(_partition_sql(start_year, end_year))
+        logger.info(f"新表按年分区: {start_year} - {end_year}")
+        
+    # 迁移期间旧表的写入通过触发器同步到新表，复制完成后新表即为最新
+    columns = _source_columns(cursor)
+    column_sql = ', '.join(f'`{c}`' for c in columns)
+    new_values = ', '.join(f'NEW.`{c}`' for c in columns)
+    update_sql = ', '.join(f'`{c}` = NEW.`{c}`' for c in columns)
+    upsert = (f"INSERT INTO {NEW_TABLE} (ts_code, trade_date, {column_sql}) "
+              f"VALUES (NEW.ts_code, {_trade_date_expr('NEW.')}, {new_values}) "
+              f"ON DUPLICATE KEY UPDATE {update_sql}")
+    
+    cursor.execute('DROP TRIGGER IF EXISTS stock_data_migrate_ins')
+    cursor.execute(f'CREATE TRIGGER stock_data_migrate_ins AFTER INSERT ON stock_data '
+                   f'FOR EACH ROW {upsert}')
+    cursor.execute('DROP TRIGGER IF EXISTS stock_data_migrate_upd')
+    cursor.execute(f'CREATE TRIGGER stock_data_migrate_upd AFTER UPDATE ON stock_data '
+                   f'FOR EACH ROW {upsert}')
+    cursor.execute('DROP TRIGGER IF EXISTS stock_data_migrate_del')
+    cursor.execute(f"CREATE TRIGGER stock_data_migrate_del AFTER DELETE ON stock_data "
+                   f"FOR EACH ROW DELETE FROM {NEW_TABLE} "
+                   f"WHERE ts_code = OLD.ts_code AND trade_date = {_trade_date_expr('OLD.')}")
+    conn.commit()
+    logger.info(f"已创建 {NEW_TABLE} 和同步触发器")
+
+def copy(conn, chunk_size=200, sleep=0.0):
+    """按 ts_code 分批复制，进度记录在 schema_migration_progress 中"""
+    cursor = conn.cursor()
+    cursor.execute('SELECT last_key, copied_rows FROM schema_migration_progress WHERE name = %s',
+                   (MIGRATION_NAME,))
+    row = cursor.fetchone()
+    if row is None:
+        raise RuntimeError("请先执行 prepare")
+    last_key, copied_rows = row[0] or '', row[1] or 0
+    if last_key:
+        logger.info(f"从 {last_key} 之后继续复制，已复制 {copied_rows} 行")
+        
+    columns = _source_columns(cursor)
+    column_sql = ', '.join(f'`{c}`' for c in columns)
+    update_sql = ', '.join(f'`{c}` = VALUES(`{c}`)' for c in columns)
+    
+    start_time = time.time()
+    while True:
+        cursor.execute('''
+            SELECT DISTINCT ts_code
+            FROM stock_data
+            WHERE ts_code > %s
+            ORDER BY ts_code
+            LIMIT %s
+        ''', (last_key, chunk_size))
+        codes = [r[0] for r in cursor.fetchall()]
+        if not codes:
+            break
+            
+        cursor.execute(f'''
+            INSERT INTO {NEW_TABLE} (ts_code, trade_date, {column_sql})
+            SELECT ts_code, {_trade_date_expr('', escape=True)}, {column_sql}
+            FROM stock_data
+            WHERE ts_code >= %s AND ts_code <= %s
+            ON DUPLICATE KEY UPDATE {update_sql}
+        ''', (codes[0], codes[-1]))
+        copied_rows += cursor.rowcount
+        last_key = codes[-1]
+        cursor.execute('''
+            UPDATE schema_migration_progress
+            SET last_key = %s, copied_rows = %s
+            WHERE name = %s
+        ''', (last_key, copied_rows, MIGRATION_NAME))
+        conn.commit()
+        
+        elapsed = time.time() - start_time
+        logger.info(f"已复制至 {last_key}，累计 {copied_rows} 行，耗时 {elapsed:.1f} 秒")
+        if sleep:
+            time.sleep(sleep)  # 给线上负载让出资源
+    
+    cursor.execute("UPDATE schema_migration_progress SET status = 'copied' WHERE name = %s",
+                   (MIGRATION_NAME,))
+    conn.commit()
+    logger.info("复制完成")
+
+def verify(conn):
+    """比较新旧表行数（旧表没有唯一约束，按 (ts_code, trade_date) 去重计数）"""
+    cursor = conn.cursor()
+    cursor.execute('SELECT COUNT(*) FROM (SELECT DISTINCT ts_code, trade_date FROM stock_data) t')
+    old_count = cursor.fetchone()[0]
+    cursor.execute(f'SELECT COUNT(*) FROM {NEW_TABLE}')
+    new_count = cursor.fetchone()[0]
+    logger.info(f"stock_data: {old_count} 行，{NEW_TABLE}: {new_count} 行")
+    if old_count != new_count:
+        raise RuntimeError(f"行数不一致: {old_count} != {new_count}，请重新执行 copy")
+    return True
+
+def swap(conn):
+    """原子替换表并删除触发器"""
+    cursor = conn.cursor()
+    cursor.execute(f'RENAME TABLE stock_data TO {OLD_TABLE}, {NEW_TABLE} TO stock_data')
+    # 触发器随旧表一起改名，旧表不再有写入，直接删除
+    for trigger in ('stock_data_migrate_ins', 'stock_data_migrate_upd', 'stock_data_migrate_del'):
+        cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    cursor.execute("UPDATE schema_migration_progress SET status = 'swapped' WHERE name = %s",
+                   (MIGRATION_NAME,))
+    conn.commit()
+    logger.info(f"已切换到新表，旧表保留为 {OLD_TABLE}")
+
+def cleanup(conn):
+    cursor = conn.cursor()
+    for table in (OLD_TABLE, DAILY_BASIC_OLD_TABLE):
+        cursor.execute(f'DROP TABLE IF EXISTS {table}')
+        logger.info(f"已删除 {table}")
+    conn.commit()
+
+def migrate_sectors(conn):
+    """合并重复板块（保留最小的 sector_id，成分股并入）后补建唯一键，可重复执行"""
+    cursor = conn.cursor()
+    if _index_exists(cursor, 'sectors', 'uk_name_type'):
+        logger.info("sectors 已有唯一键 uk_name_type")
+        return
+        
+    cursor.execute('''
+        SELECT s.sector_id, k.keep_id
+        FROM sectors s
+        JOIN (
+            SELECT sector_name, sector_type, MIN(sector_id) AS keep_id
+            FROM sectors
+            GROUP BY sector_name, sector_type
+            HAVING COUNT(*) > 1
+        ) k ON s.sector_name = k.sector_name AND s.sector_type = k.sector_type
+        WHERE s.sector_id <> k.keep_id
+    ''')
+    duplicates = cursor.fetchall()
+    for sector_id, keep_id in duplicates:
+        cursor.execute('''
+            INSERT IGNORE INTO sector_stocks (sector_id, stock_code)
+            SELECT %s, stock_code FROM sector_stocks WHERE sector_id = %s
+        ''', (keep_id, sector_id))
+        for table in ('sector_stocks', 'sector_moneyflow', 'sector_daily', 'sector_daily_state'):
+            if _table_exists(cursor, table):
+                cursor.execute(f'DELETE FROM {table} WHERE sector_id = %s', (sector_id,))
+        cursor.execute('DELETE FROM sectors WHERE sector_id = %s', (sector_id,))
+    cursor.execute('ALTER TABLE sectors ADD UNIQUE KEY uk_name_type (sector_name, sector_type)')
+    conn.commit()
+    logger.info(f"已合并 {len(duplicates)} 个重复板块并建立唯一键 uk_name_type")
+
+def migrate_daily_basic(conn):
+    """daily_basic 改为 (ts_code, trade_date) 主键、DATE 类型，已迁移时直接返回，可重复执行"""
+    cursor = conn.cursor()
+    types = _column_types(cursor, 'daily_basic')
+    if not types:
+        raise RuntimeError("daily_basic 表不存在")
+    if types.get('trade_date') == 'date' and 'id' not in types:
+        logger.info("daily_basic 已是新表结构")
+        return
+        
+    columns = [c for c in DAILY_BASIC_COLUMNS if c in types]
+    column_sql = ', '.join(f'`{c}`' for c in columns)
+    start_time = time.time()
+    # 上次中断留下的新表直接丢弃重建
+    cursor.execute(f'DROP TABLE IF EXISTS {DAILY_BASIC_NEW_TABLE}')
+    cursor.execute(CREATE_DAILY_BASIC_TABLE_SQL)
+    cursor.execute(f'''
+        INSERT IGNORE INTO {DAILY_BASIC_NEW_TABLE} (ts_code, trade_date, {column_sql})
+        SELECT ts_code, {_trade_date_expr('')}, {column_sql}
+        FROM daily_basic
+    ''')
+    copied_rows = cursor.rowcount
+    conn.commit()
+    cursor.execute(f'DROP TABLE IF EXISTS {DAILY_BASIC_OLD_TABLE}')
+    cursor.execute(f'RENAME TABLE daily_basic TO {DAILY_BASIC_OLD_TABLE}, {DAILY_BASIC_NEW_TABLE} TO daily_basic')
+    conn.commit()
+    logger.info(f"daily_basic 已迁移 {copied_rows} 行，耗时 {time.time() - start_time:.1f} 秒，"
+                f"旧表保留为 {DAILY_BASIC_OLD_TABLE}")
+
+def bench(conn, table='stock_data', repeat=5):
+    """主要查询的基准测试，返回 {查询名: 平均毫秒}"""
+    cursor = conn.cursor()
+    cursor.execute(f'SELECT ts_code FROM {table} GROUP BY ts_code ORDER BY ts_code LIMIT 300')
+    codes = [r[0] for r in cursor.fetchall()]
+    if not codes:
+        logger.warning(f"{table} 没有数据")
+        return {}
+    cursor.execute(f'SELECT MAX(trade_date) FROM {table}')
+    latest = cursor.fetchone()[0]
+    placeholders = ','.join(['%s'] * len(codes))
+    
+    queries = {
+        '单只股票区间': (f"SELECT trade_date, open, high, low, close, amount FROM {table} "
+                   f"WHERE ts_code = %s AND trade_date >= '20240920' ORDER BY trade_date", [codes[0]]),
+        '板块300只区间': (f"SELECT ts_code, trade_date, open, close, amount FROM {table} "
+                     f"WHERE ts_code IN ({placeholders}) AND trade_date >= '20240920'", codes),
+        '全市场单日截面': (f"SELECT ts_code, close, amount FROM {table} WHERE trade_date = %s", [latest]),
+        '全市场最新日期': (f"SELECT MAX(trade_date) FROM {table}", []),
+        '每只股票水位': (f"SELECT ts_code, MAX(trade_date) FROM {table} GROUP BY ts_code", [])
+    }
+    
+    results = {}
+    for name, (sql, params) in queries.items():
+        start_time = time.time()
+        for _ in range(repeat):
+            cursor.execute(sql, params)
+            cursor.fetchall()
+        results[name] = (time.time() - start_time) / repeat * 1000
+        logger.info(f"[{table}] {name}: {results[name]:.1f} ms")
+    return results
+
+def _print_comparison(before, after):
+    logger.info("查询对比（旧表 -> 新表）:")
+    for name, before_ms in before.items():
+        after_ms = after.get(name)
+        if after_ms:
+            logger.info(f"  {name}: {before_ms:.1f} ms -> {after_ms:.1f} ms ({before_ms / after_ms:.1f}x)")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='stock_data、daily_basic 表迁移到聚簇主键 + DATE 类型')
+    parser.add_argument('step', choices=['prepare', 'copy', 'verify', 'swap', 'cleanup', 'bench', 'run',
+                                         'sectors', 'daily_basic'])
+    parser.add_argument('--partition', action='store_true', help='新表按年分区')
+    parser.add_argument('--chunk-size', type=int, default=200, help='每批复制的股票数')
+    parser.add_argument('--sleep', type=float, default=0.0, help='每批之间暂停的秒数')
+    args = parser.parse_args()
+    
+    try:
+        with get_mysql_connection() as conn:
+            if args.step == 'prepare':
+                prepare(conn, args.partition)
+            elif args.step == 'copy':
+                copy(conn, args.chunk_size, args.sleep)
+            elif args.step == 'verify':
+                verify(conn)
+            elif args.step == 'swap':
+                swap(conn)
+            elif args.step == 'cleanup':
+                cleanup(conn)
+            elif args.step == 'sectors':
+                migrate_sectors(conn)
+            elif args.step == 'daily_basic':
+                migrate_daily_basic(conn)
+            elif args.step == 'bench':
+                cursor = conn.cursor()
+                if _table_exists(cursor, NEW_TABLE):
+                    _print_comparison(bench(conn, 'stock_data'), bench(conn, NEW_TABLE))
+                elif _table_exists(cursor, OLD_TABLE):
+                    _print_comparison(bench(conn, OLD_TABLE), bench(conn, 'stock_data'))
+                else:
+                    bench(conn, 'stock_data')
+            elif args.step == 'run':
+                before = bench(conn, 'stock_data')
+                prepare(conn, args.partition)
+                copy(conn, args.chunk_size, args.sleep)
+                verify(conn)
+                swap(conn)
+                _print_comparison(before, bench(conn, 'stock_data'))
+    except Exception as e:
+        logger.error(f'迁移失败: {str(e)}')
+        raise
\ No newline at end of file
@@ -0,0 +1,134 @@
+from app import create_app
+from app.services.preload import preload_caches
+from app.services.job_manager import active_jobs
+from config.config import APP_CONFIG
+from utils.data_version import DATA_VERSION, get_version
+from utils.logger import setup_logger
+import gc
+import os
+import signal
+import threading
+import time
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:  # Windows 或未安装 gunicorn 时退回单进程多线程服务器
+    BaseApplication = None
+
+logger = setup_logger('server')
+
+# 生产环境入口: python server.py
+#
+# gunicorn 主进程先创建应用并预加载共享数据，再 fork 出 WORKERS 个 worker，
+# 每个 worker 用 THREADS 个线程处理请求。主进程中的 DataVersionWatcher 发现数据更新后给自己发 SIGHUP，
+# gunicorn 重载时（on_reload）主进程重新加载共享数据，再 fork 新 worker、等旧 worker 处理完请求后退出；
+# 也可以手动执行 kill -HUP <主进程号>。负载均衡、监控使用 /healthz 和 /readyz
+
+# 主进程中已加载的共享数据对应的全局数据版本
+_loaded_version = None
+
+def load_shared_data():
+    """在主进程中（重新）加载共享数据
+
+    加载后的对象移出垃圾回收的跟踪范围，worker 中回收时不会写这些页面，保持写时复制共享
+    """
+    global _loaded_version
+    gc.unfreeze()
+    _loaded_version = preload_caches()['data_version']
+    gc.freeze()
+
+class DataVersionWatcher(threading.Thread):
+    """主进程中定期检查全局数据版本
+
+    版本变化后等待 settle 秒内不再变化（一次更新会多次递增版本）、且所有进程都没有运行中的任务时，
+    给主进程发送 SIGHUP 平滑重载
+    """
+
+    def __init__(self, interval, settle):
+        super().__init__(name='data-version-watcher', daemon=True)
+        self.interval = interval
+        self.settle = settle
+
+    def run(self):
+        seen_version = None
+        changed_at = None
+        while True:
+            time.sleep(self.interval)
+            try:
+                version = get_version(DATA_VERSION)
+                if version == _loaded_version:
+                    seen_version = changed_at = None
+                    continue
+                if version != seen_version:
+                    seen_version, changed_at = version, time.time()
+                    continue
+                if time.time() - changed_at < self.settle:
+                    continue
+                jobs = active_jobs()
+                if jobs:
+                    logger.info(f"数据版本 {version}，等待运行中的任务结束后重载: {jobs}")
+                    continue
+                logger.info(f"数据版本 {_loaded_version} -> {version}，重载 worker")
+                seen_version = changed_at = None
+                os.kill(os.getpid(), signal.SIGHUP)
+            except Exception as e:
+                logger.error(f"检查数据版本失败: {str(e)}")
+
+if BaseApplication is not None:
+    class ProductionServer(BaseApplication):
+        """在代码中配置的 gunicorn 应用，不需要单独的配置文件"""
+
+        def __init__(self, application, options):
+            self.application = application
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+def when_ready(server):
+    """gunicorn 主进程就绪后启动数据版本检查"""
+    if APP_CONFIG['RELOAD_CHECK_INTERVAL'] > 0:
+        DataVersionWatcher(APP_CONFIG['RELOAD_CHECK_INTERVAL'], APP_CONFIG['RELOAD_SETTLE']).start()
+
+def on_reload(server):
+    """SIGHUP 时在 fork 新 worker 之前重新加载共享数据，旧 worker 处理完进行中的请求后退出"""
+    load_shared_data()
+
+def server_options():
+    return {
+        'bind': f"{APP_CONFIG['HOST']}:{APP_CONFIG['PORT']}",
+        'workers': APP_CONFIG['WORKERS'],
+        'threads': APP_CONFIG['THREADS'],
+        'worker_class': 'gthread',
+        'timeout': APP_CONFIG['TIMEOUT'],
+        'graceful_timeout': APP_CONFIG['GRACEFUL_TIMEOUT'],
+        'preload_app': True,
+        'when_ready': when_ready,
+        'on_reload': on_reload
+    }
+
+def main():
+    app = create_app()
+
+    if BaseApplication is None:
+        logger.warning("未安装 gunicorn，使用单进程多线程服务器")
+        preload_caches()
+        app.run(host=APP_CONFIG['HOST'], port=APP_CONFIG['PORT'], threaded=True, use_reloader=False)
+        return
+
+    load_shared_data()
+    logger.info(f"启动生产服务器: {APP_CONFIG['HOST']}:{APP_CONFIG['PORT']}，"
+                f"{APP_CONFIG['WORKERS']} 个 worker × {APP_CONFIG['THREADS']} 个线程")
+    ProductionServer(app, server_options()).run()
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        logger.error(f"应用启动失败: {str(e)}")
+        raise
@@ -88,6 +88,83 @@ function formatAmount(value) {
     return (value / 10000).toFixed(2) + '万';
 }
 
+// 紧凑格式（format=compact&binary=1）的类型化数组
+const COMPACT_ARRAY_TYPES = {
+    float32: Float32Array,
+    float64: Float64Array,
+    int32: Int32Array
+};
+
+// 解码紧凑格式的数组：base64 类型化数组或普通 JSON 列表，二维数组按行展开
+function decodeCompactArray(value) {
+    if (!value) return [];
+    if (Array.isArray(value)) return value.flat();
+    const binary = atob(value.data);
+    const bytes = new Uint8Array(binary.length);
+    for (let i = 0; i < binary.length; i++) {
+        bytes[i] = binary.charCodeAt(i);
+    }
+    return new COMPACT_ARRAY_TYPES[value.dtype](bytes.buffer);
+}
+
+// 缺失值（null / NaN）记为 0
+function compactValue(value) {
+    return value === null || Number.isNaN(value) ? 0 : value;
+}
+
+// 把 /api/sector/<id>/stocks 的紧凑格式还原成按日期组织的 daily_changes
+function expandSectorStocks(data) {
+    if (!data || data.format !== 'compact') return data;
+
+    const width = data.codes.length;
+    const open = decodeCompactArray(data.open);
+    const close = decodeCompactArray(data.close);
+    const amount = decodeCompactArray(data.amount);
+    const change = decodeCompactArray(data.change);
+    const order = decodeCompactArray(data.order);
+
+    const dailyChanges = {};
+    let offset = 0;
+    data.dates.forEach((date, i) => {
+        const stocks = [];
+        for (let k = 0; k < data.order_counts[i]; k++) {
+            const j = order[offset + k];
+            const index = i * width + j;
+            const stockAmount = compactValue(amount[index]);
+            stocks.push({
+                code: data.codes[j],
+                name: data.names[j],
+                open: compactValue(open[index]),
+                close: compactValue(close[index]),
+                amount: stockAmount,
+                amount_str: formatAmount(stockAmount),
+                change: compactValue(change[index])
+            });
+        }
+        offset += data.order_counts[i];
+        dailyChanges[date] = {
+            stocks: stocks,
+            total_amount: data.total_amount[i],
+            total_amount_str: formatAmount(data.total_amount[i])
+        };
+    });
+
+    return { ...data, daily_changes: dailyChanges };
+}
+
+// 把个股详情的紧凑格式还原成普通数组，缺失为 null
+function expandStockData(stockData) {
+    if (!stockData || stockData.format !== 'compact') return stockData;
+
+    const result = { ...stockData };
+    Object.keys(stockData).forEach(key => {
+        if (['name', 'code', 'dates', 'format', 'indicators'].includes(key)) return;
+        result[key] = Array.from(decodeCompactArray(stockData[key]),
+            value => (value === null || Number.isNaN(value)) ? null : value);
+    });
+    return result;
+}
+
 // 格式化日期
 function formatDate(date) {
     if (!date) return '';
@@ -23,10 +23,11 @@ function loadSectorList() {
 // 加载板块股票
 function loadSectorStocks(sectorId, sectorName) {
     currentSectorId = sectorId;
-    fetch(`/api/sector/${sectorId}/stocks`)
+    fetch(`/api/sector/${sectorId}/stocks?format=compact&binary=1`)
         .then(response => response.json())
         .then(data => {
             if (data.success) {
+                data = expandSectorStocks(data);
                 console.log('获取到板块数据:', data);  // 添加日志
                 updateStockList(data);
                 updateCharts(data, sectorName);
@@ -57,10 +58,11 @@ function loadStockDetail(stockCode) {
     currentStockCode = stockCode;
     
     console.log('加载个股详情:', stockCode);
-    fetch(`/api/stock/${stockCode}/detail`)
+    fetch(`/api/stock/${stockCode}/detail?format=compact&binary=1`)
         .then(response => response.json())
         .then(data => {
             if (data.success) {
+                data.stock_data = expandStockData(data.stock_data);
                 // 更新K线图
                 updateStockDailyChart(data.stock_data);
                 
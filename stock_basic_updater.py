@@ -1,9 +1,11 @@
-import tushare as ts
 import sqlite3
 import logging
 import time
 import os
 from dotenv import load_dotenv
+from utils.rate_limiter import get_rate_limiter
+from app.services.data_source import TushareDataSource
+from app.services.trade_calendar import TradeCalendar
 
 # 加载环境变量
 load_dotenv('config.env')
@@ -13,34 +15,23 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class StockBasicUpdater:
-    def __init__(self):
-        # 从环境变量获取token
-        token = os.getenv('TUSHARE_TOKEN')
-        if not token:
-            raise ValueError("未找到 TUSHARE_TOKEN 环境变量")
-            
-        self.pro = ts.pro_api(token)
-        # Tushare API 访问限制：每分钟200次
-        self.rate_limit = 200
-        self.request_count = 0
-        self.last_reset_time = time.time()
+    def __init__(self, data_source=None):
+        if data_source is not None:
+            self.pro = data_source
+        else:
+            # 从环境变量获取token
+            token = os.getenv('TUSHARE_TOKEN')
+            if not token:
+                raise ValueError("未找到 TUSHARE_TOKEN 环境变量")
+            self.pro = TushareDataSource(token)
+        # Tushare API 访问限制：每分钟200次（daily_basic 接口单独计数）
+        self.rate_limiter = get_rate_limiter('tushare_daily_basic', 200)
+        # 注入的数据源（如离线模拟）不写本地日历缓存
+        self.calendar = TradeCalendar(self.pro, cache_file='' if data_source is not None else None)
         
     def check_rate_limit(self):
         """检查并控制访问频率"""
-        current_time = time.time()
-        if current_time - self.last_reset_time >= 60:
-            self.request_count = 0
-            self.last_reset_time = current_time
-        
-        if self.request_count >= self.rate_limit:
-            wait_time = 60 - (current_time - self.last_reset_time)
-            if wait_time > 0:
-                logger.info(f"达到访问限制，等待 {wait_time:.2f} 秒")
-                time.sleep(wait_time)
-                self.request_count = 0
-                self.last_reset_time = time.time()
-        
-        self.request_count += 1
+        self.rate_limiter.acquire()
 
     def init_database(self):
         """初始化数据库表"""
@@ -93,7 +84,10 @@ class StockBasicUpdater:
         """更新每日指标数据"""
         try:
             if trade_date is None:
-                trade_date = time.strftime('%Y%m%d')
+                trade_date = self.calendar.latest_trading_day()
+            elif not self.calendar.is_trading_day(trade_date):
+                logger.warning(f"{trade_date} 不是交易日，跳过")
+                return
                 
             logger.info(f"更新 {trade_date} 的每日指标数据")
             
@@ -112,8 +106,14 @@ class StockBasicUpdater:
                 logger.warning(f"未获取到 {trade_date} 的数据")
                 return
                 
-            # 写入数据库
-            df.to_sql('daily_basic', conn, if_exists='append', index=False)
+            # 写入数据库，同一交易日重复执行时覆盖已有记录
+            columns = list(df.columns)
+            data = df.astype(object).where(df.notna(), None)
+            conn.executemany(
+                f"INSERT OR REPLACE INTO daily_basic ({', '.join(columns)}) "
+                f"VALUES ({', '.join(['?'] * len(columns))})",
+                data.itertuples(index=False, name=None)
+            )
             
             conn.commit()
             logger.info(f"更新了 {len(df)} 条记录")
@@ -1,40 +1,30 @@
 from flask import Flask, jsonify, request, render_template, send_from_directory
-import tushare as ts
 import sqlite3
 import logging
 from datetime import datetime
 import time
 import os
+from utils.rate_limiter import get_rate_limiter
+from app.services.data_source import TushareDataSource
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class StockDataUpdater:
-    def __init__(self):
+    def __init__(self, data_source=None):
         self.is_running = False
         self.progress = 0
         self.error_logs = []
         self.db_path = 'example.db'
         # 初始化tushare
-        self.ts_api = ts.pro_api('f27227e18d0ee9d6e0e2430dc1eca3e56e9ea70d0b3e24d72f72a174')
-        self.call_count = 0
-        self.last_call_time = time.time()
+        self.ts_api = data_source or TushareDataSource('f27227e18d0ee9d6e0e2430dc1eca3e56e9ea70d0b3e24d72f72a174')
+        self.rate_limiter = get_rate_limiter('tushare', 500)
         self._init_db()
 
     def _check_rate_limit(self):
         """检查并控制调用频率"""
-        current_time = time.time()
-        if current_time - self.last_call_time < 60 and self.call_count >= 500:
-            sleep_time = 60 - (current_time - self.last_call_time)
-            logger.info(f"达到调用限制，等待 {sleep_time:.2f} 秒")
-            time.sleep(sleep_time)
-            self.call_count = 0
-            self.last_call_time = time.time()
-        elif current_time - self.last_call_time >= 60:
-            self.call_count = 0
-            self.last_call_time = current_time
-        self.call_count += 1
+        self.rate_limiter.acquire()
 
     def _init_db(self):
         """初始化数据库表"""
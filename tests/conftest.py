@@ -0,0 +1,152 @@
+import sys
+import math
+import sqlite3
+import types
+from contextlib import contextmanager
+from pathlib import Path
+
+# 添加项目根目录到系统路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import numpy as np
+import pytest
+from config.config import DATA_VERSION_CONFIG, PRICE_CUBE_CONFIG
+
+try:
+    import mysql.connector
+except ImportError:
+    # 用例不连接 MySQL（服务层的连接换成内存 sqlite），没有安装驱动时只需要能导入 utils.database
+    def _connect(**kwargs):
+        raise RuntimeError("测试环境未安装 mysql-connector-python")
+    connector = types.ModuleType('mysql.connector')
+    connector.Error = type('Error', (Exception,), {})
+    connector.connect = _connect
+    sys.modules['mysql'] = types.ModuleType('mysql')
+    sys.modules['mysql'].connector = connector
+    sys.modules['mysql.connector'] = connector
+
+class SqliteConnection:
+    """sqlite3 连接套上服务层用到的 mysql.connector 接口: %s 占位符、cursor(dictionary=True)
+
+    服务层的 SQL 原样在内存库上执行，作为行情立方体等数组实现的对照
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def cursor(self, dictionary=False):
+        return SqliteCursor(self.conn.cursor(), dictionary)
+
+    def commit(self):
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+
+class SqliteCursor:
+    def __init__(self, cursor, dictionary):
+        self.cursor = cursor
+        self.dictionary = dictionary
+
+    def execute(self, sql, params=()):
+        self.cursor.execute(sql.replace('%s', '?'), tuple(params or ()))
+
+    def executemany(self, sql, seq_params):
+        self.cursor.executemany(sql.replace('%s', '?'), [tuple(p) for p in seq_params])
+
+    def fetchall(self):
+        return [self._row(row) for row in self.cursor.fetchall()]
+
+    def fetchone(self):
+        row = self.cursor.fetchone()
+        return None if row is None else self._row(row)
+
+    @property
+    def rowcount(self):
+        return self.cursor.rowcount
+
+    def _row(self, row):
+        if not self.dictionary:
+            return row
+        return {column[0]: value for column, value in zip(self.cursor.description, row)}
+
+def make_trade_dates(n, start='2024-09-02'):
+    """从 start 起 n 个工作日 YYYYMMDD"""
+    return [d.strftime('%Y%m%d') for d in np.busday_offset(start, np.arange(n), roll='forward').astype('M8[D]').tolist()]
+
+@pytest.fixture
+def version_dir(tmp_path, monkeypatch):
+    """数据版本文件写到临时目录，各用例的版本互不影响"""
+    monkeypatch.setitem(DATA_VERSION_CONFIG, 'DIR', str(tmp_path / 'versions'))
+    return tmp_path / 'versions'
+
+@pytest.fixture
+def stock_db(version_dir, tmp_path, monkeypatch):
+    """内存中的 stock_data / daily_basic，服务层的 get_mysql_connection 指向它
+
+    12 只股票、60 个交易日，带停牌（整行缺失）、区间中途上市和 pct_chg 缺失的日线
+    """
+    import app.services.price_cube as price_cube
+    import app.services.stock_analysis as stock_analysis
+    import app.services.sector_correlation as sector_correlation
+    import utils.result_cache as result_cache
+
+    conn = sqlite3.connect(':memory:', check_same_thread=False)
+    conn.create_function('LN', 1, math.log)
+    conn.create_function('EXP', 1, math.exp)
+    conn.create_function('GREATEST', 2, max)
+    conn.execute('''
+        CREATE TABLE stock_data (
+            ts_code TEXT, trade_date TEXT, open REAL, high REAL, low REAL, close REAL,
+            pre_close REAL, `change` REAL, pct_chg REAL, vol REAL, amount REAL,
+            PRIMARY KEY (ts_code, trade_date)
+        )
+    ''')
+    conn.execute('CREATE TABLE daily_basic (ts_code TEXT, trade_date TEXT, turnover_rate REAL, '
+                 'PRIMARY KEY (ts_code, trade_date))')
+
+    rng = np.random.default_rng(20240902)
+    dates = make_trade_dates(60)
+    codes = [f'{600000 + i:06d}.SH' for i in range(12)]
+    for i, code in enumerate(codes):
+        close = 10.0 + i
+        listed = 20 if i == 3 else 0  # 区间中途上市
+        for j, trade_date in enumerate(dates[listed:], start=listed):
+            if rng.random() < 0.08:
+                continue  # 停牌
+            pct_chg = round(float(rng.normal(0, 2)), 2)
+            open_ = round(close * (1 + float(rng.normal(0, 0.005))), 2)
+            pre_close, close = close, round(close * (1 + pct_chg / 100), 2)
+            amount = round(float(rng.uniform(1e4, 1e6)), 3)
+            conn.execute('INSERT INTO stock_data VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                         (code, trade_date, open_, max(open_, close), min(open_, close), close,
+                          pre_close, round(close - pre_close, 2),
+                          None if (i == 5 and j == 30) else pct_chg, amount / 10, amount))
+            conn.execute('INSERT INTO daily_basic VALUES (?, ?, ?)',
+                         (code, trade_date, round(float(rng.uniform(0.1, 5)), 4)))
+    conn.commit()
+
+    @contextmanager
+    def get_connection():
+        yield SqliteConnection(conn)
+
+    for module in (price_cube, stock_analysis, sector_correlation):
+        monkeypatch.setattr(module, 'get_mysql_connection', get_connection)
+    monkeypatch.setitem(PRICE_CUBE_CONFIG, 'DIR', str(tmp_path / 'price_cube'))
+    monkeypatch.setattr(price_cube, '_holder', price_cube._CubeHolder())
+    # 各用例的数据版本都从 0 开始，结果缓存也换成新的
+    monkeypatch.setattr(result_cache, '_result_cache', None)
+
+    yield {'conn': conn, 'dates': dates, 'codes': codes}
+    conn.close()
+
+@pytest.fixture
+def build_cube(stock_db):
+    """从第 start_index 个交易日起构建行情立方体并打开"""
+    from app.services.price_cube import PriceCube, PriceCubeBuilder
+
+    def build(start_index=0):
+        PriceCubeBuilder(start_date=stock_db['dates'][start_index]).build()
+        return PriceCube.open(PRICE_CUBE_CONFIG['DIR'])
+    return build
@@ -0,0 +1,86 @@
+from contextlib import contextmanager
+import pandas as pd
+import pytest
+import app.services.data_updater as data_updater
+from app.services.data_updater import StockDataUpdater, DAILY_BASIC_COLUMNS
+from app.services.screener import DAILY_BASIC_VERSION
+from utils.data_version import DATA_VERSION
+from utils.rate_limiter import TokenBucket
+
+TRADE_DATES = ['20240902', '20240903', '20240904', '20240905']
+
+class Source:
+    """按交易日返回一行数据，20240904 拉取失败"""
+
+    def __init__(self):
+        self.calls = []
+
+    def daily_basic(self, **kwargs):
+        return self._fetch('daily_basic', kwargs)
+
+    def moneyflow(self, **kwargs):
+        return self._fetch('moneyflow', kwargs)
+
+    def _fetch(self, api, kwargs):
+        self.calls.append((api, kwargs))
+        if kwargs['trade_date'] == '20240904':
+            raise IOError('timeout')
+        return pd.DataFrame({'ts_code': ['600000.SH'], 'trade_date': [kwargs['trade_date']]})
+
+@pytest.fixture
+def updater(monkeypatch):
+    """数据库换成记录写入的桩；20240902 已完整入库"""
+    events = []
+
+    class Connection:
+        def cursor(self, dictionary=False):
+            return None
+
+    @contextmanager
+    def get_connection():
+        yield Connection()
+
+    monkeypatch.setattr(data_updater, 'get_mysql_connection', get_connection)
+    monkeypatch.setattr(data_updater, 'bulk_upsert', lambda conn, table, df, columns, batch_size:
+                        events.append(('write', table, df['trade_date'][0])) or {'rows': len(df)})
+    monkeypatch.setattr(data_updater, 'rollup_sector_moneyflow', lambda conn, trade_dates:
+                        events.append(('rollup', trade_dates)))
+    monkeypatch.setattr(data_updater, 'bump_version', lambda name: events.append(('bump', name)))
+
+    updater = StockDataUpdater(data_source=Source())
+    updater._get_open_dates = lambda start, end: [d for d in TRADE_DATES if start <= d <= end]
+    updater._get_complete_dates = lambda cursor, table, dates: [d for d in dates if d == '20240902']
+    updater.events = events
+    return updater
+
+def test_update_daily_basic(updater):
+    result = updater.update_daily_basic('20240902', end_date='20240905')
+
+    assert not result['success'] and len(result['errors']) == 1
+    assert result['skipped_dates'] == ['20240902']
+    assert result['updated_dates'] == ['20240903', '20240905']
+    assert result['rows'] == 2
+    assert all(call == ('daily_basic', {'trade_date': call[1]['trade_date'], 'fields': DAILY_BASIC_COLUMNS})
+               for call in updater.pro.calls)
+    assert sorted(updater.events[:2]) == [('write', 'daily_basic', '20240903'), ('write', 'daily_basic', '20240905')]
+    assert updater.events[2:] == [('bump', DAILY_BASIC_VERSION)]
+
+def test_update_moneyflow_rolls_up_written_dates(updater):
+    result = updater.update_moneyflow('20240902', end_date='20240905', force=True)
+
+    assert result['skipped_dates'] == []
+    assert result['updated_dates'] == ['20240902', '20240903', '20240905']
+    assert sorted(call[1]['trade_date'] for call in updater.pro.calls) == TRADE_DATES
+    assert updater.events[3:] == [('rollup', ['20240902', '20240903', '20240905']), ('bump', DATA_VERSION)]
+
+def test_nothing_written_skips_callbacks(updater):
+    result = updater.update_moneyflow('20240902')
+
+    assert result['success'] and result['updated_dates'] == [] and result['skipped_dates'] == ['20240902']
+    assert updater.pro.calls == [] and updater.events == []
+
+def test_injected_source_does_not_share_tushare_limiter():
+    assert StockDataUpdater(data_source=Source()).rate_limiter is None
+    limiter = TokenBucket(600)
+    updater = StockDataUpdater(data_source=Source(), rate_limiter=limiter)
+    assert updater.rate_limiter is limiter and updater.moneyflow_limiter is limiter
@@ -0,0 +1,85 @@
+import threading
+import numpy as np
+import pandas as pd
+import app.services.indicators as indicators
+from app.services.indicators import (IndicatorState, submit_indicator_job, MA_WINDOWS, EMA_WINDOWS,
+                                     BOLL_WINDOW, BOLL_WIDTH)
+
+def price_series(days=120, seed=11):
+    rng = np.random.default_rng(seed)
+    close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, size=days)))
+    high = close * (1 + rng.uniform(0, 0.02, size=days))
+    low = close * (1 - rng.uniform(0, 0.02, size=days))
+    return high, low, close
+
+def run_steps(state, code, high, low, close):
+    rows = state.rows([code])
+    values = [state.step(rows, high[i:i + 1], low[i:i + 1], close[i:i + 1]) for i in range(len(close))]
+    return {column: np.array([v[column][0] for v in values]) for column in values[0]}
+
+def test_incremental_ma_boll_ema_match_pandas():
+    high, low, close = price_series()
+    values = run_steps(IndicatorState(), '600000.SH', high, low, close)
+    series = pd.Series(close)
+
+    for w in MA_WINDOWS:
+        np.testing.assert_allclose(values[f'ma{w}'], series.rolling(w).mean(), rtol=1e-9, equal_nan=True)
+    for w in EMA_WINDOWS:
+        np.testing.assert_allclose(values[f'ema{w}'], series.ewm(span=w, adjust=False).mean(), rtol=1e-9)
+
+    mid = series.rolling(BOLL_WINDOW).mean()
+    std = series.rolling(BOLL_WINDOW).std(ddof=0)
+    np.testing.assert_allclose(values['boll_upper'], mid + BOLL_WIDTH * std, rtol=1e-7, equal_nan=True)
+    np.testing.assert_allclose(values['boll_lower'], mid - BOLL_WIDTH * std, rtol=1e-7, equal_nan=True)
+
+def test_resume_from_saved_state_matches_full_run(tmp_path):
+    """分两段推进（中间保存、读取状态）与一次推进到底的结果相同"""
+    high, low, close = price_series()
+    full = run_steps(IndicatorState(), '600000.SH', high, low, close)
+
+    state = IndicatorState()
+    run_steps(state, '600000.SH', high[:70], low[:70], close[:70])
+    path = str(tmp_path / 'state.npz')
+    state.save(path, '20250101')
+    loaded, resume_date = IndicatorState.load(path)
+    rest = run_steps(loaded, '600000.SH', high[70:], low[70:], close[70:])
+
+    assert resume_date == '20250101'
+    for column, expected in full.items():
+        np.testing.assert_allclose(rest[column], expected[70:], rtol=1e-9, equal_nan=True)
+
+def test_stocks_step_independently():
+    """多只股票同时推进时与逐只推进的结果相同，新股票追加在末尾"""
+    a, b = price_series(seed=1), price_series(seed=2)
+    state = IndicatorState()
+    rows = state.rows(['A', 'B'])
+    combined = [state.step(rows, np.array([a[0][i], b[0][i]]), np.array([a[1][i], b[1][i]]),
+                           np.array([a[2][i], b[2][i]])) for i in range(len(a[2]))]
+    single = run_steps(IndicatorState(), 'B', *b)
+
+    assert state.codes == ['A', 'B']
+    for column, expected in single.items():
+        np.testing.assert_allclose([v[column][1] for v in combined], expected, rtol=1e-9, equal_nan=True)
+
+def test_full_request_while_running_is_kept(version_dir, monkeypatch):
+    """更新任务运行期间提交的 full=True 合并进该任务，再更新的一遍从头计算"""
+    started = threading.Event()
+    release = threading.Event()
+    runs = []
+
+    class Updater:
+        def update(self, full=False):
+            runs.append(full)
+            started.set()
+            release.wait(5)
+            return {'success': True}
+
+    monkeypatch.setattr(indicators, 'IndicatorUpdater', Updater)
+    job = submit_indicator_job()
+    started.wait(5)
+    assert submit_indicator_job(full=True).id == job.id
+    assert submit_indicator_job().id == job.id
+    release.set()
+    job.thread.join(5)
+
+    assert runs == [False, True]
@@ -0,0 +1,120 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import app.services.job_manager as job_manager_module
+from app.services.job_manager import JobManager, active_jobs
+
+def wait_until(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while not predicate():
+        if time.time() > deadline:
+            raise AssertionError('等待超时')
+        time.sleep(0.01)
+
+def blocking_target(release, progress=None):
+    def target(job):
+        if progress is not None:
+            job.progress = progress
+        while not release.is_set() and not job.cancel_event.is_set():
+            time.sleep(0.01)
+        return {'success': True}
+    return target
+
+def test_same_name_runs_once_across_managers(version_dir):
+    """两个 JobManager 模拟两个 worker 进程，同名任务只运行一个，另一方返回正在运行的任务"""
+    first, second = JobManager(interval=0.01), JobManager(interval=0.01)
+    release = threading.Event()
+
+    job, created = first.submit('update', blocking_target(release, {'progress': 40}))
+    other, other_created = second.submit('update', blocking_target(release))
+
+    assert created and not other_created
+    assert other.id == job.id
+    wait_until(lambda: second.get(job.id).progress.get('progress') == 40)
+    assert second.latest('update').status == 'running'
+    assert [j['job_id'] for j in second.list()] == [job.id]
+
+    release.set()
+    wait_until(lambda: second.get(job.id).status == 'completed')
+    again, created = second.submit('update', blocking_target(release))
+    assert created and again.id != job.id
+    job.thread.join(5)
+    again.thread.join(5)
+
+def test_cancel_from_other_manager(version_dir):
+    first, second = JobManager(interval=0.01), JobManager(interval=0.01)
+    job, _ = first.submit('update', blocking_target(threading.Event()))
+
+    assert second.cancel(name='update').id == job.id
+    wait_until(lambda: second.get(job.id).status == 'cancelled')
+    job.thread.join(5)
+    assert not os.path.exists(second._path(job.id, 'cancel'))
+
+def test_job_of_exited_process_is_not_active(version_dir, monkeypatch):
+    manager = JobManager(interval=0.01)
+    monkeypatch.setattr(job_manager_module, 'job_manager', manager)
+    release = threading.Event()
+    job, _ = manager.submit('update', blocking_target(release))
+    assert active_jobs() == [(os.getpid(), 'update')]
+
+    # 状态文件停在运行中，但所在进程已退出（如 worker 被杀掉）
+    exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+    exited.wait()
+    with open(manager._path('deadbeef', 'json'), 'w') as f:
+        json.dump(dict(job.to_dict(), job_id='deadbeef', name='other', pid=exited.pid), f)
+
+    assert manager.get('deadbeef').status == 'error'
+    assert active_jobs() == [(os.getpid(), 'update')]
+    release.set()
+    job.thread.join(5)
+    assert active_jobs() == []
+
+def test_rerun_merges_full_requests(version_dir):
+    manager = JobManager(interval=0.01)
+    release = threading.Event()
+    runs = []
+
+    def run_once(job, params):
+        runs.append(params['full'])
+        release.wait(5)
+        return {'success': True}
+
+    job, created = manager.submit_or_rerun('refresh', run_once, {'full': False})
+    wait_until(lambda: runs)
+    # 运行期间的多次请求合并为一次重跑，其中的 full=True 不会被之后的 full=False 覆盖
+    for full in (True, False):
+        other, other_created = JobManager().submit_or_rerun('refresh', run_once, {'full': full})
+        assert other.id == job.id and not other_created
+    release.set()
+    job.thread.join(5)
+
+    assert runs == [False, True]
+    assert job.status == 'completed'
+
+def test_request_while_job_is_finishing_runs_again(version_dir, monkeypatch):
+    """一遍执行完、任务结束之前另一个进程提交的请求合并进该任务再执行一遍，而不是丢失"""
+    manager = JobManager(interval=0.01)
+    runs = []
+    late = []
+    hold = job_manager_module._hold
+
+    def hold_after_late_submit(path):
+        if threading.current_thread().name.startswith('job-') and not late:
+            late.append(None)
+            late.append(JobManager().submit_or_rerun('refresh', run_once, {'full': True}))
+        return hold(path)
+
+    def run_once(job, params):
+        runs.append(params['full'])
+        return {'success': True}
+
+    monkeypatch.setattr(job_manager_module, '_hold', hold_after_late_submit)
+    job, _ = manager.submit_or_rerun('refresh', run_once, {'full': False})
+    job.thread.join(5)
+
+    other, created = late[1]
+    assert other.id == job.id and not created
+    assert runs == [False, True]
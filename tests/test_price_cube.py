@@ -0,0 +1,60 @@
+import threading
+import numpy as np
+import pandas as pd
+import app.services.price_cube as price_cube
+from app.services.price_cube import get_price_cube, submit_build_job
+
+def frame(stock_db, sql):
+    return pd.read_sql_query(sql, stock_db['conn'])
+
+def test_panel_matches_stock_data(stock_db, build_cube):
+    dates = stock_db['dates']
+    cube = build_cube()
+    codes = stock_db['codes'][:4]
+
+    panel, found = cube.panel('close', codes, dates[5], dates[25])
+    expected = frame(stock_db, f'''
+        SELECT ts_code, trade_date, close FROM stock_data
+        WHERE trade_date >= '{dates[5]}' AND trade_date <= '{dates[25]}'
+    ''').pivot(index='ts_code', columns='trade_date', values='close').reindex(index=found, columns=dates[5:26])
+
+    assert found == codes
+    np.testing.assert_allclose(panel, expected.to_numpy(), rtol=1e-6)
+
+def test_series_of_unknown_code_is_none(stock_db, build_cube):
+    cube = build_cube()
+    assert cube.series('close', '999999.SH') is None
+    assert len(cube.series('close', stock_db['codes'][0])) == len(stock_db['dates'])
+
+def test_rebuild_switches_current_cube(stock_db, build_cube):
+    """重建后 get_price_cube 换成新版本，旧版本目录被清理前已映射的数组仍可读"""
+    dates = stock_db['dates']
+    old = build_cube(start_index=30)
+    assert get_price_cube().dates[0] == dates[30]
+
+    build_cube()
+    assert get_price_cube().dates[0] == dates[0]
+    assert old.dates[0] == dates[30] and old.arrays['close'].shape[1] == 30
+
+def test_build_requested_while_running_builds_again(stock_db, monkeypatch):
+    started = threading.Event()
+    release = threading.Event()
+    builds = []
+
+    class Builder:
+        def build(self):
+            builds.append(1)
+            started.set()
+            release.wait(5)
+            return {'success': True}
+
+    monkeypatch.setattr(price_cube, 'PriceCubeBuilder', Builder)
+    job = submit_build_job()
+    started.wait(5)
+    assert submit_build_job().id == job.id
+    assert submit_build_job().id == job.id
+    release.set()
+    job.thread.join(5)
+
+    assert len(builds) == 2  # 运行期间的多次请求合并为一次重建
+    assert job.status == 'completed'
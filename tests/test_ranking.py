@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+import app.services.ranking as ranking
+from app.services.ranking import RankingService
+
+class ReferenceData:
+    version = 1
+
+    def __init__(self, members):
+        self.members = members
+
+    def stock_names(self, codes):
+        return {code: f'股票{code[:6]}' for code in codes}
+
+    def sector_members(self, sector_id):
+        return self.members
+
+@pytest.fixture
+def reference(stock_db, monkeypatch):
+    reference = ReferenceData(stock_db['codes'][:5])
+    monkeypatch.setattr(ranking, 'get_reference_data', lambda: reference)
+    return reference
+
+def test_window_sums_match_sql(stock_db, build_cube):
+    dates = stock_db['dates']
+    cube = build_cube()
+    start_date, end_date = dates[12], dates[40]
+
+    bars = pd.read_sql_query(f'''
+        SELECT s.ts_code, SUM(s.amount) AS amount, SUM(b.turnover_rate) AS turnover_rate, COUNT(*) AS traded
+        FROM stock_data s JOIN daily_basic b ON s.ts_code = b.ts_code AND s.trade_date = b.trade_date
+        WHERE s.trade_date >= '{start_date}' AND s.trade_date <= '{end_date}'
+        GROUP BY s.ts_code
+    ''', stock_db['conn']).set_index('ts_code').reindex(cube.codes)
+
+    np.testing.assert_allclose(cube.window_sum('amount', start_date, end_date), bars['amount'], rtol=1e-6)
+    np.testing.assert_allclose(cube.window_sum('turnover_rate', start_date, end_date), bars['turnover_rate'],
+                               rtol=1e-5)
+    np.testing.assert_array_equal(cube.traded_days(start_date, end_date), bars['traded'])
+
+@pytest.mark.parametrize('order', ['top', 'bottom'])
+@pytest.mark.parametrize('sector', [False, True])
+def test_rank_matches_full_sort(stock_db, build_cube, reference, order, sector):
+    dates = stock_db['dates']
+    cube = build_cube()
+    values = cube.window_returns(dates[10], dates[50])
+    codes = reference.members if sector else cube.codes
+    expected = sorted(((cube.codes[i], v) for i, v in enumerate(values) if cube.codes[i] in codes),
+                      key=lambda item: -item[1] if order == 'top' else item[1])[:3]
+
+    result = RankingService().rank('return', dates[10], dates[50], n=3, order=order,
+                                   sector_id=1 if sector else None)
+
+    assert result['total'] == len(codes)
+    assert [s['code'] for s in result['stocks']] == [code for code, _ in expected]
+    assert [s['value'] for s in result['stocks']] == pytest.approx([v for _, v in expected], abs=1e-4)
+
+def test_rank_is_cached_until_cube_rebuilt(stock_db, build_cube, reference, monkeypatch):
+    dates = stock_db['dates']
+    build_cube()
+    computed = []
+    compute = RankingService._compute
+    monkeypatch.setattr(RankingService, '_compute', lambda self, *args: computed.append(args) or compute(self, *args))
+
+    first = RankingService().rank('amount', dates[0], dates[20])
+    assert RankingService().rank('amount', dates[0], dates[20]) is first
+    assert len(computed) == 1
+
+    build_cube()
+    RankingService().rank('amount', dates[0], dates[20])
+    assert len(computed) == 2
@@ -0,0 +1,164 @@
+import threading
+import time
+import pytest
+import utils.result_cache as result_cache
+from utils.result_cache import ResultCache, cached_result
+from utils.data_version import DATA_VERSION, bump_version
+
+def compute_once(cache, key, value, version=1, **kwargs):
+    return cache.get_or_compute('test', key, version, lambda: value, **kwargs)
+
+def test_hit_and_miss():
+    cache = ResultCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {'value': len(calls)}
+
+    assert cache.get_or_compute('test', 'a', 1, compute) == {'value': 1}
+    assert cache.get_or_compute('test', 'a', 1, compute) == {'value': 1}
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+    assert stats['by_name']['test'] == {'hits': 1, 'misses': 1}
+
+def test_ttl_expiry():
+    cache = ResultCache(ttl=0.05)
+    compute_once(cache, 'a', 'old')
+    compute_once(cache, 'b', 'long', ttl=60)
+    time.sleep(0.1)
+
+    assert compute_once(cache, 'a', 'new') == 'new'
+    assert compute_once(cache, 'b', 'other') == 'long'
+    assert cache.stats()['expired'] == 1
+
+def test_lru_eviction_by_entries():
+    cache = ResultCache(max_entries=2)
+    compute_once(cache, 'a', 'A')
+    compute_once(cache, 'b', 'B')
+    compute_once(cache, 'a', 'unused')  # a 变为最近使用
+    compute_once(cache, 'c', 'C')
+
+    assert compute_once(cache, 'a', 'A2') == 'A'
+    assert compute_once(cache, 'b', 'B2') == 'B2'  # b 已被淘汰
+    assert cache.stats()['evictions'] >= 1
+
+def test_eviction_by_bytes():
+    cache = ResultCache(max_bytes=100)
+    for key in 'abc':
+        compute_once(cache, key, key * 40, size=len)
+
+    stats = cache.stats()
+    assert stats['bytes'] <= 100
+    assert stats['entries'] == 2
+    assert compute_once(cache, 'a', 'recomputed', size=len) == 'recomputed'
+
+def test_uncacheable_results_are_not_stored():
+    cache = ResultCache()
+    assert compute_once(cache, 'a', None) is None
+    assert compute_once(cache, 'a', 'value') == 'value'
+    assert compute_once(cache, 'b', {'success': False}, cacheable=lambda v: v['success']) == {'success': False}
+    assert compute_once(cache, 'b', {'success': True}) == {'success': True}
+
+def test_newer_version_drops_old_entries():
+    cache = ResultCache()
+    compute_once(cache, 'v1:a', 'A', version=1)
+    compute_once(cache, 'v2:a', 'A2', version=2)
+
+    stats = cache.stats()
+    assert stats['entries'] == 1
+    assert stats['invalidated'] == 1
+
+def test_result_computed_for_stale_version_is_not_cached():
+    cache = ResultCache()
+    compute_once(cache, 'v2:a', 'A2', version=2)
+    assert compute_once(cache, 'v1:b', 'B', version=1) == 'B'
+    assert cache.stats()['entries'] == 1
+
+def test_single_flight():
+    cache = ResultCache()
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'value'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute('test', 'k', 1, compute)))
+               for _ in range(8)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    # 等其余线程都进入等待后再放行
+    deadline = time.time() + 5
+    while cache.stats()['coalesced'] < 7 and time.time() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert results == ['value'] * 8
+    stats = cache.stats()
+    assert (stats['misses'], stats['coalesced'], stats['in_flight']) == (1, 7, 0)
+
+def test_single_flight_shares_errors():
+    cache = ResultCache()
+    release = threading.Event()
+    errors = []
+
+    def compute():
+        release.wait(5)
+        raise ValueError('boom')
+
+    def call():
+        try:
+            cache.get_or_compute('test', 'k', 1, compute)
+        except ValueError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=call) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    deadline = time.time() + 5
+    while cache.stats()['coalesced'] < 3 and time.time() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert errors == ['boom'] * 4
+    assert cache.stats()['entries'] == 0
+
+def test_cached_result_keys_on_data_version(version_dir, monkeypatch):
+    monkeypatch.setattr(result_cache, '_result_cache', ResultCache())
+    calls = []
+
+    class Service:
+        @cached_result('service.double', method=True)
+        def double(self, value):
+            calls.append(value)
+            return value * 2
+
+    assert Service().double(2) == 4
+    assert Service().double(2) == 4
+    assert Service().double(3) == 6
+    assert calls == [2, 3]
+
+    bump_version(DATA_VERSION)
+    assert Service().double(2) == 4
+    assert calls == [2, 3, 2]
+
+@pytest.mark.parametrize('args', [((1, 2), {}), ((1,), {'b': 2})])
+def test_make_key_includes_version(version_dir, args):
+    cache = ResultCache()
+    key, version = cache.make_key('name', *args)
+    assert version == 0
+    bump_version(DATA_VERSION)
+    assert cache.make_key('name', *args) == (key.replace(':0:', ':1:'), 1)
@@ -0,0 +1,109 @@
+import threading
+import time
+import pytest
+from app import create_app
+from app.routes import sector_routes
+from app.services.data_updater import StockDataUpdater
+from app.services.job_manager import job_manager
+
+@pytest.fixture
+def client(version_dir):
+    return create_app().test_client()
+
+def test_healthz(client):
+    response = client.get('/healthz')
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'ok'
+
+def wait_for_job(client, job_id, timeout=5):
+    """与前端 waitForJob 相同，轮询任务状态直到结束"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = client.get(f'/api/jobs/{job_id}').get_json()['job']
+        if job['status'] not in ('pending', 'running'):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f'任务未结束: {job_id}')
+
+def test_job_routes(client):
+    release = threading.Event()
+
+    def target(job):
+        release.wait(5)
+        return {'success': True, 'rows': 3}
+
+    job, created = job_manager.submit('test_job_routes', target)
+    assert created
+
+    response = client.get(f'/api/jobs/{job.id}')
+    assert response.status_code == 200
+    assert response.get_json()['job']['status'] in ('pending', 'running')
+    assert any(j['job_id'] == job.id for j in client.get('/api/jobs').get_json()['jobs'])
+
+    release.set()
+    assert wait_for_job(client, job.id)['result'] == {'success': True, 'rows': 3}
+    job.thread.join(5)
+    assert client.get('/api/jobs/missing').status_code == 404
+    assert client.post(f'/api/jobs/{job.id}/cancel').status_code == 404
+
+def test_update_daily_basic_runs_as_job(client, monkeypatch):
+    """与前端 updateDailyBasic 相同: 提交后轮询任务，运行期间再次提交返回 409"""
+    release = threading.Event()
+    calls = []
+
+    def update_daily_basic(self, trade_date=None, end_date=None, force=False, cancel_event=None):
+        calls.append((trade_date, end_date, force))
+        release.wait(5)
+        return {'success': True, 'updated_dates': [trade_date], 'rows': 0}
+
+    monkeypatch.setattr(StockDataUpdater, 'update_daily_basic', update_daily_basic)
+    response = client.post('/api/update_daily_basic/20240902', json={'end_date': '20240906'})
+    data = response.get_json()
+    assert response.status_code == 200 and data['success']
+
+    running = client.post('/api/update_daily_basic')
+    assert running.status_code == 409
+    assert running.get_json()['job_id'] == data['job_id']
+
+    release.set()
+    job = wait_for_job(client, data['job_id'])
+    assert job['status'] == 'completed'
+    assert job['result']['updated_dates'] == ['20240902']
+    assert calls == [('20240902', '20240906', False)]
+    job_manager.get(data['job_id']).thread.join(5)
+
+def test_update_moneyflow_runs_as_job(client, monkeypatch):
+    calls = []
+
+    def update_moneyflow(self, trade_date=None, end_date=None, force=False, cancel_event=None):
+        calls.append((trade_date, end_date, force))
+        return {'success': True, 'updated_dates': [], 'rows': 0}
+
+    monkeypatch.setattr(StockDataUpdater, 'update_moneyflow', update_moneyflow)
+    data = client.post('/api/update_moneyflow', json={'force': True}).get_json()
+
+    assert data['success']
+    assert wait_for_job(client, data['job_id'])['status'] == 'completed'
+    assert calls == [(None, None, True)]
+    job_manager.get(data['job_id']).thread.join(5)
+
+def test_save_sector_rejects_unknown_codes(client, monkeypatch):
+    """快照中没有的代码先重新加载基础数据，仍然未知时返回 400，成分股不变"""
+    class ReferenceData:
+        reloads = 0
+
+        def has_stock(self, code):
+            return code == '600000.SH'
+
+        def reload(self):
+            self.reloads += 1
+
+    reference = ReferenceData()
+    monkeypatch.setattr(sector_routes, 'get_reference_data', lambda: reference)
+    monkeypatch.setattr(sector_routes, 'get_mysql_connection', lambda: pytest.fail('不应写入成分股'))
+
+    response = client.post('/api/save_sector_stocks', json={'name': '测试', 'stocks': ['600000', '688999']})
+
+    assert response.status_code == 400
+    assert response.get_json()['unknown_stocks'] == ['688999.SH']
+    assert reference.reloads == 1
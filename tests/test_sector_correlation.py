@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import app.services.sector_correlation as sector_correlation
+from app.services.sector_correlation import (pairwise_correlation, sector_betas, cluster_order,
+                                             SectorCorrelation, MIN_OVERLAP_DAYS)
+from app.services.price_cube import PriceCubeBuilder
+from utils.data_version import DATA_VERSION, bump_version
+
+def random_returns(days=80, stocks=15, missing=0.15, seed=7):
+    """交易日 × 股票 的日收益，带一个公共因子，随机缺失；最后一只股票只有 5 天日线"""
+    rng = np.random.default_rng(seed)
+    market = rng.normal(0, 0.01, size=(days, 1))
+    returns = market * rng.uniform(0.2, 1.5, size=stocks) + rng.normal(0, 0.01, size=(days, stocks))
+    returns[rng.random((days, stocks)) < missing] = np.nan
+    returns[5:, -1] = np.nan
+    return returns
+
+def test_pairwise_correlation_matches_pandas():
+    returns = random_returns()
+    corr, n = pairwise_correlation(returns)
+    df = pd.DataFrame(returns)
+    expected = df.corr(min_periods=MIN_OVERLAP_DAYS).to_numpy()
+    present = df.notna().astype(int).to_numpy()
+
+    np.testing.assert_allclose(corr, expected, atol=1e-9, equal_nan=True)
+    np.testing.assert_array_equal(n, present.T @ present)
+    assert np.isnan(corr[-1]).all()  # 共同交易日不足
+
+def test_pairwise_correlation_min_overlap():
+    returns = random_returns(missing=0.0)
+    returns[:75, 0] = np.nan  # 只有 5 天日线
+    corr, n = pairwise_correlation(returns, min_overlap=5)
+    expected = pd.DataFrame(returns).corr(min_periods=5).to_numpy()
+
+    np.testing.assert_allclose(corr, expected, atol=1e-9, equal_nan=True)
+    assert n[0, 1] == 5
+
+def test_sector_betas_match_regression():
+    returns = random_returns(missing=0.0)
+    beta, days = sector_betas(returns)
+    market = np.nanmean(returns, axis=1)
+
+    for i in range(returns.shape[1] - 1):
+        x = returns[:, i]
+        expected = np.cov(x, market, bias=True)[0, 1] / np.var(market)
+        assert abs(beta[i] - expected) < 1e-9
+    assert np.isnan(beta[-1])
+    assert days[-1] == 5
+
+def test_cluster_order_groups_correlated_stocks():
+    rng = np.random.default_rng(3)
+    a, b = rng.normal(size=(2, 100, 1))
+    returns = np.hstack([a + rng.normal(0, 0.1, (100, 3)), b + rng.normal(0, 0.1, (100, 3))])
+    shuffled = [0, 3, 1, 4, 2, 5]
+    corr, _ = pairwise_correlation(returns[:, shuffled])
+    order = [shuffled[i] for i in cluster_order(corr)]
+
+    assert sorted(order) == list(range(6))
+    assert set(order[:3]) in ({0, 1, 2}, {3, 4, 5})
+
+def test_load_returns_cube_matches_sql(stock_db):
+    """成分股日收益从行情立方体和从 stock_data 读取结果一致"""
+    dates = stock_db['dates']
+    members = stock_db['codes'][:6]
+    service = SectorCorrelation()
+
+    sql_codes, sql_dates, sql_returns = service._load_returns(members, dates[0], dates[50])
+    PriceCubeBuilder(start_date=dates[0]).build()
+    cube_codes, cube_dates, cube_returns = service._load_returns(members, dates[0], dates[50])
+
+    assert list(cube_codes) == list(sql_codes)
+    assert list(cube_dates) == list(sql_dates)
+    np.testing.assert_allclose(cube_returns, sql_returns, atol=1e-6, equal_nan=True)
+
+def test_get_is_cached_until_data_version_changes(stock_db, monkeypatch):
+    class ReferenceData:
+        version = 1
+
+        def sector_members(self, sector_id):
+            return stock_db['codes'][:6]
+
+        def stock_names(self, codes):
+            return {code: code for code in codes}
+
+    monkeypatch.setattr(sector_correlation, 'get_reference_data', ReferenceData)
+    loads = []
+    load_returns = SectorCorrelation._load_returns
+    monkeypatch.setattr(SectorCorrelation, '_load_returns',
+                        lambda self, *args: loads.append(args) or load_returns(self, *args))
+    dates = stock_db['dates']
+
+    first = SectorCorrelation().get(1, dates[0], dates[50])
+    assert SectorCorrelation().get(1, dates[0], dates[50]) is first
+    assert len(loads) == 1
+
+    bump_version(DATA_VERSION)
+    assert SectorCorrelation().get(1, dates[0], dates[50]) == first
+    assert len(loads) == 2
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+from app.services.price_cube import get_price_cube
+from app.services.stock_analysis import StockAnalysis
+import app.services.stock_analysis as stock_analysis
+from utils.result_cache import get_result_cache
+
+def sql_window_returns(stock_db, monkeypatch, start_date, end_date):
+    """没有行情立方体时 get_window_returns 在数据库中按 pct_chg 聚合的结果"""
+    with monkeypatch.context() as m:
+        m.setattr(stock_analysis, 'get_price_cube', lambda *args, **kwargs: None)
+        result = StockAnalysis().get_window_returns(stock_db['codes'], start_date, end_date)
+    get_result_cache().clear()
+    return result
+
+@pytest.mark.parametrize('window', [(0, 59), (0, 10), (15, 45), (30, 30), (50, 59)])
+def test_window_returns_match_sql(stock_db, build_cube, monkeypatch, window):
+    dates = stock_db['dates']
+    start_date, end_date = dates[window[0]], dates[window[1]]
+    build_cube()
+
+    expected = sql_window_returns(stock_db, monkeypatch, start_date, end_date)
+    actual = StockAnalysis().get_window_returns(stock_db['codes'], start_date, end_date)
+
+    assert expected
+    assert actual.keys() == expected.keys()
+    for code, value in expected.items():
+        assert actual[code] == pytest.approx(value, abs=1e-3), code
+
+def test_window_without_bars_is_nan(stock_db, build_cube):
+    """区间中途上市的股票在上市前的区间没有收益"""
+    dates = stock_db['dates']
+    cube = build_cube()
+    rows, _ = cube.code_indices([stock_db['codes'][3]])
+
+    assert np.isnan(cube.window_returns(dates[0], dates[10], rows)).all()
+    assert not np.isnan(cube.window_returns(dates[25], dates[40], rows)).any()
+    assert cube.traded_days(dates[0], dates[10], rows)[0] == 0
+
+def test_covers(stock_db, build_cube):
+    dates = stock_db['dates']
+    cube = build_cube(start_index=10)
+
+    assert cube.dates[0] == dates[10]
+    assert cube.covers()
+    assert cube.covers(dates[10], dates[59])
+    assert cube.covers(dates[30])
+    assert not cube.covers(dates[5], dates[59])
+    assert get_price_cube(dates[10]) is not None
+    assert get_price_cube(dates[5]) is None
+
+def test_start_before_cube_falls_back_to_sql(stock_db, build_cube, monkeypatch):
+    """起始日早于立方体首个交易日时结果与数据库一致，而不是被截到立方体的首日"""
+    dates = stock_db['dates']
+    cube = build_cube(start_index=10)
+    start_date, end_date = dates[5], dates[40]
+
+    expected = sql_window_returns(stock_db, monkeypatch, start_date, end_date)
+    actual = StockAnalysis().get_window_returns(stock_db['codes'], start_date, end_date)
+    assert actual == expected
+
+    # 直接在立方体上切片会从立方体首日算起，与数据库的结果不同
+    clamped = dict(zip(cube.codes, np.round(cube.window_returns(start_date, end_date), 4)))
+    assert any(abs(clamped[code] - value) > 1e-3 for code, value in expected.items())
+
+def test_total_loss_bars_stay_finite(stock_db, build_cube, monkeypatch):
+    """pct_chg <= -100 的异常日线: 立方体和数据库回退查询都得到接近 -100% 的收益，而不是 NaN 或出错"""
+    dates, codes = stock_db['dates'], stock_db['codes']
+    conn = stock_db['conn']
+    conn.execute('UPDATE stock_data SET pct_chg = -100 WHERE ts_code = ? AND trade_date IN (?, ?)',
+                 (codes[1], dates[20], dates[21]))
+    conn.execute('UPDATE stock_data SET pct_chg = -120 WHERE ts_code = ? AND trade_date >= ?', (codes[2], dates[40]))
+    build_cube()
+
+    expected = sql_window_returns(stock_db, monkeypatch, dates[0], dates[59])
+    actual = StockAnalysis().get_window_returns(codes, dates[0], dates[59])
+
+    assert actual.keys() == expected.keys() == set(codes)
+    for code in codes[1:3]:
+        assert -100 <= actual[code] < -99.99
+        assert actual[code] == pytest.approx(expected[code], abs=1e-3)
@@ -0,0 +1,57 @@
+from flask import current_app
+import base64
+import json
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # 未安装 orjson 时用标准库 json
+    orjson = None
+
+# 紧凑响应格式（format=compact）
+#
+# 数值序列按列整体发送，二维数组按行优先展开；binary=1 时数组编码为
+# {'dtype', 'shape', 'data'}，data 为小端字节的 base64，前端直接解码成 Float32Array 等类型化数组，
+# 缺失值为 NaN。否则为普通 JSON 列表，缺失值为 null
+
+# dtype -> 前端类型化数组名（static/js/charts.js 的 decodeCompactArray）
+ARRAY_DTYPES = {
+    'float32': '<f4',
+    'float64': '<f8',
+    'int32': '<i4'
+}
+
+def parse_format(args):
+    """从查询参数解析 (是否紧凑格式, 是否 base64 类型化数组)"""
+    fmt = args.get('format', 'json')
+    if fmt not in ('json', 'compact'):
+        raise ValueError(f"不支持的格式: {fmt}")
+    binary = args.get('binary') in ('1', 'true')
+    if binary and fmt != 'compact':
+        raise ValueError('binary 只能与 format=compact 一起使用')
+    return fmt == 'compact', binary
+
+def encode_array(values, binary=False, dtype='float64'):
+    """数组 -> JSON 列表（NaN 为 null）或 base64 类型化数组，dtype 只用于 binary"""
+    values = np.asarray(values)
+    if binary:
+        data = np.ascontiguousarray(values, dtype=ARRAY_DTYPES[dtype])
+        return {
+            'dtype': dtype,
+            'shape': list(values.shape),
+            'data': base64.b64encode(data.tobytes()).decode('ascii')
+        }
+    if values.dtype.kind == 'f':
+        missing = np.isnan(values)
+        values = values.astype(object)
+        values[missing] = None
+    return values.tolist()
+
+def dumps(payload):
+    """序列化为 UTF-8 JSON 字节，有 orjson 时使用 orjson"""
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def json_response(payload, status=200):
+    return current_app.response_class(dumps(payload), status=status, mimetype='application/json')
@@ -0,0 +1,78 @@
+from config.config import DATA_VERSION_CONFIG
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows 下只做进程内加锁
+    fcntl = None
+
+# 数据版本计数器
+#
+# 每个名称对应 DATA_VERSION_CONFIG['DIR'] 下的一个文件，内容为递增的整数。
+# 写数据的一方调用 bump_version，读缓存的一方比较 get_version 的返回值，
+# 版本文件放在磁盘上，多个 worker 进程都能看到其他进程的变更。
+# 任一名称递增时全局版本 DATA_VERSION 同时递增，读接口据此生成 ETag / Last-Modified
+
+DATA_VERSION = 'data'
+
+_lock = threading.Lock()
+_cache = {}  # name -> ((inode, mtime_ns), version)
+
+def _version_file(name):
+    return os.path.join(DATA_VERSION_CONFIG['DIR'], f'{name}.version')
+
+def get_version(name):
+    """读取当前版本，文件未变化时直接返回内存中的值（只需一次 stat）"""
+    return get_version_info(name)[0]
+
+def get_version_info(name):
+    """返回 (版本, 最后递增时间戳)；从未递增过时为 (0, None)"""
+    path = _version_file(name)
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return 0, None
+
+    # 每次写入都会通过 os.replace 换成新文件，inode 变化即可判断，不依赖 mtime 精度
+    stamp = (st.st_ino, st.st_mtime_ns)
+    cached = _cache.get(name)
+    if cached is not None and cached[0] == stamp:
+        return cached[1], st.st_mtime
+
+    try:
+        with open(path) as f:
+            version = int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return (cached[1] if cached else 0), st.st_mtime
+    _cache[name] = (stamp, version)
+    return version, st.st_mtime
+
+def bump_version(name):
+    """版本加一并返回新版本，同时递增全局版本"""
+    version = _bump(name)
+    if name != DATA_VERSION:
+        _bump(DATA_VERSION)
+    return version
+
+def _bump(name):
+    path = _version_file(name)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with _lock, open(f'{path}.lock', 'w') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            try:
+                with open(path) as f:
+                    version = int(f.read().strip() or 0) + 1
+            except (FileNotFoundError, ValueError):
+                version = 1
+            tmp_file = f'{path}.{os.getpid()}.tmp'
+            with open(tmp_file, 'w') as f:
+                f.write(str(version))
+            os.replace(tmp_file, path)
+            _cache.pop(name, None)
+            return version
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
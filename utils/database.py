@@ -1,32 +1,232 @@
 import mysql.connector
+import os
+import threading
+import time
+from collections import deque
 from contextlib import contextmanager
-from config.config import MYSQL_CONFIG
+from config.config import MYSQL_CONFIG, MYSQL_POOL_CONFIG
 from utils.logger import setup_logger
 
 logger = setup_logger('database')
 
+def _create_connection():
+    return mysql.connector.connect(
+        host=MYSQL_CONFIG['host'],
+        user=MYSQL_CONFIG['user'],
+        password=MYSQL_CONFIG['password'],
+        database=MYSQL_CONFIG['database'],
+        port=MYSQL_CONFIG['port'],
+        charset=MYSQL_CONFIG['charset'],
+        consume_results=True  # 自动消费结果
+    )
+
+class _PooledConnection:
+    """连接池中的连接及其元数据"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.time()
+        self.last_used = self.created_at
+
+class ConnectionPool:
+    """MySQL连接池
+
+    size: 最大连接数，连接用完时借出请求等待，超过 checkout_timeout 秒抛出异常
+    max_lifetime: 连接最长存活秒数，超过后在归还或借出时关闭重建
+    ping_idle: 连接空闲超过该秒数时，借出前先 ping 检查是否可用
+    """
+
+    def __init__(self, size=10, max_lifetime=3600, checkout_timeout=30, ping_idle=5):
+        self.size = size
+        self.max_lifetime = max_lifetime
+        self.checkout_timeout = checkout_timeout
+        self.ping_idle = ping_idle
+        self._idle = deque()
+        self._total = 0
+        self._cond = threading.Condition()
+        self._stats = {'checkouts': 0, 'waits': 0, 'wait_seconds': 0.0, 'timeouts': 0,
+                       'created': 0, 'discarded': 0}
+
+    def checkout(self):
+        """借出一个可用连接"""
+        deadline = time.time() + self.checkout_timeout
+        waited = False
+        with self._cond:
+            while True:
+                if self._idle:
+                    item = self._idle.pop()  # 后进先出，优先复用最近用过的连接
+                    break
+                if self._total < self.size:
+                    self._total += 1
+                    item = None
+                    break
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise TimeoutError(f"等待数据库连接超时（{self.checkout_timeout}秒）")
+                if not waited:
+                    waited = True
+                    self._stats['waits'] += 1
+                wait_start = time.time()
+                self._cond.wait(remaining)
+                self._stats['wait_seconds'] += time.time() - wait_start
+            self._stats['checkouts'] += 1
+
+        if item is not None and self._is_healthy(item):
+            item.last_used = time.time()
+            return item
+        if item is not None:
+            self._close(item)
+
+        # 新建连接（池未满或旧连接不可用）
+        try:
+            item = _PooledConnection(_create_connection())
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats['created'] += 1
+        return item
+
+    def checkin(self, item, discard=False):
+        """归还连接；discard=True 或连接已过期时关闭该连接"""
+        if not discard and time.time() - item.created_at < self.max_lifetime:
+            try:
+                # 回滚未提交的事务，避免状态带给下一个使用者
+                item.conn.rollback()
+                item.last_used = time.time()
+                with self._cond:
+                    self._idle.append(item)
+                    self._cond.notify()
+                return
+            except Exception as e:
+                logger.warning(f"归还数据库连接失败，关闭该连接: {str(e)}")
+        self._close(item, release=True)
+
+    def _is_healthy(self, item):
+        if time.time() - item.created_at >= self.max_lifetime:
+            return False
+        if time.time() - item.last_used < self.ping_idle:
+            return True
+        try:
+            item.conn.ping(reconnect=False)
+            return True
+        except Exception as e:
+            logger.warning(f"数据库连接不可用，重新创建: {str(e)}")
+            return False
+
+    def _close(self, item, release=False):
+        try:
+            item.conn.close()
+        except Exception as e:
+            logger.error(f"关闭数据库连接失败: {str(e)}")
+        with self._cond:
+            self._stats['discarded'] += 1
+            if release:
+                self._total -= 1
+                self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return dict(self._stats,
+                        size=self.size,
+                        total=self._total,
+                        idle=len(self._idle),
+                        in_use=self._total - len(self._idle),
+                        wait_seconds=round(self._stats['wait_seconds'], 3))
+
+    def close_all(self):
+        """关闭所有空闲连接"""
+        with self._cond:
+            items = list(self._idle)
+            self._idle.clear()
+        for item in items:
+            self._close(item, release=True)
+
+# 进程内共享的连接池，fork 出的子进程重新创建
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ConnectionPool(size=MYSQL_POOL_CONFIG['SIZE'],
+                                   max_lifetime=MYSQL_POOL_CONFIG['MAX_LIFETIME'],
+                                   checkout_timeout=MYSQL_POOL_CONFIG['CHECKOUT_TIMEOUT'],
+                                   ping_idle=MYSQL_POOL_CONFIG['PING_IDLE'])
+            _pool_pid = os.getpid()
+        return _pool
+
+def get_pool_stats():
+    """连接池统计: 借出次数、等待次数、连接数等"""
+    return get_pool().stats()
+
+def _is_connected(conn):
+    try:
+        return conn.is_connected()
+    except Exception:
+        return False
+
 @contextmanager
 def get_mysql_connection():
-    """获取MySQL数据库连接"""
-    conn = None
+    """从连接池获取MySQL数据库连接，退出时归还"""
+    pool = get_pool()
+    item = None
+    failed = False
     try:
-        conn = mysql.connector.connect(
-            host=MYSQL_CONFIG['host'],
-            user=MYSQL_CONFIG['user'],
-            password=MYSQL_CONFIG['password'],
-            database=MYSQL_CONFIG['database'],
-            port=MYSQL_CONFIG['port'],
-            charset=MYSQL_CONFIG['charset'],
-            consume_results=True  # 自动消费结果
-        )
-        yield conn
+        item = pool.checkout()
+        yield item.conn
     except Exception as e:
+        failed = True
         logger.error(f"数据库连接失败: {str(e)}")
         raise
     finally:
-        if conn:
-            try:
-                conn.close()
-                logger.debug("数据库连接已关闭")
-            except Exception as e:
-                logger.error(f"关闭数据库连接失败: {str(e)}") 
\ No newline at end of file
+        if item:
+            # 出错的连接可能处于未知状态，直接关闭
+            pool.checkin(item, discard=failed and not _is_connected(item.conn))
+            logger.debug("数据库连接已归还")
+
+def bulk_upsert(conn, table, df, columns, batch_size=1000, update_columns=None):
+    """批量写入DataFrame（多行 INSERT ... ON DUPLICATE KEY UPDATE），每批提交一次
+
+    返回写入统计: rows, batches, seconds, rows_per_sec
+    """
+    if update_columns is None:
+        update_columns = columns
+
+    start_time = time.time()
+    stats = {'rows': 0, 'batches': 0, 'seconds': 0, 'rows_per_sec': 0}
+    if df is None or df.empty:
+        return stats
+
+    # 按列取值并把 NaN 转成 None，避免逐行构造 Series
+    data = df[columns].astype(object).where(df[columns].notna(), None)
+    rows = list(data.itertuples(index=False, name=None))
+
+    column_sql = ', '.join(f'`{c}`' for c in columns)
+    row_placeholder = '(' + ', '.join(['%s'] * len(columns)) + ')'
+    update_sql = ', '.join(f'`{c}` = VALUES(`{c}`)' for c in update_columns)
+
+    cursor = conn.cursor()
+    try:
+        for i in range(0, len(rows), batch_size):
+            batch = rows[i:i + batch_size]
+            sql = (f'INSERT INTO {table} ({column_sql}) VALUES '
+                   + ', '.join([row_placeholder] * len(batch))
+                   + f' ON DUPLICATE KEY UPDATE {update_sql}')
+            cursor.execute(sql, [value for row in batch for value in row])
+            conn.commit()
+            stats['rows'] += len(batch)
+            stats['batches'] += 1
+    finally:
+        cursor.close()
+
+    stats['seconds'] = time.time() - start_time
+    stats['rows_per_sec'] = stats['rows'] / stats['seconds'] if stats['seconds'] > 0 else 0
+    logger.info(f"写入 {table} {stats['rows']} 行，{stats['batches']} 批，"
+                f"耗时 {stats['seconds']:.2f} 秒，{stats['rows_per_sec']:.0f} 行/秒")
+    return stats
\ No newline at end of file
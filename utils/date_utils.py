@@ -0,0 +1,32 @@
+from datetime import datetime
+
+def to_date_str(value):
+    """交易日期统一为 YYYYMMDD 字符串，兼容 VARCHAR(8)、DATE 和整数存储"""
+    if value is None:
+        return None
+    if hasattr(value, 'strftime'):
+        return value.strftime('%Y%m%d')
+    return str(value).replace('-', '')
+
+def format_trade_date(value):
+    """交易日期格式化为 YYYY-MM-DD"""
+    date_str = to_date_str(value)
+    if date_str is None:
+        return None
+    return f"{date_str[:4]}-{date_str[4:6]}-{date_str[6:]}"
+
+def parse_date_param(value):
+    """解析接口的日期参数（YYYYMMDD 或 YYYY-MM-DD），为空时返回 None，格式错误时抛出 ValueError"""
+    if value is None or not str(value).strip():
+        return None
+    date_str = to_date_str(str(value).strip())
+    datetime.strptime(date_str, '%Y%m%d')
+    return date_str
+
+def parse_window(args, default_start=None):
+    """从请求参数中解析 start/end，返回 (start_date, end_date)，均为 YYYYMMDD 或 None"""
+    start_date = parse_date_param(args.get('start')) or default_start
+    end_date = parse_date_param(args.get('end'))
+    if start_date and end_date and start_date > end_date:
+        raise ValueError(f"start 不能晚于 end: {start_date} > {end_date}")
+    return start_date, end_date
@@ -0,0 +1,76 @@
+import queue
+import threading
+from utils.logger import setup_logger
+
+logger = setup_logger('fetch_pool')
+
+# 工作线程结束标记
+_DONE = object()
+
+def run_fetch_pipeline(tasks, fetch_func, write_func, rate_limiter=None, workers=4,
+                       queue_size=16, on_error=None, stop_event=None):
+    """并发拉取 + 单线程写入
+
+    多个工作线程从任务队列取任务，经限流器获取令牌后调用 fetch_func(task)，
+    结果放入有界队列；调用线程从队列取出结果并调用 write_func(task, result) 写库。
+    队列满时拉取线程阻塞，避免拉取速度超过写入速度时内存堆积。
+
+    on_error(task, exc) 处理单个任务的拉取或写入异常；stop_event 置位后停止派发新任务。
+    返回统计: fetched, written, failed
+    """
+    task_queue = queue.Queue()
+    for task in tasks:
+        task_queue.put(task)
+
+    result_queue = queue.Queue(maxsize=queue_size)
+    stats = {'fetched': 0, 'written': 0, 'failed': 0}
+    worker_count = max(1, min(workers, task_queue.qsize()))
+
+    def worker():
+        try:
+            while stop_event is None or not stop_event.is_set():
+                try:
+                    task = task_queue.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    if rate_limiter is not None:
+                        rate_limiter.acquire()
+                    result_queue.put((task, fetch_func(task), None))
+                except Exception as e:
+                    result_queue.put((task, None, e))
+        finally:
+            result_queue.put(_DONE)
+
+    threads = [threading.Thread(target=worker, name=f'fetch-worker-{i}', daemon=True)
+               for i in range(worker_count)]
+    for t in threads:
+        t.start()
+
+    running = len(threads)
+    while running > 0:
+        item = result_queue.get()
+        if item is _DONE:
+            running -= 1
+            continue
+
+        task, result, error = item
+        if error is None:
+            stats['fetched'] += 1
+            try:
+                write_func(task, result)
+                stats['written'] += 1
+            except Exception as e:
+                error = e
+
+        if error is not None:
+            stats['failed'] += 1
+            if on_error is not None:
+                on_error(task, error)
+            else:
+                logger.error(f"任务 {task} 处理失败: {str(error)}")
+
+    for t in threads:
+        t.join()
+
+    return stats
\ No newline at end of file
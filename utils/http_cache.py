@@ -0,0 +1,111 @@
+from utils.data_version import DATA_VERSION, get_version_info
+from utils.result_cache import get_result_cache
+from config.config import RESPONSE_CONFIG
+from flask import request, make_response, current_app
+from functools import wraps
+from datetime import timezone
+import gzip
+import hashlib
+
+try:
+    import brotli
+except ImportError:  # 未安装 brotli 时只支持 gzip
+    brotli = None
+
+# 读接口的条件请求
+#
+# 接口返回只随数据版本变化，ETag 由 全局数据版本 + 请求路径和参数 生成，
+# Last-Modified 取全局版本最后一次递增的时间。If-None-Match 命中时在调用视图函数之前
+# 直接返回 304，不访问数据库；Cache-Control: no-cache 让浏览器每次都带 ETag 回来验证。
+# cached_response 在服务端缓存响应体，不同用户同时打开同一板块时只计算一次。
+# 响应按 Accept-Encoding 压缩（br 优先，其次 gzip），ETag 带上编码后缀，不同编码的响应体不共用 ETag
+
+def data_version_etag(version=None, encoding=None):
+    """当前请求在给定数据版本、内容编码下的强 ETag（不带引号）"""
+    if version is None:
+        version = get_version_info(DATA_VERSION)[0]
+    digest = hashlib.md5(request.full_path.encode('utf-8')).hexdigest()[:12]
+    return f'v{version}-{digest}' + (f'-{encoding}' if encoding else '')
+
+def negotiate_encoding():
+    """按 Accept-Encoding 选择响应编码: br（已安装 brotli）、gzip 或 None"""
+    accept = request.accept_encodings
+    if brotli is not None and accept['br']:
+        return 'br'
+    if accept['gzip']:
+        return 'gzip'
+    return None
+
+def compress_body(body, encoding):
+    """压缩响应体，返回 (字节, 实际编码)；小于 COMPRESS_MIN_BYTES 时不压缩"""
+    if encoding is None or len(body) < RESPONSE_CONFIG['COMPRESS_MIN_BYTES']:
+        return body, None
+    if encoding == 'br':
+        return brotli.compress(body, quality=RESPONSE_CONFIG['BROTLI_QUALITY']), 'br'
+    return gzip.compress(body, compresslevel=RESPONSE_CONFIG['GZIP_LEVEL']), 'gzip'
+
+def versioned_response(view):
+    """给读接口加上 ETag / Last-Modified，条件请求命中时返回 304"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        # 先取版本再计算，计算期间数据变化时下次请求的 ETag 不同，会重新计算
+        version, modified = get_version_info(DATA_VERSION)
+        encoding = negotiate_encoding()
+        etag = data_version_etag(version, encoding)
+
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains(etag)
+        else:
+            since = request.if_modified_since
+            if since is not None and since.tzinfo is None:
+                since = since.replace(tzinfo=timezone.utc)
+            not_modified = since is not None and modified is not None and int(modified) <= since.timestamp()
+        if not_modified:
+            response = make_response('', 304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            if 'Content-Encoding' not in response.headers and not response.direct_passthrough:
+                body, applied = compress_body(response.get_data(), encoding)
+                if applied:
+                    response.set_data(body)
+                    response.headers['Content-Encoding'] = applied
+
+        response.set_etag(etag)
+        response.vary.add('Accept-Encoding')
+        if modified is not None:
+            response.last_modified = int(modified)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    return wrapper
+
+def cached_response(view):
+    """按 (接口, 请求路径和参数, 数据版本) 缓存 200 响应体，放在 versioned_response 之下
+
+    同一请求并发未命中时只执行一次视图函数，其余请求等待并共用结果；非 200 的结果不缓存。
+    缓存的是按协商编码压缩后的响应体，命中时不再序列化、压缩
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        cache = get_result_cache()
+        name = f'view.{request.endpoint}'
+        encoding = negotiate_encoding()
+        key, version = cache.make_key(name, (request.full_path, encoding))
+
+        def compute():
+            response = make_response(view(*args, **kwargs))
+            body = response.get_data()
+            applied = None
+            if response.status_code == 200:
+                body, applied = compress_body(body, encoding)
+            return response.status_code, body, response.mimetype, applied
+
+        status, body, mimetype, applied = cache.get_or_compute(name, key, version, compute,
+                                                               cacheable=lambda value: value[0] == 200,
+                                                               size=lambda value: len(value[1]))
+        response = current_app.response_class(body, status=status, mimetype=mimetype)
+        if applied:
+            response.headers['Content-Encoding'] = applied
+        return response
+    return wrapper
@@ -0,0 +1,89 @@
+import threading
+import time
+from utils.logger import setup_logger
+
+logger = setup_logger('rate_limiter')
+
+class TokenBucket:
+    """线程安全的令牌桶限流器
+
+    rate_per_minute: 每分钟补充的令牌数（即接口的每分钟调用上限）
+    capacity: 桶容量，即允许的突发调用数，默认取每分钟上限的十分之一，
+              避免启动瞬间打满配额后一分钟内超限
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate_per_minute = rate_per_minute
+        self.capacity = capacity if capacity is not None else max(1, rate_per_minute // 10)
+        self._fill_rate = rate_per_minute / 60.0  # 每秒补充的令牌数
+        self._tokens = float(self.capacity)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+        self.wait_count = 0
+        self.wait_seconds = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self._fill_rate)
+            self._last_refill = now
+
+    def try_acquire(self, tokens=1):
+        """尝试获取令牌，不等待"""
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1, timeout=None):
+        """获取令牌，令牌不足时阻塞等待；超时返回 False"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    if waited > 0:
+                        self.wait_count += 1
+                        self.wait_seconds += waited
+                    return True
+                sleep_time = (tokens - self._tokens) / self._fill_rate
+
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                sleep_time = min(sleep_time, remaining)
+
+            time.sleep(sleep_time)
+            waited += sleep_time
+
+    def stats(self):
+        """获取限流统计"""
+        with self._lock:
+            self._refill()
+            return {
+                'rate_per_minute': self.rate_per_minute,
+                'capacity': self.capacity,
+                'available': round(self._tokens, 2),
+                'wait_count': self.wait_count,
+                'wait_seconds': round(self.wait_seconds, 2)
+            }
+
+# 进程内共享的限流器，同一个接口配额只对应一个令牌桶
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def get_rate_limiter(name, rate_per_minute, capacity=None):
+    """按名称获取共享限流器，不存在时创建"""
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = TokenBucket(rate_per_minute, capacity)
+            _limiters[name] = limiter
+            logger.info(f"创建限流器 {name}: 每分钟 {rate_per_minute} 次")
+        return limiter
\ No newline at end of file
@@ -0,0 +1,252 @@
+from utils.logger import setup_logger
+from utils.data_version import DATA_VERSION, get_version
+from config.config import RESULT_CACHE_CONFIG
+from collections import OrderedDict
+from functools import wraps
+import hashlib
+import pickle
+import threading
+import time
+
+try:
+    import redis
+except ImportError:  # 未安装 redis 时只用进程内缓存
+    redis = None
+
+logger = setup_logger('result_cache')
+
+# 计算结果缓存
+#
+# 键由 (函数名, 参数, 全局数据版本) 生成，任何数据变更后版本递增，旧结果不再命中，
+# 进程内按 LRU 淘汰并设 TTL；配置了 REDIS_URL 时再查一层 Redis，多个 worker 进程共享结果。
+# 同一个键同时未命中时只有一个线程计算，其余线程等待它的结果（single-flight），
+# 配合 Redis 时用 SET NX 锁让其他进程也等待，避免开盘时同一板块的请求同时打到 MySQL。
+# 缓存的结果由多个请求共享，调用方不能修改
+
+class _Flight:
+    """一次进行中的计算，等待者在 done 上阻塞"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+class ResultCache:
+    """进程内 LRU + TTL 缓存，可选 Redis 作为二级缓存
+
+    max_entries: 进程内最多缓存的结果数
+    max_bytes: 已知大小的结果（接口响应体）合计字节上限
+    ttl: 结果最长缓存秒数
+    """
+
+    def __init__(self, max_entries=256, max_bytes=256 * 1024 * 1024, ttl=600, redis_url=None,
+                 lock_timeout=30):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self._entries = OrderedDict()  # key -> (过期时间, 版本, 大小, 结果)
+        self._bytes = 0
+        self._version = None
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'evictions': 0, 'expired': 0,
+                       'invalidated': 0, 'redis_hits': 0, 'redis_errors': 0, 'compute_seconds': 0.0}
+        self._by_name = {}  # 函数名 -> {'hits', 'misses'}
+        self._redis = None
+        if redis_url:
+            if redis is None:
+                logger.warning("未安装 redis，结果缓存只使用进程内缓存")
+            else:
+                self._redis = redis.Redis.from_url(redis_url, socket_timeout=1)
+
+    def make_key(self, name, args=(), kwargs=None, version=None):
+        """(函数名, 参数, 数据版本) -> 缓存键，参数按 repr 取摘要，大列表不会留在键里"""
+        if version is None:
+            version = get_version(DATA_VERSION)
+        digest = hashlib.md5(repr((args, sorted((kwargs or {}).items()))).encode('utf-8')).hexdigest()
+        return f'{name}:{version}:{digest}', version
+
+    def get_or_compute(self, name, key, version, compute, cacheable=lambda value: value is not None,
+                       size=lambda value: 0, ttl=None):
+        """命中时返回缓存结果，否则计算并缓存；同一个键同时只有一个线程在计算
+
+        cacheable(value) 为 False 的结果（如出错时的 None）只返回给本次和正在等待的调用方，不缓存
+        """
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            if self._version is None or version > self._version:
+                self._drop_old_versions(version)
+            found, value = self._lookup(key)
+            counts = self._by_name.setdefault(name, {'hits': 0, 'misses': 0})
+            if found:
+                self._stats['hits'] += 1
+                counts['hits'] += 1
+                return value
+            # 已有线程在计算时计为合并等待，不计未命中
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self._stats['misses'] += 1
+                counts['misses'] += 1
+            else:
+                self._stats['coalesced'] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            value = self._compute_shared(key, compute, cacheable, ttl)
+            flight.value = value
+            if cacheable(value):
+                with self._lock:
+                    self._store(key, version, value, size(value), ttl)
+            return value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def _compute_shared(self, key, compute, cacheable, ttl):
+        """先查 Redis；未命中时拿到锁的进程计算并写回，其他进程等待结果出现"""
+        if self._redis is None:
+            return self._timed(compute)
+
+        deadline = time.time() + self.lock_timeout
+        while True:
+            try:
+                data = self._redis.get(f'result:{key}')
+                if data is not None:
+                    with self._lock:
+                        self._stats['redis_hits'] += 1
+                    return pickle.loads(data)
+                locked = self._redis.set(f'result-lock:{key}', 1, nx=True, ex=self.lock_timeout)
+            except Exception as e:
+                self._redis_error(e)
+                return self._timed(compute)
+            if locked or time.time() > deadline:
+                break
+            time.sleep(0.05)
+
+        try:
+            value = self._timed(compute)
+            if cacheable(value):
+                try:
+                    self._redis.set(f'result:{key}', pickle.dumps(value, pickle.HIGHEST_PROTOCOL), ex=ttl)
+                except Exception as e:
+                    self._redis_error(e)
+            return value
+        finally:
+            if locked:
+                try:
+                    self._redis.delete(f'result-lock:{key}')
+                except Exception as e:
+                    self._redis_error(e)
+
+    def _timed(self, compute):
+        start_time = time.time()
+        try:
+            return compute()
+        finally:
+            with self._lock:
+                self._stats['compute_seconds'] += time.time() - start_time
+
+    def _redis_error(self, error):
+        with self._lock:
+            self._stats['redis_errors'] += 1
+        logger.warning(f"Redis 结果缓存不可用: {str(error)}")
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        if entry[0] < time.time():
+            self._remove(key)
+            self._stats['expired'] += 1
+            return False, None
+        self._entries.move_to_end(key)
+        return True, entry[3]
+
+    def _store(self, key, version, value, size, ttl):
+        if version != self._version:
+            return  # 计算期间数据已更新，结果不再缓存
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.time() + ttl, version, size, value)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or (self._bytes > self.max_bytes and len(self._entries) > 1):
+            self._remove(next(iter(self._entries)))
+            self._stats['evictions'] += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry[2]
+
+    def _drop_old_versions(self, version):
+        """数据版本变化后旧版本的结果不会再命中，直接释放"""
+        for key in [key for key, entry in self._entries.items() if entry[1] != version]:
+            self._remove(key)
+            self._stats['invalidated'] += 1
+        self._version = version
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """命中、未命中、合并等待、淘汰次数等，用于调整容量和 TTL"""
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses'] + self._stats['coalesced']
+            return dict(self._stats,
+                        entries=len(self._entries),
+                        bytes=self._bytes,
+                        max_entries=self.max_entries,
+                        max_bytes=self.max_bytes,
+                        ttl=self.ttl,
+                        redis=self._redis is not None,
+                        in_flight=len(self._flights),
+                        hit_rate=round(self._stats['hits'] / lookups, 4) if lookups else None,
+                        compute_seconds=round(self._stats['compute_seconds'], 3),
+                        by_name={name: dict(counts) for name, counts in self._by_name.items()})
+
+def cached_result(name=None, ttl=None, method=False):
+    """缓存函数结果，键为 (name, 参数, 数据版本)；返回 None 的调用不缓存
+
+    method=True 用于实例方法，键中不含 self
+    """
+    def decorator(func):
+        cache_name = name or f'{func.__module__}.{func.__qualname__}'
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            cache = get_result_cache()
+            key, version = cache.make_key(cache_name, args[1:] if method else args, kwargs)
+            return cache.get_or_compute(cache_name, key, version, lambda: func(*args, **kwargs), ttl=ttl)
+        return wrapper
+    return decorator
+
+# 进程内共享的结果缓存
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+def get_result_cache():
+    global _result_cache
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = ResultCache(max_entries=RESULT_CACHE_CONFIG['MAX_ENTRIES'],
+                                        max_bytes=RESULT_CACHE_CONFIG['MAX_BYTES'],
+                                        ttl=RESULT_CACHE_CONFIG['TTL'],
+                                        redis_url=RESULT_CACHE_CONFIG['REDIS_URL'],
+                                        lock_timeout=RESULT_CACHE_CONFIG['LOCK_TIMEOUT'])
+        return _result_cache
+
+def get_result_cache_stats():
+    return get_result_cache().stats()